@@ -1,5 +1,6 @@
-#aba dedicada ao acionamento do backend
-from app import app
+#aba dedicada ao acionamento do backend em desenvolvimento (em produção utilize o gunicorn, com o gunicorn.conf.py)
+from app import create_app
 
 if __name__ == '__main__':
-    app.run(debug=True, host="0.0.0.0", port=5000, use_reloader=True)
+    app = create_app()
+    app.run(debug=app.config["DEBUG"], host="0.0.0.0", port=5000, use_reloader=app.config["DEBUG"])
\ No newline at end of file
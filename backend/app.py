@@ -1,41 +1,242 @@
-from flask import request, jsonify, render_template, redirect
+import io
+import os
+import time
+import click
+from datetime import datetime, timezone
+from uuid import uuid4
+
+from flask import Response, current_app, request, jsonify, render_template, redirect, send_file, stream_with_context
 from flask_cors import CORS
-from flask_openapi3 import OpenAPI, Info, Tag
-from sqlalchemy import desc, cast, Integer
-
-from config import DevelopmentConfig
-from database import db
+from flask_openapi3 import Info, Tag
+from sqlalchemy import func, inspect, insert, update
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import defer, selectinload
+
+from archive import ArchiveError, export_archive, import_archive, spool_archive
+from config import get_config
+from blob_store import BlobStore, decode_base64_image
+from change_log import CursorExpired, latest_change_id, prune_changes, read_changes, track_changes
+from compression import ResponseCompression
+from database import db, dispose_engines_after_fork, register_sqlite_pragmas
+from image_uploads import ImageUploads, UploadTooLarge, image_dimensions, inspect_image
+from metrics import RequestMetrics
+from migrations import upgrade_database
+from ordering import move_to_position, open_position
+from openapi_docs import DeferredDocsBlueprint, DeferredDocsOpenAPI
+from pagination import keyset_query, paginate
+from recipe_tree import recipe_tree
+from row_versions import VersionConflict, conditional_update, track_row_versions
+from response_cache import ResponseCache, track_table_versions
+from search import search_query
+from stitch_notation import stitch_counts
+from summary import track_amigurumi_summaries
+from serializer import STREAM_BATCH_SIZE, column_keys, columns_of, dumps, json_response, ndjson_response, object_to_dict
+from thumbnails import THUMBNAIL_FORMATS, ThumbnailCache, render_thumbnail
 
 from error_schema import *
 from schema import *
 from table import *
 
 info = Info(title="Minha API de Amigurumi", version="1.0.0", description="API para gerenciar informações dos Amigurumis")
-app = OpenAPI(__name__, info=info)
-
-app.config["SQLALCHEMY_DATABASE_URI"] = DevelopmentConfig.SQLALCHEMY_DATABASE_URI
-app.config["SQLALCHEMY_TRACK_MODIFICATIONS"] = DevelopmentConfig.SQLALCHEMY_TRACK_MODIFICATIONS
 
 foundation_tag = Tag(name="Foundation", description="Endpoints relacionados à adição, manipulação, busca e exclusão de dados sobre os amigurumis")
 stichbook_sequence_tag = Tag(name="Stitchbook Element", description="Endpoints relacionados à adição, manipulação, busca e exclusão de elementos dos amigurumis e sua ordem de execução")
 stichbook_tag = Tag(name="Stichbook", description="Endpoints relacionados à adição, manipulação, busca e exclusão das carreiras utilizadas na construção dos amigurumis")
 image_tag = Tag(name="Image", description="Endpoints relacionados à adição, manipulação, busca e exclusão de imagem dos amigurumi")
 material_tag = Tag(name="Material", description="Endpoints relacionados à adição, manipulação, busca e exclusão de materiais utilizados na construção dos amigurumis")
+archive_tag = Tag(name="Archive", description="Endpoints de exportação e importação de receitas completas (amigurumis, partes, carreiras, materiais e imagens) em um arquivo zip")
+search_tag = Tag(name="Search", description="Endpoint de busca por palavras nos amigurumis, partes, materiais e carreiras")
+sync_tag = Tag(name="Sync", description="Endpoints de sincronização incremental: inclusões, alterações e exclusões desde a última leitura")
 support_tag = Tag(name="suporte", description="Endpoint para geração da documentação dos APIs")
 
-CORS(app)
+#os endpoints são declarados no blueprint e registrados na aplicação criada por create_app;
+#a documentação OpenAPI das rotas é gerada no primeiro acesso a /openapi/openapi.json
+api = DeferredDocsBlueprint("amigurumi", __name__, cli_group=None)
+
+#armazenamento das imagens, cache das miniaturas e cache das respostas de leitura, configurados em create_app
+image_store = BlobStore()
+thumbnail_cache = ThumbnailCache()
+image_uploads = ImageUploads(image_store)
+request_metrics = RequestMetrics()
+response_compression = ResponseCompression()
+
+#o cache das respostas é invalidado pela versão das tabelas, incrementada em cada escrita
+track_table_versions(db.session)
+track_row_versions(db.session)
+track_changes(db.session)
+track_amigurumi_summaries(db.session)
+response_cache = ResponseCache(db.session, compression=response_compression)
+
+
+#criação da aplicação com a configuração escolhida por APP_ENV (ou pela classe informada)
+def create_app(config_class=None):
+    app = DeferredDocsOpenAPI(__name__, info=info)
+    app.config.from_object(config_class or get_config())
+
+    CORS(app, expose_headers=["X-Next-Cursor", "ETag", "Last-Modified"])
+
+    db.init_app(app)
+    register_sqlite_pragmas(app)
+    image_store.init_app(app)
+    thumbnail_cache.init_app(app)
+    image_uploads.init_app(app)
+    response_cache.init_app(app)
+    #registrada depois das métricas: o after_request roda em ordem inversa e as métricas medem o tamanho comprimido
+    request_metrics.init_app(app)
+    response_compression.init_app(app)
+
+    #em desenvolvimento as tabelas são criadas e atualizadas automaticamente; em produção o gunicorn faz isso uma única vez
+    if app.config["AUTO_UPGRADE_DATABASE"]:
+        with app.app_context():
+            upgrade_database()
+            db.engine.dispose()
+
+    dispose_engines_after_fork(app)
+    register_validation_error_handler(app)
+    app.register_api(api)
+
+    #aquecimento opcional: validadores dos esquemas e documentação OpenAPI montados antes da primeira requisição
+    if app.config["SCHEMA_WARMUP"]:
+        warm_up_schemas()
+        app.api_doc
+
+    return app
+
+
+#resposta das listagens, com o cursor da próxima página no header quando houver
+def paginated_response(result, next_cursor):
+    response = json_response(result)
+
+    if next_cursor:
+        response.headers["X-Next-Cursor"] = next_cursor
+
+    return response
+
+
+#filtros informados na consulta, ignorando os parâmetros de paginação e os não preenchidos
+def query_filters(query):
+    return {key: value for key, value in query.dict(exclude={"limit", "after", "stream"}).items() if value is not None}
+
+
+#envio em streaming quando pedido por ?stream=1 ou pelo header Accept: application/x-ndjson
+def wants_stream(query):
+    best = request.accept_mimetypes.best_match(["application/json", "application/x-ndjson"])
+    return query.stream or best == "application/x-ndjson"
+
+
+#resposta das listagens: em NDJSON, lendo as linhas em blocos (yield_per), ou em uma página JSON, limitada a
+#PAGE_DEFAULT_LIMIT linhas quando limit não é informado (as demais seguem pelo X-Next-Cursor).
+#Retorna None quando a página não tem linhas, para que cada endpoint decida a resposta
+def listing_response(listing, ordering, key, query, to_dict, allow_empty=True):
+    if wants_stream(query):
+        rows = keyset_query(listing, ordering, query.after)
+
+        if query.limit is not None:
+            rows = rows.limit(query.limit)
+
+        return ndjson_response(rows.yield_per(STREAM_BATCH_SIZE), to_dict)
+
+    limit = query.limit or current_app.config["PAGE_DEFAULT_LIMIT"]
+    rows, next_cursor = paginate(listing, ordering, key=key, limit=limit, after=query.after)
+
+    if not rows and not allow_empty:
+        return None
+
+    return paginated_response([to_dict(row) for row in rows], next_cursor)
+
+
+#----------------------------------- Operações em lote --------------------------#
+#ids informados que não existem na tabela, verificados em uma única consulta
+def missing_ids(column, ids):
+    requested = set(ids)
+    found = {value for (value,) in db.session.query(column).filter(column.in_(requested))}
+    return sorted(requested - found)
+
 
-db.init_app(app)
+#partes informadas que não existem ou pertencem a outro amigurumi, verificadas em uma única consulta.
+#Retorna os pares (element_id, amigurumi_id) inválidos
+def element_mismatches(rows):
+    pairs = {(row["element_id"], row["amigurumi_id"]) for row in rows}
+    owners = dict(db.session.query(StitchBookSequence.element_id, StitchBookSequence.amigurumi_id).filter(
+        StitchBookSequence.element_id.in_({element_id for element_id, _ in pairs})
+    ))
+
+    return [
+        {"element_id": element_id, "amigurumi_id": amigurumi_id}
+        for element_id, amigurumi_id in sorted(pairs) if owners.get(element_id) != amigurumi_id
+    ]
+
+
+#inserção de todas as linhas em INSERTs de múltiplos VALUES, retornando os ids gerados na ordem enviada.
+#As chaves autoincrementais são geradas em ordem crescente dentro da transação, por isso basta ordenar o RETURNING
+#(o sort_by_parameter_order do SQLAlchemy voltaria a executar um INSERT por linha no SQLite)
+def bulk_insert(model, rows):
+    primary_key = inspect(model).primary_key[0]
+    ids = db.session.scalars(insert(model).returning(primary_key), rows).all()
+    db.session.commit()
+
+    return sorted(ids)
+
+
+#alteração das linhas pela chave primária, em um único executemany
+def bulk_update(model, rows):
+    db.session.execute(update(model), rows)
+    db.session.commit()
+
+
+#exclusão das linhas pela chave primária, em um único DELETE
+def bulk_delete(column, ids):
+    db.session.query(column.class_).filter(column.in_(ids)).delete(synchronize_session=False)
+    db.session.commit()
+
+
+#violação de restrição na gravação: chave estrangeira sem a linha referenciada (404) ou conflito com outra linha,
+#como a imagem principal única por amigurumi (409). A transação é desfeita antes da resposta
+FOREIGN_KEY_ERROR = "Registro relacionado não encontrado (o amigurumi ou a parte informada não existe)"
+INTEGRITY_CONFLICT = "A alteração conflita com outra linha cadastrada"
+
+def is_foreign_key_error(error):
+    return getattr(error.orig, "pgcode", None) == "23503" or "FOREIGN KEY" in str(error.orig).upper()
 
-#criação das tabelas automaticamente
-with app.app_context(): 
-    db.create_all() 
 
-register_validation_error_handler(app)
+def integrity_error_response(error, conflict=INTEGRITY_CONFLICT):
+    db.session.rollback()
+
+    if is_foreign_key_error(error):
+        return jsonify({"error": FOREIGN_KEY_ERROR}), 404
+
+    return jsonify({"error": conflict}), 409
+
+
+#alteração de uma linha pela chave, apenas com as colunas enviadas e condicionada ao If-Match (row_versions.py).
+#Retorna a nova versão, ou a resposta de erro (412 para outra versão, 404 para linha inexistente ou chave estrangeira
+#sem a linha referenciada, 409 para conflito) com a transação desfeita
+def update_row(model, key, values, not_found, conflict=INTEGRITY_CONFLICT):
+    try:
+        version = conditional_update(db.session, model, key, values)
+    except VersionConflict as error:
+        db.session.rollback()
+        return None, (jsonify({"error": str(error)}), 412)
+    except IntegrityError as error:
+        return None, integrity_error_response(error, conflict)
+
+    if version is None:
+        db.session.rollback()
+        return None, (jsonify({"error": not_found}), 404)
+
+    return version, None
+
+
+#resposta da alteração com a nova versão da linha no corpo e na ETag, para o If-Match da próxima alteração
+def versioned_response(result, version):
+    response = jsonify({**result, "version": version})
+    response.set_etag(str(version))
+    return response
+
 
 #----------------------------------- API Suporte ------------------------------#
 #renderização de novas abas
-@app.get('/<page>', tags=[support_tag])  
+@api.get('/<page>', tags=[support_tag])  
 def render_page(page):
     try:
         return render_template(f'{page}.html')
@@ -44,7 +245,7 @@ def render_page(page):
 
 
 #Geração do OpenApi
-@app.get('/openapi', tags=[support_tag])
+@api.get('/openapi', tags=[support_tag])
 def openapi():
     doc_type = request.args.get('doc', 'swagger') 
 
@@ -69,26 +270,258 @@ def openapi():
 
 
 
+#Métricas das requisições no formato de texto do Prometheus
+@api.get('/metrics', tags=[support_tag], summary="Requisição para puxar as métricas de duração, tamanho e SQL das requisições")
+def metrics():
+    return Response(request_metrics.render(), content_type="text/plain; version=0.0.4; charset=utf-8")
+
+
+
+
+#Atualização do esquema do banco, sem precisar iniciar o servidor
+@api.cli.command("upgrade-database")
+def upgrade_database_command():
+    upgrade_database()
+    print("Banco de dados atualizado")
+
+
+
+
+#----------------------------------- Exportação e importação -------------------#
+#receitas completas em um arquivo zip, para copiar amigurumis entre ambientes sem repetir cada chamada da API
+ARCHIVE_IMPORT_BODY = {
+    "requestBody": {
+        "required": True,
+        "content": {"application/zip": {"schema": {"type": "string", "format": "binary"}}},
+    },
+}
+
+@api.get('/export', tags=[archive_tag], responses={"422": ValidationErrorResponse},
+         summary="Requisição para exportar amigurumis, com as partes, carreiras, materiais e imagens, em um arquivo zip enviado em streaming")
+def export_recipes(query: ExportQuery):
+    amigurumi_ids = query.amigurumi_id or None
+
+    if amigurumi_ids:
+        missing = missing_ids(FoundationList.amigurumi_id, amigurumi_ids)
+        if missing:
+            return jsonify({"error": "Amigurumi não encontrado", "amigurumi_id": missing}), 404
+
+    filename = f"amigurumis-{datetime.now(timezone.utc):%Y%m%d-%H%M%S}.zip"
+
+    return Response(
+        stream_with_context(export_archive(db.session, image_store, amigurumi_ids)),
+        mimetype="application/zip",
+        headers={"Content-Disposition": f"attachment; filename={filename}"},
+    )
+
+
+
+@api.post('/import', tags=[archive_tag], responses={"422": ValidationErrorResponse}, openapi_extensions=ARCHIVE_IMPORT_BODY,
+          summary="Requisição para importar um arquivo de receitas gerado por /export, com novos ids, em uma única transação")
+def import_recipes():
+    try:
+        with spool_archive(request.stream, current_app.config["ARCHIVE_MAX_BYTES"]) as spool:
+            result = import_archive(db.session, image_store, spool)
+    except UploadTooLarge as error:
+        return jsonify({"error": str(error)}), 413
+    except ArchiveError as error:
+        return jsonify({"error": str(error)}), 400
+
+    return jsonify({
+        "message": f"{len(result['amigurumi_ids'])} amigurumis importados com sucesso!",
+        **result,
+    })
+
+
+
+@api.cli.command("export-recipes")
+@click.argument("output", type=click.Path(dir_okay=False, writable=True))
+@click.option("--amigurumi-id", "amigurumi_ids", type=int, multiple=True, help="id do amigurumi exportado (repetir para vários)")
+def export_recipes_command(output, amigurumi_ids):
+    with open(output, "wb") as archive_file:
+        for chunk in export_archive(db.session, image_store, list(amigurumi_ids) or None):
+            archive_file.write(chunk)
+
+    print(f"Receitas exportadas em {output}")
+
+
+@api.cli.command("import-recipes")
+@click.argument("archive", type=click.Path(exists=True, dir_okay=False))
+def import_recipes_command(archive):
+    try:
+        result = import_archive(db.session, image_store, archive)
+    except ArchiveError as error:
+        raise click.ClickException(str(error))
+
+    print(f"{len(result['amigurumi_ids'])} amigurumis importados: {result['counts']}")
+
+
+
+
+#----------------------------------- API de Busca ------------------------------#
+@api.get('/search', tags=[search_tag], responses={"422": ValidationErrorResponse},
+         summary="Requisição para buscar palavras nos nomes e autores dos amigurumis, nas partes, nos materiais e nas observações das carreiras")
+@response_cache.cached("foundation_list", "stitchbook_sequence", "material_list", "stitchbook")
+def search(query: SearchQuery):
+    keys = ("kind", "source_id", "amigurumi_id", "title", "detail", "score")
+
+    try:
+        results, ordering = search_query(db.session, query.q)
+        rows, next_cursor = paginate(
+            results, ordering,
+            key=lambda row: [row.score, row.rowid], limit=query.limit, after=query.after
+        )
+    except ValueError as error:
+        return jsonify({"error": str(error)}), 400
+
+    return paginated_response([dict(zip(keys, row)) for row in rows], next_cursor)
+
+
+
+
+#----------------------------------- Sincronização incremental ----------------#
+#alterações registradas em change_log.py, com os dados atuais de cada linha (imagens com os links, como em /image)
+def changes_page(since, query):
+    result = read_changes(db.session, since, query.limit, query.table, query.amigurumi_id)
+
+    for change in result["changes"]:
+        if change["table"] == "image" and "data" in change:
+            image_metadata(change["data"])
+
+    return result
+
+
+@api.get('/changes', tags=[sync_tag], responses={"422": ValidationErrorResponse},
+         summary="Requisição para puxar as inclusões, alterações e exclusões desde o cursor da última sincronização")
+def get_changes(query: ChangesQuery):
+    #sem since, o cliente recebe o cursor atual antes de baixar as listagens completas
+    if query.since is None:
+        return json_response({"changes": [], "cursor": latest_change_id(db.session), "has_more": False})
+
+    try:
+        return json_response(changes_page(query.since, query))
+    except CursorExpired as error:
+        return jsonify({"error": str(error)}), 410
+
+
+#as mesmas alterações enviadas por Server-Sent Events: um evento a cada página, com o cursor no id do evento.
+#A conexão é encerrada depois de CHANGES_STREAM_SECONDS e o EventSource reconecta com o header Last-Event-ID
+@api.get('/changes/stream', tags=[sync_tag], responses={"422": ValidationErrorResponse},
+         summary="Requisição para receber as alterações em tempo real, por Server-Sent Events")
+def stream_changes(query: ChangesQuery):
+    last_event_id = request.headers.get("Last-Event-ID", "")
+    since = int(last_event_id) if last_event_id.isdigit() else query.since
+
+    if since is None:
+        since = latest_change_id(db.session)
+
+    try:
+        first_page = changes_page(since, query)
+    except CursorExpired as error:
+        return jsonify({"error": str(error)}), 410
+
+    poll_seconds = current_app.config["CHANGES_POLL_SECONDS"]
+    deadline = time.monotonic() + current_app.config["CHANGES_STREAM_SECONDS"]
+
+    def event(page):
+        return b"id: %d\nevent: changes\ndata: %s\n\n" % (page["cursor"], dumps(page))
+
+    def generate():
+        page = first_page
+        yield b"retry: %d\n\n" % (poll_seconds * 1000)
+
+        while True:
+            if page["changes"]:
+                yield event(page)
+            else:
+                yield b": keep-alive\n\n"
+
+            #a conexão com o banco é devolvida ao pool entre as leituras
+            db.session.close()
+
+            if page["has_more"]:
+                page = changes_page(page["cursor"], query)
+                continue
+
+            if time.monotonic() >= deadline:
+                break
+
+            time.sleep(poll_seconds)
+            page = changes_page(page["cursor"], query)
+
+    return Response(
+        stream_with_context(generate()),
+        mimetype="text/event-stream",
+        headers={"Cache-Control": "no-cache, no-transform", "X-Accel-Buffering": "no"},
+    )
+
+
+
+#remoção dos registros de alteração mais antigos que CHANGES_RETENTION_DAYS dias (ou --days)
+@api.cli.command("prune-changes")
+@click.option("--days", type=int, default=None, help="dias de registros mantidos")
+def prune_changes_command(days):
+    days = current_app.config["CHANGES_RETENTION_DAYS"] if days is None else days
+    removed = prune_changes(db.session, days)
+
+    print(f"{removed} registros de alteração removidos")
+
+
+
+
 #----------------------------------- API para a tabela Foundation List----------#
-@app.get('/foundation_list', tags=[foundation_tag], responses={"200": FoundationListSchema_All, "422": ValidationErrorResponse},
+@api.get('/foundation_list', tags=[foundation_tag], responses={"200": FoundationListSchema_All, "422": ValidationErrorResponse},
          summary="Requisição para puxar todos os amigurumis cadastrados")
-def get_foundation_list():
-    with app.app_context():
-        amigurumis = FoundationList.query.all()
+@response_cache.cached("foundation_list")
+def get_foundation_list(query: FoundationListQuery):
+    columns = columns_of(FoundationList)
+    ordering = [(FoundationList.amigurumi_id, False)]
+
+    keys = column_keys(columns)
 
-    if not amigurumis:
+    try:
+        response = listing_response(
+            db.session.query(*columns).filter_by(**query_filters(query)), ordering,
+            key=lambda amigurumi: [amigurumi.amigurumi_id], query=query,
+            to_dict=lambda row: dict(zip(keys, row)), allow_empty=False
+        )
+    except ValueError as error:
+        return jsonify({"error": str(error)}), 400
+
+    if response is None:
         return jsonify({"error": "Nenhum amigurumi encontrado"}), 404
 
-    result = [
-        {key: value for key, value in amigurumi.__dict__.items() if not key.startswith('_')}
-        for amigurumi in amigurumis
-    ]
+    return response
 
-    return jsonify(result)
 
 
+@api.get('/foundation_list/summary', tags=[foundation_tag], responses={"422": ValidationErrorResponse},
+         summary="Requisição para puxar o resumo de cada amigurumi: quantidade de partes, carreiras, materiais e imagens")
+@response_cache.cached("foundation_list", "stitchbook_sequence", "stitchbook", "material_list", "image")
+def get_foundation_list_summary(query: FoundationListQuery):
+    #o resumo é lido pronto da tabela amigurumi_summary, mantida a cada escrita, sem contar as linhas das outras tabelas
+    columns = (FoundationList.amigurumi_id, FoundationList.name, FoundationList.autor) + columns_of(AmigurumiSummary, exclude=("amigurumi_id",))
+    ordering = [(FoundationList.amigurumi_id, False)]
 
-@app.post('/foundation_list', tags=[foundation_tag], responses={"200": FoundationListSchema_No_Auto, "422": ValidationErrorResponse},
+    summaries = db.session.query(*columns).join(AmigurumiSummary, AmigurumiSummary.amigurumi_id == FoundationList.amigurumi_id)
+
+    if query.autor is not None:
+        summaries = summaries.filter(FoundationList.autor == query.autor)
+
+    keys = column_keys(columns)
+
+    try:
+        return listing_response(
+            summaries, ordering,
+            key=lambda amigurumi: [amigurumi.amigurumi_id], query=query,
+            to_dict=lambda row: dict(zip(keys, row))
+        )
+    except ValueError as error:
+        return jsonify({"error": str(error)}), 400
+
+
+
+@api.post('/foundation_list', tags=[foundation_tag], responses={"200": FoundationListSchema_No_Auto, "422": ValidationErrorResponse},
          summary="Requisição para cadastrar um novo amigurumi")
 def add_foundation_list(body: FoundationListSchema_No_Auto):
     data = body.dict() 
@@ -104,31 +537,27 @@ def add_foundation_list(body: FoundationListSchema_No_Auto):
 
 
 
-@app.put('/foundation_list/amigurumi_id', tags=[foundation_tag], responses={"200": FoundationListSchema_All, "422": ValidationErrorResponse},
+@api.put('/foundation_list/amigurumi_id', tags=[foundation_tag], responses={"200": FoundationListSchema_Partial, "422": ValidationErrorResponse},
          summary="Requisição para alterar os dados do amigurumi cadastrado")
-def update_foundation_list(body: FoundationListSchema_All):
-    data = body.dict() 
-    amigurumi_id = int(data.get('amigurumi_id'))
-    amigurumi = FoundationList.query.get(amigurumi_id)  
-
-    if not amigurumi:
-        return jsonify({"error": "Amigurumi não encontrado"}), 404
+def update_foundation_list(body: FoundationListSchema_Partial):
+    data = body.dict(exclude_unset=True)
+    amigurumi_id = int(data.pop('amigurumi_id'))
 
-    for key, value in data.items():
-        if hasattr(amigurumi, key):
-            setattr(amigurumi, key, value)
+    version, error = update_row(FoundationList, amigurumi_id, data, "Amigurumi não encontrado")
+    if error:
+        return error
 
     db.session.commit()
 
-    return jsonify({
-        "message": f"Amigurumi {amigurumi.name} atualizado com sucesso!",
-        "amigurumi_id": amigurumi.amigurumi_id,
-    })
+    return versioned_response({
+        "message": f"Amigurumi {data.get('name', amigurumi_id)} atualizado com sucesso!",
+        "amigurumi_id": amigurumi_id,
+    }, version)
 
 
 
 
-@app.delete('/foundation_list/amigurumi_id', tags=[foundation_tag], responses={"200": FoundationListSchema_PrimaryKey, "422": ValidationErrorResponse},
+@api.delete('/foundation_list/amigurumi_id', tags=[foundation_tag], responses={"200": FoundationListSchema_PrimaryKey, "422": ValidationErrorResponse},
          summary="Requisição para deletar o amigurumi cadastrado")
 def delete_foundation_list(body: FoundationListSchema_PrimaryKey):
     data = body.dict() 
@@ -149,48 +578,138 @@ def delete_foundation_list(body: FoundationListSchema_PrimaryKey):
 
 
 
+@api.get('/foundation_list/<int:amigurumi_id>/tree', tags=[foundation_tag], responses={"422": ValidationErrorResponse},
+         summary="Requisição para puxar a família de receitas de um amigurumi: ancestrais e descendentes pela coluna relationship")
+@response_cache.cached("foundation_list", "stitchbook_sequence", "stitchbook", "material_list", "image")
+def get_foundation_list_tree(path: AmigurumiPath, query: RecipeTreeQuery):
+    #ancestrais e descendentes em todos os níveis (até depth) resolvidos em uma única consulta recursiva
+    tree = recipe_tree(db.session, path.amigurumi_id, query.depth, contents=query.contents)
+
+    if tree is None:
+        return jsonify({"error": "Amigurumi não encontrado"}), 404
+
+    return json_response(tree)
+
+
+
+
+@api.get('/amigurumi/<int:amigurumi_id>/full', tags=[foundation_tag], responses={"422": ValidationErrorResponse},
+         summary="Requisição para puxar a receita completa de um amigurumi: materiais, imagens, partes e carreiras")
+@response_cache.cached("foundation_list", "material_list", "image", "stitchbook_sequence", "stitchbook")
+def get_full_amigurumi(path: AmigurumiPath):
+    #cada relacionamento é carregado em uma única consulta (selectinload), sem consultas extras por parte ou carreira
+    amigurumi = FoundationList.query.options(
+        selectinload(FoundationList.materials),
+        selectinload(FoundationList.image).defer(Image.image_base64),
+        selectinload(FoundationList.stitchBook_sequence),
+        selectinload(FoundationList.stitchBook),
+    ).filter_by(amigurumi_id=path.amigurumi_id).first()
+
+    if not amigurumi:
+        return jsonify({"error": "Amigurumi não encontrado"}), 404
+
+    stitches_by_element = {}
+    for stitch in sorted(amigurumi.stitchBook, key=lambda stitch: (stitch.number_row, stitch.line_id)):
+        stitches_by_element.setdefault(stitch.element_id, []).append(object_to_dict(stitch))
+
+    elements = []
+    for element in sorted(amigurumi.stitchBook_sequence, key=lambda element: (element.element_order, element.element_id)):
+        element_data = object_to_dict(element)
+        element_data["stitchBook"] = stitches_by_element.get(element.element_id, [])
+        elements.append(element_data)
+
+    result = object_to_dict(amigurumi)
+    result["materials"] = [
+        object_to_dict(material)
+        for material in sorted(amigurumi.materials, key=lambda material: (material.list_id, material.material_id))
+    ]
+    result["image"] = [
+        image_metadata(object_to_dict(image))
+        for image in sorted(amigurumi.image, key=lambda image: (not image.main_image, image.image_id))
+    ]
+    result["stitchBook_sequence"] = elements
+
+    return json_response(result)
+
+
+
+
 #----------------------------------- API para a tabela StichBook ------------------------#
-@app.get('/stitchbook', tags=[stichbook_tag], responses={"200": StitchBookSchema_All, "422": ValidationErrorResponse},
+#contagem de pontos, aumentos e diminuições calculada a partir de stich_sequence a cada gravação da carreira
+def with_stitch_counts(data):
+    return {**data, **stitch_counts(data["stich_sequence"])}
+
+
+@api.get('/stitchbook', tags=[stichbook_tag], responses={"200": StitchBookSchema_All, "422": ValidationErrorResponse},
          summary="Requisição para puxar todas as linhas de receitas cadastradas")
-def get_all_stichbook():
-    amigurumi_stiches = db.session.query(StitchBookSequence, StitchBook).outerjoin(
+@response_cache.cached("stitchbook_sequence", "stitchbook")
+def get_all_stichbook(query: StitchBookQuery):
+    #amigurumi_id e element_id da carreira são iguais aos da parte, pela condição do join
+    sequence_columns = columns_of(StitchBookSequence)
+    stitch_columns = columns_of(StitchBook, exclude=("amigurumi_id", "element_id"))
+
+    amigurumi_stiches = db.session.query(*sequence_columns, *stitch_columns).outerjoin(
         StitchBook,
         (StitchBook.amigurumi_id == StitchBookSequence.amigurumi_id) & 
         (StitchBook.element_id == StitchBookSequence.element_id)
-    ).order_by(
-        cast(StitchBookSequence.amigurumi_id, Integer).asc(),
-        cast(StitchBookSequence.element_order, Integer).asc(),
-        cast(StitchBook.number_row, Integer).asc()
-    ).all()
+    )
+
+    if query.amigurumi_id is not None:
+        amigurumi_stiches = amigurumi_stiches.filter(StitchBookSequence.amigurumi_id == query.amigurumi_id)
+
+    if query.element_id is not None:
+        amigurumi_stiches = amigurumi_stiches.filter(StitchBookSequence.element_id == query.element_id)
 
-    result = []
-    for sequence, stitch in amigurumi_stiches:
-        sequence_data = {key: value for key, value in sequence.__dict__.items() if not key.startswith('_')}
-        
-        stitch_data = {}
-        if stitch is not None:
-            stitch_data = {key: value for key, value in stitch.__dict__.items() if not key.startswith('_')}
+    #as partes sem carreiras aparecem uma única vez, com number_row e line_id nulos
+    ordering = [
+        (StitchBookSequence.amigurumi_id, False),
+        (StitchBookSequence.element_order, False),
+        (StitchBookSequence.element_id, False),
+        (StitchBook.number_row, False),
+        (StitchBook.line_id, False),
+    ]
+
+    sequence_keys = column_keys(sequence_columns)
+    combined_keys = sequence_keys + column_keys(stitch_columns)
+    sequence_size = len(sequence_keys)
 
-        combined_data = {**sequence_data, **stitch_data}
-        result.append(combined_data)
+    #partes sem carreiras trazem apenas os dados da parte
+    def to_dict(row):
+        if row.line_id is None:
+            return dict(zip(sequence_keys, row[:sequence_size]))
+        return dict(zip(combined_keys, row))
 
-    return jsonify(result)
+    try:
+        return listing_response(
+            amigurumi_stiches, ordering,
+            key=lambda row: [row.amigurumi_id, row.element_order, row.element_id, row.number_row, row.line_id],
+            query=query, to_dict=to_dict
+        )
+    except ValueError as error:
+        return jsonify({"error": str(error)}), 400
 
 
 
-@app.post('/stitchbook', tags=[stichbook_tag], responses={"200": StitchBookSchema_No_Auto, "422": ValidationErrorResponse},
+@api.post('/stitchbook', tags=[stichbook_tag], responses={"200": StitchBookSchema_No_Auto, "422": ValidationErrorResponse},
          summary="Requisição para cadastrar uma nova linha de receita")
 def add_stichbook(body: StitchBookSchema_No_Auto):
-    data = body.dict() 
+    data = with_stitch_counts(body.dict())
     amigurumi_id = int(data.get('amigurumi_id'))
     amigurumi = FoundationList.query.get(amigurumi_id)
 
     if not amigurumi:
         return jsonify({"error": "Amigurumi não cadastrado"}), 404
 
+    if element_mismatches([data]):
+        return jsonify({"error": "Parte não encontrada neste amigurumi"}), 404
+
     new_recipe = StitchBook(**data)
     db.session.add(new_recipe)
-    db.session.commit()
+
+    try:
+        db.session.commit()
+    except IntegrityError as error:
+        return integrity_error_response(error)
 
     return jsonify({
         "message": f"Linha a adicionada com sucesso para o amigurumi {amigurumi.amigurumi_id}!",
@@ -199,30 +718,42 @@ def add_stichbook(body: StitchBookSchema_No_Auto):
 
 
 
-@app.put('/stitchbook/line_id', tags=[stichbook_tag], responses={"200": StitchBookSchema_All, "422": ValidationErrorResponse},
+@api.put('/stitchbook/line_id', tags=[stichbook_tag], responses={"200": StitchBookSchema_Partial, "422": ValidationErrorResponse},
          summary="Requisição para alterar uma linha de receita cadastrada")
-def update_stichbook_line(body: StitchBookSchema_All):
-    data = body.dict() 
-    line_id = int(data.get('line_id'))
-    lineID = StitchBook.query.get(line_id)  
+def update_stichbook_line(body: StitchBookSchema_Partial):
+    data = body.dict(exclude_unset=True)
+    line_id = int(data.pop('line_id'))
 
-    if not lineID:
-        return jsonify({"error": "Linha não encontrada"}), 404
+    if "stich_sequence" in data:
+        data = with_stitch_counts(data)
+
+    #com apenas a parte ou apenas o amigurumi no corpo, o outro lado do par vem da linha atual
+    if "element_id" in data or "amigurumi_id" in data:
+        current = db.session.execute(
+            db.select(StitchBook.element_id, StitchBook.amigurumi_id).where(StitchBook.line_id == line_id)
+        ).first()
+
+        if current is None:
+            return jsonify({"error": "Linha não encontrada"}), 404
 
-    for key, value in data.items():
-        if hasattr(lineID, key):
-            setattr(lineID, key, value)
+        pair = {"element_id": current.element_id, "amigurumi_id": current.amigurumi_id, **data}
+        if element_mismatches([pair]):
+            return jsonify({"error": "Parte não encontrada neste amigurumi"}), 404
+
+    version, error = update_row(StitchBook, line_id, data, "Linha não encontrada")
+    if error:
+        return error
 
     db.session.commit()
 
-    return jsonify({
+    return versioned_response({
         "message": f"Linha {line_id} atualizada com sucesso!",
         "line_id": line_id,
-    })
+    }, version)
 
 
 
-@app.delete('/stitchbook/line_id', tags=[stichbook_tag], responses={"200": StitchBookSchema_PrimaryKey, "422": ValidationErrorResponse},
+@api.delete('/stitchbook/line_id', tags=[stichbook_tag], responses={"200": StitchBookSchema_PrimaryKey, "422": ValidationErrorResponse},
          summary="Requisição para deletar uma linha de receita cadastrada")
 def delete_stichbook_line(body: StitchBookSchema_PrimaryKey):
     data = body.dict() 
@@ -242,22 +773,278 @@ def delete_stichbook_line(body: StitchBookSchema_PrimaryKey):
 
 
 
+@api.post('/stitchbook/bulk', tags=[stichbook_tag], responses={"200": StitchBookSchema_No_Auto_Bulk, "422": ValidationErrorResponse},
+         summary="Requisição para cadastrar várias linhas em uma única transação")
+def add_stichbook_bulk(body: StitchBookSchema_No_Auto_Bulk):
+    data = [with_stitch_counts(item.dict()) for item in body.root]
+    missing = missing_ids(FoundationList.amigurumi_id, [item["amigurumi_id"] for item in data])
+
+    if missing:
+        return jsonify({"error": "Amigurumi não cadastrado", "amigurumi_id": missing}), 404
+
+    mismatches = element_mismatches(data)
+
+    if mismatches:
+        return jsonify({"error": "Partes não encontradas nestes amigurumis", "elements": mismatches}), 404
+
+    try:
+        line_ids = bulk_insert(StitchBook, data)
+    except IntegrityError as error:
+        return integrity_error_response(error)
+
+    return jsonify({
+        "message": f"{len(line_ids)} linhas adicionadas com sucesso!",
+        "line_ids": line_ids,
+    })
+
+
+
+@api.put('/stitchbook/bulk', tags=[stichbook_tag], responses={"200": StitchBookSchema_All_Bulk, "422": ValidationErrorResponse},
+         summary="Requisição para alterar várias linhas em uma única transação")
+def update_stichbook_bulk(body: StitchBookSchema_All_Bulk):
+    data = [with_stitch_counts(item.dict()) for item in body.root]
+    missing = missing_ids(StitchBook.line_id, [item["line_id"] for item in data])
+
+    if missing:
+        return jsonify({"error": "Linhas não encontradas", "line_id": missing}), 404
+
+    missing = missing_ids(FoundationList.amigurumi_id, [item["amigurumi_id"] for item in data])
+
+    if missing:
+        return jsonify({"error": "Amigurumi não cadastrado", "amigurumi_id": missing}), 404
+
+    mismatches = element_mismatches(data)
+
+    if mismatches:
+        return jsonify({"error": "Partes não encontradas nestes amigurumis", "elements": mismatches}), 404
+
+    try:
+        bulk_update(StitchBook, data)
+    except IntegrityError as error:
+        return integrity_error_response(error)
+
+    return jsonify({
+        "message": f"{len(data)} linhas atualizadas com sucesso!",
+        "line_ids": [item["line_id"] for item in data],
+    })
+
+
+
+@api.delete('/stitchbook/bulk', tags=[stichbook_tag], responses={"200": StitchBookSchema_PrimaryKey_Bulk, "422": ValidationErrorResponse},
+         summary="Requisição para deletar várias linhas em uma única transação")
+def delete_stichbook_bulk(body: StitchBookSchema_PrimaryKey_Bulk):
+    line_ids = [item.line_id for item in body.root]
+    missing = missing_ids(StitchBook.line_id, line_ids)
+
+    if missing:
+        return jsonify({"error": "Linhas não encontradas", "line_id": missing}), 404
+
+    bulk_delete(StitchBook.line_id, line_ids)
+
+    return jsonify({
+        "message": f"{len(line_ids)} linhas removidas com sucesso!",
+        "line_ids": line_ids,
+    })
+
+
+
+#inserção de uma carreira no meio da parte: as carreiras a partir de number_row descem uma posição no mesmo UPDATE
+@api.post('/stitchbook/insert', tags=[stichbook_tag], responses={"200": StitchBookSchema_No_Auto, "422": ValidationErrorResponse},
+          summary="Requisição para inserir uma carreira na posição number_row da parte, deslocando as seguintes")
+def insert_stichbook_line(body: StitchBookSchema_No_Auto):
+    data = with_stitch_counts(body.dict())
+    element = db.session.get(StitchBookSequence, data["element_id"])
+
+    if element is None or element.amigurumi_id != data["amigurumi_id"]:
+        return jsonify({"error": "Parte não encontrada neste amigurumi"}), 404
+
+    shifted = open_position(db.session, StitchBook, StitchBook.element_id, element.element_id, StitchBook.number_row, data["number_row"])
+
+    new_recipe = StitchBook(**data)
+    db.session.add(new_recipe)
+
+    try:
+        db.session.commit()
+    except IntegrityError as error:
+        return integrity_error_response(error)
+
+    return jsonify({
+        "message": f"Linha inserida com sucesso na carreira {new_recipe.number_row}!",
+        "line_id": new_recipe.line_id,
+        "shifted": shifted,
+    })
+
+
+
+@api.post('/stitchbook/<int:line_id>/move', tags=[stichbook_tag], responses={"422": ValidationErrorResponse},
+          summary="Requisição para mover uma carreira para outra posição da parte, deslocando as carreiras entre as duas posições")
+def move_stichbook_line(path: StitchBookPath, body: StitchBookMove):
+    shifted = move_to_position(db.session, StitchBook, path.line_id, StitchBook.element_id, StitchBook.number_row, body.number_row)
+
+    if shifted is None:
+        return jsonify({"error": "Linha não encontrada"}), 404
+
+    try:
+        db.session.commit()
+    except IntegrityError as error:
+        return integrity_error_response(error)
+
+    return jsonify({
+        "message": f"Linha {path.line_id} movida para a carreira {body.number_row}!",
+        "line_id": path.line_id,
+        "shifted": shifted,
+    })
+
+
+
 #----------------------------------- API para a tabela Image -------------------#
-@app.get('/image', tags=[image_tag], responses={"200": ImageSchema_All, "422": ValidationErrorResponse},
+#gravação da imagem recebida em base64 no armazenamento de imagens, deixando na tabela apenas os metadados.
+#As imagens novas passam pela mesma validação do envio em segundo plano (inspect_image); strict=False apenas
+#na migração das linhas antigas, que mantêm o conteúdo gravado
+def image_content_values(image_base64, strict=True):
+    content, content_type = decode_base64_image(image_base64, strict=strict)
+
+    if strict:
+        content_type, width, height = inspect_image(io.BytesIO(content))
+    else:
+        width, height = image_dimensions(io.BytesIO(content))
+
+    return {
+        "content_hash": image_store.put(content), "content_type": content_type, "content_size": len(content),
+        "width": width, "height": height, "image_base64": None,
+    }
+
+
+def store_image_content(image_obj, image_base64, strict=True):
+    for key, value in image_content_values(image_base64, strict).items():
+        setattr(image_obj, key, value)
+
+
+#garantia de que o conteúdo da imagem está no armazenamento, migrando no primeiro acesso as linhas antigas ainda em base64
+def ensure_image_content(image):
+    if image.content_hash is None and image.image_base64:
+        store_image_content(image, image.image_base64, strict=False)
+        db.session.commit()
+
+    return image.content_hash is not None and image_store.exists(image.content_hash)
+
+
+#troca da imagem principal na mesma transação do cadastro ou da alteração: as demais imagens do amigurumi deixam de ser
+#a principal antes da gravação da nova, respeitando o índice único parcial (uma imagem principal por amigurumi).
+#Duas trocas simultâneas no mesmo amigurumi resultam em IntegrityError na segunda, respondida com 409
+MAIN_IMAGE_CONFLICT = "Outra imagem principal foi definida ao mesmo tempo para este amigurumi, tente novamente"
+
+def clear_main_image(amigurumi_id, keep_image_id=None):
+    query = Image.query.filter(Image.amigurumi_id == amigurumi_id, Image.main_image == db.true())
+
+    if keep_image_id is not None:
+        query = query.filter(Image.image_id != keep_image_id)
+
+    query.update({"main_image": False})
+
+
+#metadados da imagem, com o link para o download do conteúdo no lugar do base64
+def image_metadata(data):
+    data.pop("image_base64", None)
+    data["image_url"] = f"/image/{data['image_id']}/content"
+    data["thumb_url"] = f"/image/{data['image_id']}/thumb"
+
+    return data
+
+
+
+@api.get('/image', tags=[image_tag], responses={"200": ImageSchema_All, "422": ValidationErrorResponse},
          summary="Requisição para puxar todas as imagens dos amigurumis cadastrados")
-def get_all_image():
-    amigurumi_images = Image.query.order_by(desc(Image.main_image)).all()
+@response_cache.cached("image")
+def get_all_image(query: ImageQuery):
+    columns = columns_of(Image, exclude=("image_base64",))
+    ordering = [(Image.image_id, False)]
+
+    keys = column_keys(columns)
+
+    try:
+        return listing_response(
+            db.session.query(*columns).filter_by(**query_filters(query)), ordering,
+            key=lambda image: [image.image_id], query=query,
+            to_dict=lambda row: image_metadata(dict(zip(keys, row)))
+        )
+    except ValueError as error:
+        return jsonify({"error": str(error)}), 400
+
+
+
+@api.get('/amigurumi/<int:amigurumi_id>/main_image', tags=[image_tag], responses={"422": ValidationErrorResponse},
+         summary="Requisição para puxar a imagem principal de um amigurumi")
+@response_cache.cached("image")
+def get_main_image(path: AmigurumiPath):
+    columns = columns_of(Image, exclude=("image_base64",))
+    image = db.session.query(*columns).filter(
+        Image.amigurumi_id == path.amigurumi_id, Image.main_image == db.true()
+    ).first()
+
+    if image is None:
+        return jsonify({"error": "Imagem principal não encontrada"}), 404
+
+    return json_response(image_metadata(dict(zip(column_keys(columns), image))))
+
 
-    results = [
-        {key: value for key, value in amigurumi.__dict__.items() if not key.startswith('_')}
-        for amigurumi in amigurumi_images
-    ]
 
-    return jsonify(results)
+@api.get('/image/<int:image_id>/content', tags=[image_tag], responses={"422": ValidationErrorResponse},
+         summary="Requisição para baixar o conteúdo de uma imagem cadastrada, com suporte a Range e cache condicional")
+def get_image_content(path: ImagePath):
+    image = Image.query.get(path.image_id)
 
+    if not image:
+        return jsonify({"error": "Imagem não encontrada"}), 404
+
+    try:
+        if not ensure_image_content(image):
+            return jsonify({"error": "Conteúdo da imagem não encontrado"}), 404
+    except ValueError as error:
+        return jsonify({"error": str(error)}), 422
+
+    return send_file(image_store.path(image.content_hash), mimetype=image.content_type,
+                     conditional=True, etag=image.content_hash)
+
+
+
+@api.get('/image/<int:image_id>/thumb', tags=[image_tag], responses={"422": ValidationErrorResponse},
+         summary="Requisição para baixar uma miniatura da imagem, gerada uma única vez e mantida em cache")
+def get_image_thumbnail(path: ImagePath, query: ThumbnailQuery):
+    image = Image.query.options(defer(Image.image_base64)).get(path.image_id)
+
+    if not image:
+        return jsonify({"error": "Imagem não encontrada"}), 404
+
+    try:
+        if not ensure_image_content(image):
+            return jsonify({"error": "Conteúdo da imagem não encontrado"}), 404
+    except ValueError as error:
+        return jsonify({"error": str(error)}), 422
+
+    thumbnail_path = thumbnail_cache.get(image.content_hash, query.w, query.fmt)
+
+    if thumbnail_path is None:
+        with open(image_store.path(image.content_hash), "rb") as content_file:
+            content = content_file.read()
 
+        try:
+            thumbnail = render_thumbnail(content, query.w, query.fmt)
+        except RuntimeError as error:
+            return jsonify({"error": str(error)}), 501
+        except (OSError, ValueError):
+            return jsonify({"error": "Não foi possível gerar a miniatura desta imagem"}), 422
 
-@app.post('/image', tags=[image_tag], responses={"200": ImageSchema_No_Auto, "422": ValidationErrorResponse},
+        thumbnail_path = thumbnail_cache.put(image.content_hash, query.w, query.fmt, thumbnail)
+
+    _, content_type = THUMBNAIL_FORMATS[query.fmt]
+
+    return send_file(thumbnail_path, mimetype=content_type, conditional=True,
+                     etag=f"{image.content_hash}-{query.w}.{query.fmt}")
+
+
+
+@api.post('/image', tags=[image_tag], responses={"200": ImageSchema_No_Auto, "422": ValidationErrorResponse},
          summary="Requisição para cadastrar uma nova imagem de um amigurumi")
 def add_image(body: ImageSchema_No_Auto):
     data = body.dict()
@@ -265,17 +1052,31 @@ def add_image(body: ImageSchema_No_Auto):
     amigurumi = FoundationList.query.get(amigurumi_id)
     main_image = True if str(data.get('main_image')).lower() == "true" else False
     data["main_image"] = main_image    
+    image_base64 = data.pop("image_base64", None)
     
     if not amigurumi:
         return jsonify({"error": "Amigurumi não encontrado"}), 404
 
-    if main_image:  
-        Image.query.filter_by(amigurumi_id=amigurumi_id, main_image=True).update({"main_image": False})
-        db.session.commit()
+    if not image_base64:
+        return jsonify({"error": "Imagem não informada"}), 400
 
     new_image = Image(**data)
+
+    try:
+        store_image_content(new_image, image_base64)
+    except ValueError as error:
+        return jsonify({"error": str(error)}), 400
+
+    if main_image:
+        clear_main_image(amigurumi_id)
+
     db.session.add(new_image)
-    db.session.commit()
+
+    #o arquivo já gravado que ficar sem nenhuma linha é removido depois por sweep-image-blobs
+    try:
+        db.session.commit()
+    except IntegrityError as error:
+        return integrity_error_response(error, MAIN_IMAGE_CONFLICT)
 
     image_id = new_image.image_id
 
@@ -286,37 +1087,114 @@ def add_image(body: ImageSchema_No_Auto):
 
 
 
-@app.put('/image/image_id', tags=[image_tag], responses={"200": ImageSchema_All, "422": ValidationErrorResponse},
-         summary="Requisição para alterar informações sobre uma imagem cadastrada de um amigurumi")
-def update_image(body: ImageSchema_All):
-    data = body.dict() 
-    image_id = int(data.get('image_id'))
-    amigurumi_id = int(data.get('amigurumi_id'))
-    main_image = str(data.get("main_image", "false")).lower() == "true"
+#corpo do envio no OpenAPI: o arquivo no campo image de um formulário multipart, ou os bytes da imagem
+IMAGE_UPLOAD_BODY = {
+    "requestBody": {
+        "required": True,
+        "content": {
+            "multipart/form-data": {"schema": {"type": "object", "properties": {"image": {"type": "string", "format": "binary"}}}},
+            "application/octet-stream": {"schema": {"type": "string", "format": "binary"}},
+        },
+    },
+}
+
+@api.post('/image/upload', tags=[image_tag], responses={"422": ValidationErrorResponse}, openapi_extensions=IMAGE_UPLOAD_BODY,
+          summary="Requisição para enviar uma imagem sem base64, processada em segundo plano; retorna o id do envio")
+def upload_image(query: ImageUploadQuery):
+    if not db.session.get(FoundationList, query.amigurumi_id):
+        return jsonify({"error": "Amigurumi não encontrado"}), 404
+
+    try:
+        upload_path = image_uploads.receive()
+    except UploadTooLarge as error:
+        return jsonify({"error": str(error)}), 413
+    except ValueError as error:
+        return jsonify({"error": str(error)}), 400
+
+    job = ImageUpload(
+        job_id=uuid4().hex, amigurumi_id=query.amigurumi_id, list_id=query.list_id, main_image=query.main_image,
+        status="pending", created_at=datetime.now(timezone.utc).replace(tzinfo=None),
+    )
 
-    if main_image:  
-        Image.query.filter_by(amigurumi_id=amigurumi_id, main_image=True).update({"main_image": False})
+    try:
+        db.session.add(job)
         db.session.commit()
+    except BaseException:
+        os.remove(upload_path)
+        raise
 
-    image_obj = Image.query.get(image_id)
+    image_uploads.submit(job.job_id, upload_path)
 
-    if not image_obj:
-        return jsonify({"error": "Imagem não encontrada"}), 404
+    response = jsonify({
+        "message": "Imagem recebida, em processamento",
+        "job_id": job.job_id,
+        "status_url": f"/image/upload/{job.job_id}",
+    })
+    response.status_code = 202
+    response.headers["Location"] = f"/image/upload/{job.job_id}"
+    return response
 
-    for key, value in data.items():
-        if hasattr(image_obj, key):
-            setattr(image_obj, key, value)
 
-    db.session.commit()
 
-    return jsonify({
+@api.get('/image/upload/<job_id>', tags=[image_tag], responses={"422": ValidationErrorResponse},
+         summary="Requisição para consultar a situação de um envio de imagem em segundo plano")
+def get_image_upload(path: ImageUploadPath):
+    job = image_uploads.status(path.job_id)
+
+    if not job:
+        return jsonify({"error": "Envio não encontrado"}), 404
+
+    return json_response(object_to_dict(job))
+
+
+
+@api.put('/image/image_id', tags=[image_tag], responses={"200": ImageSchema_Partial, "422": ValidationErrorResponse},
+         summary="Requisição para alterar informações sobre uma imagem cadastrada de um amigurumi")
+def update_image(body: ImageSchema_Partial):
+    data = body.dict(exclude_unset=True)
+    image_id = int(data.pop('image_id'))
+    main_image = data.get("main_image") is True
+
+    #sem uma nova imagem em base64, apenas os metadados são alterados e o conteúdo atual é mantido; o arquivo anterior
+    #(ou o novo, quando a alteração falha) é removido depois por sweep-image-blobs, se nenhuma outra imagem o utiliza
+    image_base64 = data.pop("image_base64", None)
+
+    if image_base64:
+        try:
+            data.update(image_content_values(image_base64))
+        except ValueError as error:
+            return jsonify({"error": str(error)}), 400
+
+    #sem amigurumi_id no corpo, a imagem principal é trocada no amigurumi atual da imagem
+    amigurumi_id = data.get("amigurumi_id")
+    if main_image and amigurumi_id is None:
+        amigurumi_id = db.session.scalar(db.select(Image.amigurumi_id).where(Image.image_id == image_id))
+
+        if amigurumi_id is None:
+            return jsonify({"error": "Imagem não encontrada"}), 404
+
+    try:
+        if main_image:
+            clear_main_image(int(amigurumi_id), keep_image_id=image_id)
+
+        version, error = update_row(Image, image_id, data, "Imagem não encontrada", conflict=MAIN_IMAGE_CONFLICT)
+        if error is None:
+            db.session.commit()
+    except IntegrityError:
+        db.session.rollback()
+        version, error = None, (jsonify({"error": MAIN_IMAGE_CONFLICT}), 409)
+
+    if error is not None:
+        return error
+
+    return versioned_response({
         "message": "Imagem alterada com sucesso",
-        "image_id": image_obj.image_id,
-    })
+        "image_id": image_id,
+    }, version)
 
 
 
-@app.delete('/image/image_id', tags=[image_tag], responses={"200": ImageSchema_PrimaryKey, "422": ValidationErrorResponse},
+@api.delete('/image/image_id', tags=[image_tag], responses={"200": ImageSchema_PrimaryKey, "422": ValidationErrorResponse},
     summary="Requisição para deletar uma imagem cadastrada de um amigurumi")
 def delete_image_line(body: ImageSchema_PrimaryKey):
     data = body.dict() 
@@ -336,26 +1214,100 @@ def delete_image_line(body: ImageSchema_PrimaryKey):
 
 
 
+#migração das imagens antigas, ainda em base64 na tabela, para o armazenamento de imagens
+@api.cli.command("migrate-image-blobs")
+def migrate_image_blobs():
+    last_id = 0
+    migrated = 0
+
+    while True:
+        batch = Image.query.filter(
+            Image.image_id > last_id, Image.content_hash.is_(None), Image.image_base64.isnot(None)
+        ).order_by(Image.image_id).limit(100).all()
+
+        if not batch:
+            break
+
+        for image in batch:
+            try:
+                store_image_content(image, image.image_base64, strict=False)
+                migrated += 1
+            except ValueError as error:
+                print(f"Imagem {image.image_id} ignorada: {error}")
+
+        last_id = batch[-1].image_id
+        db.session.commit()
+
+    print(f"{migrated} imagens migradas para o armazenamento de imagens")
+
+
+
+#---------------------------------------------------------------------------#
+# Remoção dos arquivos de imagem que nenhuma linha utiliza (imagens excluídas ou trocadas, envios que falharam, arquivos
+# temporários de envios interrompidos).
+# Nenhuma requisição remove arquivos: um cadastro simultâneo do mesmo conteúdo reaproveita o arquivo existente antes do
+# commit da sua linha. Por isso só são removidos os arquivos sem uso e sem gravação ou reaproveitamento há mais de
+# grace_seconds, e a data é conferida novamente por BlobStore.delete. Retorna a quantidade de arquivos removidos
+SWEEP_BATCH_SIZE = 500
+
+def sweep_image_blobs(grace_seconds):
+    cutoff = time.time() - grace_seconds
+    candidates = [digest for digest, modified in image_store.stored() if modified < cutoff]
+    removed = 0
+
+    for start in range(0, len(candidates), SWEEP_BATCH_SIZE):
+        batch = candidates[start:start + SWEEP_BATCH_SIZE]
+        used = set(db.session.scalars(db.select(Image.content_hash).where(Image.content_hash.in_(batch))))
+
+        for digest in batch:
+            if digest not in used and image_store.delete(digest, older_than=cutoff):
+                thumbnail_cache.invalidate(digest)
+                removed += 1
+
+    db.session.rollback()
+
+    #arquivos temporários de envios em segundo plano interrompidos (já marcados como failed)
+    return removed + image_uploads.remove_stale_files(cutoff)
+
+
+@api.cli.command("sweep-image-blobs")
+@click.option("--grace-seconds", type=int, default=None, help="idade mínima, em segundos, dos arquivos removidos")
+def sweep_image_blobs_command(grace_seconds):
+    grace_seconds = current_app.config["BLOB_SWEEP_GRACE_SECONDS"] if grace_seconds is None else grace_seconds
+    removed = sweep_image_blobs(grace_seconds)
+
+    print(f"{removed} arquivos de imagem sem uso removidos")
+
+
+
 #----------------------------------- API para a tabela Material ------------------#
-@app.get('/material_list', tags=[material_tag], responses={"200": MaterialListSchema_All, "422": ValidationErrorResponse},
+@api.get('/material_list', tags=[material_tag], responses={"200": MaterialListSchema_All, "422": ValidationErrorResponse},
          summary="Requisição para puxar todos os materiais utilizados na construção do amigurumi")
-def get_all_material_list():
-    amigurumi_material = MaterialList.query.order_by(
-        cast(MaterialList.amigurumi_id, Integer).asc(),
-        cast(MaterialList.list_id, Integer).asc(),
-        cast(MaterialList.colour_id, Integer).asc()
-    ).all()
-
-    result = [
-        {key: value for key, value in amigurumi.__dict__.items() if not key.startswith('_')}
-        for amigurumi in amigurumi_material
+@response_cache.cached("material_list")
+def get_all_material_list(query: MaterialListQuery):
+    #colour_id é opcional, por isso a ordenação do cursor termina na chave primária e não na cor
+    ordering = [
+        (MaterialList.amigurumi_id, False),
+        (MaterialList.list_id, False),
+        (MaterialList.material_id, False),
     ]
 
-    return jsonify(result)
+    columns = columns_of(MaterialList)
 
+    keys = column_keys(columns)
 
+    try:
+        return listing_response(
+            db.session.query(*columns).filter_by(**query_filters(query)), ordering,
+            key=lambda material: [material.amigurumi_id, material.list_id, material.material_id], query=query,
+            to_dict=lambda row: dict(zip(keys, row))
+        )
+    except ValueError as error:
+        return jsonify({"error": str(error)}), 400
 
-@app.post('/material_list', tags=[material_tag], responses={"200": MaterialListSchema_No_Auto, "422": ValidationErrorResponse},
+
+
+@api.post('/material_list', tags=[material_tag], responses={"200": MaterialListSchema_No_Auto, "422": ValidationErrorResponse},
          summary="Requisição para cadastrar novos materiais utilizados na construção do amigurumi") 
 def add_material_list(body: MaterialListSchema_No_Auto):
     data = body.dict() 
@@ -376,30 +1328,26 @@ def add_material_list(body: MaterialListSchema_No_Auto):
 
 
 
-@app.put('/material_list/material_id', tags=[material_tag], responses={"200": MaterialListSchema_All, "422": ValidationErrorResponse},
+@api.put('/material_list/material_id', tags=[material_tag], responses={"200": MaterialListSchema_Partial, "422": ValidationErrorResponse},
          summary="Requisição para alterar um materiais utilizados na construção do amigurumi")
-def update_material_list_line(body: MaterialListSchema_All):
-    data = body.dict() 
-    material_id = int(data.get('material_id'))
-    materialListID = MaterialList.query.get(material_id)  
-
-    if not materialListID:
-        return jsonify({"error": "Material não encontrado"}), 404
+def update_material_list_line(body: MaterialListSchema_Partial):
+    data = body.dict(exclude_unset=True)
+    material_id = int(data.pop('material_id'))
 
-    for key, value in data.items():
-        if hasattr(materialListID, key):
-            setattr(materialListID, key, value)
+    version, error = update_row(MaterialList, material_id, data, "Material não encontrado")
+    if error:
+        return error
 
     db.session.commit()
 
-    return jsonify({
+    return versioned_response({
         "message": f"Material {material_id} atualizado com sucesso!",
         "material_id": material_id,
-    })
+    }, version)
 
 
 
-@app.delete('/material_list/material_id', tags=[material_tag], responses={"200": MaterialListSchema_PrimaryKey, "422": ValidationErrorResponse},
+@api.delete('/material_list/material_id', tags=[material_tag], responses={"200": MaterialListSchema_PrimaryKey, "422": ValidationErrorResponse},
          summary="Requisição para deletar um materiais utilizados na construção do amigurumi")
 def delete_material_list_line(body: MaterialListSchema_PrimaryKey):
     data = body.dict() 
@@ -419,26 +1367,99 @@ def delete_material_list_line(body: MaterialListSchema_PrimaryKey):
 
 
 
+@api.post('/material_list/bulk', tags=[material_tag], responses={"200": MaterialListSchema_No_Auto_Bulk, "422": ValidationErrorResponse},
+         summary="Requisição para cadastrar vários materiais em uma única transação")
+def add_material_list_bulk(body: MaterialListSchema_No_Auto_Bulk):
+    data = [item.dict() for item in body.root]
+    missing = missing_ids(FoundationList.amigurumi_id, [item["amigurumi_id"] for item in data])
+
+    if missing:
+        return jsonify({"error": "Amigurumi não encontrado", "amigurumi_id": missing}), 404
+
+    try:
+        material_ids = bulk_insert(MaterialList, data)
+    except IntegrityError as error:
+        return integrity_error_response(error)
+
+    return jsonify({
+        "message": f"{len(material_ids)} materiais adicionados com sucesso!",
+        "material_ids": material_ids,
+    })
+
+
+
+@api.put('/material_list/bulk', tags=[material_tag], responses={"200": MaterialListSchema_All_Bulk, "422": ValidationErrorResponse},
+         summary="Requisição para alterar vários materiais em uma única transação")
+def update_material_list_bulk(body: MaterialListSchema_All_Bulk):
+    data = [item.dict() for item in body.root]
+    missing = missing_ids(MaterialList.material_id, [item["material_id"] for item in data])
+
+    if missing:
+        return jsonify({"error": "Materiais não encontrados", "material_id": missing}), 404
+
+    missing = missing_ids(FoundationList.amigurumi_id, [item["amigurumi_id"] for item in data])
+
+    if missing:
+        return jsonify({"error": "Amigurumi não encontrado", "amigurumi_id": missing}), 404
+
+    try:
+        bulk_update(MaterialList, data)
+    except IntegrityError as error:
+        return integrity_error_response(error)
+
+    return jsonify({
+        "message": f"{len(data)} materiais atualizados com sucesso!",
+        "material_ids": [item["material_id"] for item in data],
+    })
+
+
+
+@api.delete('/material_list/bulk', tags=[material_tag], responses={"200": MaterialListSchema_PrimaryKey_Bulk, "422": ValidationErrorResponse},
+         summary="Requisição para deletar vários materiais em uma única transação")
+def delete_material_list_bulk(body: MaterialListSchema_PrimaryKey_Bulk):
+    material_ids = [item.material_id for item in body.root]
+    missing = missing_ids(MaterialList.material_id, material_ids)
+
+    if missing:
+        return jsonify({"error": "Materiais não encontrados", "material_id": missing}), 404
+
+    bulk_delete(MaterialList.material_id, material_ids)
+
+    return jsonify({
+        "message": f"{len(material_ids)} materiais removidos com sucesso!",
+        "material_ids": material_ids,
+    })
+
+
+
 
 #----------------------------------- API para a tabela StichBook Sequence ------------------------#
-@app.get('/stitchbook_sequence', tags=[stichbook_sequence_tag], responses={"200": StitchBookSequenceSchema_All, "422": ValidationErrorResponse},
+@api.get('/stitchbook_sequence', tags=[stichbook_sequence_tag], responses={"200": StitchBookSequenceSchema_All, "422": ValidationErrorResponse},
          summary="Requisição para puxar todas as partes cadastradas dos amigurumis")
-def get_all_stichbook_sequence():
-    amigurumi_stiches = StitchBookSequence.query.order_by(
-        cast(StitchBookSequence.amigurumi_id, Integer).asc(),
-       cast(StitchBookSequence.element_order, Integer).asc()
-    ).all() 
-
-    result = [
-        {key: value for key, value in amigurumi.__dict__.items() if not key.startswith('_')}
-        for amigurumi in amigurumi_stiches
+@response_cache.cached("stitchbook_sequence")
+def get_all_stichbook_sequence(query: StitchBookSequenceQuery):
+    ordering = [
+        (StitchBookSequence.amigurumi_id, False),
+        (StitchBookSequence.element_order, False),
+        (StitchBookSequence.element_id, False),
     ]
 
-    return jsonify(result)
+    columns = columns_of(StitchBookSequence)
 
+    keys = column_keys(columns)
+
+    try:
+        return listing_response(
+            db.session.query(*columns).filter_by(**query_filters(query)), ordering,
+            key=lambda element: [element.amigurumi_id, element.element_order, element.element_id], query=query,
+            to_dict=lambda row: dict(zip(keys, row))
+        )
+    except ValueError as error:
+        return jsonify({"error": str(error)}), 400
 
 
-@app.post('/stitchbook_sequence', tags=[stichbook_sequence_tag], responses={"200": StitchBookSequenceSchema_No_Auto, "422": ValidationErrorResponse},
+
+@api.post('/stitchbook_sequence', tags=[stichbook_sequence_tag], responses={"200": StitchBookSequenceSchema_No_Auto, "422": ValidationErrorResponse},
          summary="Requisição para cadastrar uma nova parte à um amigurumi")
 def add_stichbook_sequence(body: StitchBookSequenceSchema_No_Auto):
     data = body.dict() 
@@ -460,31 +1481,27 @@ def add_stichbook_sequence(body: StitchBookSequenceSchema_No_Auto):
 
 
 
-@app.put('/stitchbook_sequence/element_id', tags=[stichbook_sequence_tag], responses={"200": StitchBookSequenceSchema_All, "422": ValidationErrorResponse},
+@api.put('/stitchbook_sequence/element_id', tags=[stichbook_sequence_tag], responses={"200": StitchBookSequenceSchema_Partial, "422": ValidationErrorResponse},
          summary="Requisição para alterar uma parte cadastrada de um amigurumi")
-def update_stichbook_sequence_element(body: StitchBookSequenceSchema_All):
-    data = body.dict() 
-    element_id = int(data.get('element_id'))
-    elementID = StitchBookSequence.query.get(element_id)  
+def update_stichbook_sequence_element(body: StitchBookSequenceSchema_Partial):
+    data = body.dict(exclude_unset=True)
+    element_id = int(data.pop('element_id'))
 
-    if not elementID:
-        return jsonify({"error": "Elemento não encontrado"}), 404
-
-    for key, value in data.items():
-        if hasattr(elementID, key):
-            setattr(elementID, key, value)
+    version, error = update_row(StitchBookSequence, element_id, data, "Elemento não encontrado")
+    if error:
+        return error
 
     db.session.commit()
 
-    return jsonify({
-        "message": f"Linha {elementID.element_id} atualizada com sucesso!",
+    return versioned_response({
+        "message": f"Linha {element_id} atualizada com sucesso!",
         "element_id": element_id,
-    })
+    }, version)
 
 
 
 
-@app.delete('/stitchbook_sequence/element_id', tags=[stichbook_sequence_tag], responses={"200": StitchBookSequenceSchema_PrimaryKey, "422": ValidationErrorResponse},
+@api.delete('/stitchbook_sequence/element_id', tags=[stichbook_sequence_tag], responses={"200": StitchBookSequenceSchema_PrimaryKey, "422": ValidationErrorResponse},
          summary="Requisição para deletar uma parte cadastrada de um amigurumi")
 def delete_stichbook_sequence_elementId(body: StitchBookSequenceSchema_PrimaryKey):
     data = body.dict() 
@@ -500,4 +1517,190 @@ def delete_stichbook_sequence_elementId(body: StitchBookSequenceSchema_PrimaryKe
     return jsonify({
         "message": f"Element_id {element_id} foi removido com sucesso!",
         "element_id": element_id,
-    })
\ No newline at end of file
+    })
+
+
+
+@api.post('/stitchbook_sequence/bulk', tags=[stichbook_sequence_tag], responses={"200": StitchBookSequenceSchema_No_Auto_Bulk, "422": ValidationErrorResponse},
+         summary="Requisição para cadastrar vários elementos em uma única transação")
+def add_stichbook_sequence_bulk(body: StitchBookSequenceSchema_No_Auto_Bulk):
+    data = [item.dict() for item in body.root]
+    missing = missing_ids(FoundationList.amigurumi_id, [item["amigurumi_id"] for item in data])
+
+    if missing:
+        return jsonify({"error": "Amigurumi não encontrado", "amigurumi_id": missing}), 404
+
+    try:
+        element_ids = bulk_insert(StitchBookSequence, data)
+    except IntegrityError as error:
+        return integrity_error_response(error)
+
+    return jsonify({
+        "message": f"{len(element_ids)} elementos adicionados com sucesso!",
+        "element_ids": element_ids,
+    })
+
+
+
+@api.put('/stitchbook_sequence/bulk', tags=[stichbook_sequence_tag], responses={"200": StitchBookSequenceSchema_All_Bulk, "422": ValidationErrorResponse},
+         summary="Requisição para alterar vários elementos em uma única transação")
+def update_stichbook_sequence_bulk(body: StitchBookSequenceSchema_All_Bulk):
+    data = [item.dict() for item in body.root]
+    missing = missing_ids(StitchBookSequence.element_id, [item["element_id"] for item in data])
+
+    if missing:
+        return jsonify({"error": "Elementos não encontrados", "element_id": missing}), 404
+
+    missing = missing_ids(FoundationList.amigurumi_id, [item["amigurumi_id"] for item in data])
+
+    if missing:
+        return jsonify({"error": "Amigurumi não encontrado", "amigurumi_id": missing}), 404
+
+    try:
+        bulk_update(StitchBookSequence, data)
+    except IntegrityError as error:
+        return integrity_error_response(error)
+
+    return jsonify({
+        "message": f"{len(data)} elementos atualizados com sucesso!",
+        "element_ids": [item["element_id"] for item in data],
+    })
+
+
+
+@api.delete('/stitchbook_sequence/bulk', tags=[stichbook_sequence_tag], responses={"200": StitchBookSequenceSchema_PrimaryKey_Bulk, "422": ValidationErrorResponse},
+         summary="Requisição para deletar vários elementos em uma única transação")
+def delete_stichbook_sequence_bulk(body: StitchBookSequenceSchema_PrimaryKey_Bulk):
+    element_ids = [item.element_id for item in body.root]
+    missing = missing_ids(StitchBookSequence.element_id, element_ids)
+
+    if missing:
+        return jsonify({"error": "Elementos não encontrados", "element_id": missing}), 404
+
+    bulk_delete(StitchBookSequence.element_id, element_ids)
+
+    return jsonify({
+        "message": f"{len(element_ids)} elementos removidos com sucesso!",
+        "element_ids": element_ids,
+    })
+
+
+
+#inserção de uma parte no meio do amigurumi: as partes a partir de element_order descem uma posição no mesmo UPDATE
+@api.post('/stitchbook_sequence/insert', tags=[stichbook_sequence_tag], responses={"200": StitchBookSequenceSchema_No_Auto, "422": ValidationErrorResponse},
+          summary="Requisição para inserir uma parte na posição element_order do amigurumi, deslocando as seguintes")
+def insert_stichbook_sequence(body: StitchBookSequenceSchema_No_Auto):
+    data = body.dict()
+
+    if db.session.get(FoundationList, data["amigurumi_id"]) is None:
+        return jsonify({"error": "Amigurumi não encontrado"}), 404
+
+    shifted = open_position(
+        db.session, StitchBookSequence, StitchBookSequence.amigurumi_id, data["amigurumi_id"],
+        StitchBookSequence.element_order, data["element_order"]
+    )
+
+    new_element = StitchBookSequence(**data)
+    db.session.add(new_element)
+
+    try:
+        db.session.commit()
+    except IntegrityError as error:
+        return integrity_error_response(error)
+
+    return jsonify({
+        "message": f"Parte inserida com sucesso na posição {new_element.element_order}!",
+        "element_id": new_element.element_id,
+        "shifted": shifted,
+    })
+
+
+
+@api.post('/stitchbook_sequence/<int:element_id>/move', tags=[stichbook_sequence_tag], responses={"422": ValidationErrorResponse},
+          summary="Requisição para mover uma parte para outra posição do amigurumi, deslocando as partes entre as duas posições")
+def move_stichbook_sequence_element(path: StitchBookSequencePath, body: StitchBookSequenceMove):
+    shifted = move_to_position(
+        db.session, StitchBookSequence, path.element_id, StitchBookSequence.amigurumi_id,
+        StitchBookSequence.element_order, body.element_order
+    )
+
+    if shifted is None:
+        return jsonify({"error": "Elemento não encontrado"}), 404
+
+    try:
+        db.session.commit()
+    except IntegrityError as error:
+        return integrity_error_response(error)
+
+    return jsonify({
+        "message": f"Elemento {path.element_id} movido para a posição {body.element_order}!",
+        "element_id": path.element_id,
+        "shifted": shifted,
+    })
+
+
+
+
+#----------------------------------- Contagem de pontos ------------------------#
+# Totais somados no banco a partir das contagens gravadas em cada carreira, sem interpretar stich_sequence na leitura.
+# Os totais "total_*" multiplicam a contagem da parte pela sua quantidade (repetition)
+STITCH_COUNT_KEYS = ("stitch_count", "increase_count", "decrease_count")
+
+def element_stitch_counts(filters):
+    sequence_columns = columns_of(StitchBookSequence)
+    totals = [
+        func.count(StitchBook.line_id).label("row_count"),
+        func.count(StitchBook.stitch_count).label("counted_row_count"),
+        *[func.coalesce(func.sum(getattr(StitchBook, key)), 0).label(key) for key in STITCH_COUNT_KEYS],
+    ]
+
+    rows = db.session.query(*sequence_columns, *totals).outerjoin(
+        StitchBook, StitchBook.element_id == StitchBookSequence.element_id
+    ).filter(*filters).group_by(*sequence_columns).order_by(
+        StitchBookSequence.amigurumi_id, StitchBookSequence.element_order, StitchBookSequence.element_id
+    ).all()
+
+    elements = []
+    for row in rows:
+        element = row._asdict()
+        for key in STITCH_COUNT_KEYS:
+            element[f"total_{key}"] = element[key] * element["repetition"]
+        elements.append(element)
+
+    return elements
+
+
+
+@api.get('/stitchbook_sequence/stitch_count', tags=[stichbook_sequence_tag], responses={"422": ValidationErrorResponse},
+         summary="Requisição para puxar a contagem de pontos, aumentos e diminuições de cada parte dos amigurumis")
+@response_cache.cached("stitchbook_sequence", "stitchbook")
+def get_element_stitch_count(query: StitchCountQuery):
+    filters = []
+
+    if query.amigurumi_id is not None:
+        filters.append(StitchBookSequence.amigurumi_id == query.amigurumi_id)
+
+    if query.element_id is not None:
+        filters.append(StitchBookSequence.element_id == query.element_id)
+
+    return json_response(element_stitch_counts(filters))
+
+
+
+@api.get('/amigurumi/<int:amigurumi_id>/stitch_count', tags=[foundation_tag], responses={"422": ValidationErrorResponse},
+         summary="Requisição para puxar a contagem de pontos do amigurumi, somando todas as partes e as suas quantidades")
+@response_cache.cached("foundation_list", "stitchbook_sequence", "stitchbook")
+def get_amigurumi_stitch_count(path: AmigurumiPath):
+    amigurumi = db.session.get(FoundationList, path.amigurumi_id)
+
+    if not amigurumi:
+        return jsonify({"error": "Amigurumi não encontrado"}), 404
+
+    elements = element_stitch_counts([StitchBookSequence.amigurumi_id == path.amigurumi_id])
+
+    result = {"amigurumi_id": amigurumi.amigurumi_id, "name": amigurumi.name}
+    for key in ("row_count", "counted_row_count", *[f"total_{key}" for key in STITCH_COUNT_KEYS]):
+        result[key] = sum(element[key] for element in elements)
+    result["elements"] = elements
+
+    return json_response(result)
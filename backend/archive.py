@@ -0,0 +1,440 @@
+import hashlib
+import json
+import os
+import re
+import shutil
+import tempfile
+import zipfile
+from datetime import date, datetime, timezone
+
+from sqlalchemy import func, insert, inspect, select, union_all, update
+from sqlalchemy.exc import IntegrityError
+
+from blob_store import FILE_CHUNK_SIZE, decode_base64_image
+from image_uploads import UploadTooLarge
+from stitch_notation import stitch_counts
+from table import FoundationList, Image, MaterialList, StitchBook, StitchBookSequence
+
+try:
+    import msgpack
+except ImportError:
+    msgpack = None
+
+
+#---------------------------------------------------------------------------#
+# Arquivo de receitas: um zip com manifest.json, uma entrada por tabela (linhas em msgpack, ou NDJSON sem o pacote msgpack)
+# e o conteúdo de cada imagem em images/<sha256>, sem compressão (as imagens já são comprimidas).
+# As tabelas estão na ordem de importação: cada uma referencia apenas as anteriores
+ARCHIVE_VERSION = 1
+ARCHIVE_MODELS = (FoundationList, StitchBookSequence, StitchBook, MaterialList, Image)
+ARCHIVE_BATCH_SIZE = 1000
+IMAGE_ENTRY = re.compile(r"^images/([0-9a-f]{64})$")
+
+
+class ArchiveError(ValueError):
+    pass
+
+
+#a versão da linha não é exportada: as linhas importadas são novas e começam na versão 1
+def archive_columns(model):
+    return [column for column in inspect(model).columns if column.key not in ("image_base64", "version")]
+
+
+def row_format():
+    return "msgpack" if msgpack is not None else "ndjson"
+
+
+#datas em texto ISO, tanto em msgpack quanto em JSON
+def to_archive_value(value):
+    if isinstance(value, (date, datetime)):
+        return value.isoformat()
+    return value
+
+
+def from_archive_value(column, value):
+    if value is None:
+        return None
+    if column.type.python_type is datetime:
+        return datetime.fromisoformat(value)
+    if column.type.python_type is date:
+        return date.fromisoformat(value)
+    return value
+
+
+def encode_rows(rows, fmt):
+    if fmt == "msgpack":
+        return b"".join(msgpack.packb(row) for row in rows)
+    return b"".join(json.dumps(row, ensure_ascii=False).encode("utf-8") + b"\n" for row in rows)
+
+
+def decode_rows(entry, fmt):
+    if fmt == "msgpack":
+        yield from msgpack.Unpacker(entry, raw=False)
+    else:
+        for line in entry:
+            if line.strip():
+                yield json.loads(line)
+
+
+def batches(rows, size=ARCHIVE_BATCH_SIZE):
+    batch = []
+    for row in rows:
+        batch.append(row)
+        if len(batch) >= size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+#---------------------------------------------------------------------------#
+# Exportação em streaming: o zip é escrito em um destino sem seek (o zipfile usa descritores de dados)
+# e os bytes são entregues a cada bloco de linhas ou de imagem, sem montar o arquivo inteiro na memória
+class ZipStream:
+    def __init__(self):
+        self.chunks = []
+
+    def write(self, data):
+        self.chunks.append(bytes(data))
+        return len(data)
+
+    def flush(self):
+        pass
+
+    def drain(self):
+        data = b"".join(self.chunks)
+        self.chunks.clear()
+        return data
+
+
+def export_archive(session, store, amigurumi_ids=None):
+    fmt = row_format()
+    output = ZipStream()
+    manifest = {
+        "version": ARCHIVE_VERSION,
+        "created_at": datetime.now(timezone.utc).isoformat(),
+        "row_format": fmt,
+        "tables": {},
+        "images": 0,
+    }
+    content_hashes = {}
+
+    with zipfile.ZipFile(output, "w", compression=zipfile.ZIP_DEFLATED) as archive:
+        for model in ARCHIVE_MODELS:
+            columns = archive_columns(model)
+            statement = select(*columns).order_by(*inspect(model).primary_key)
+
+            if model is Image:
+                statement = statement.add_columns(Image.image_base64)
+            if amigurumi_ids is not None:
+                statement = statement.where(model.amigurumi_id.in_(amigurumi_ids))
+
+            count = 0
+            with archive.open(f"tables/{model.__tablename__}.{fmt}", "w", force_zip64=True) as entry:
+                for batch in batches(session.execute(statement.execution_options(yield_per=ARCHIVE_BATCH_SIZE))):
+                    rows = []
+                    for row in batch:
+                        values = dict(zip((column.key for column in columns), row))
+
+                        if model is Image:
+                            collect_image_content(values, row[-1], store, content_hashes)
+
+                        rows.append([to_archive_value(values[column.key]) for column in columns])
+
+                    entry.write(encode_rows(rows, fmt))
+                    count += len(rows)
+                    yield output.drain()
+
+            manifest["tables"][model.__tablename__] = {"columns": [column.key for column in columns], "rows": count}
+
+        for content_hash, content in content_hashes.items():
+            info = zipfile.ZipInfo(f"images/{content_hash}")
+            info.compress_type = zipfile.ZIP_STORED
+
+            with archive.open(info, "w", force_zip64=True) as entry:
+                if content is not None:
+                    entry.write(content)
+                else:
+                    with open(store.path(content_hash), "rb") as source:
+                        for chunk in iter(lambda: source.read(FILE_CHUNK_SIZE), b""):
+                            entry.write(chunk)
+                            yield output.drain()
+
+            manifest["images"] += 1
+            yield output.drain()
+
+        archive.writestr("manifest.json", json.dumps(manifest, indent=2))
+
+    yield output.drain()
+
+
+#conteúdo de cada imagem exportada: o arquivo do armazenamento, ou o base64 das linhas antigas ainda não migradas
+def collect_image_content(values, image_base64, store, content_hashes):
+    if values["content_hash"] is None and image_base64:
+        try:
+            content, content_type = decode_base64_image(image_base64, strict=False)
+        except ValueError:
+            return
+
+        values["content_hash"] = hashlib.sha256(content).hexdigest()
+        values["content_type"] = content_type
+        values["content_size"] = len(content)
+        content_hashes.setdefault(values["content_hash"], content)
+
+    elif values["content_hash"] is not None and store.exists(values["content_hash"]):
+        content_hashes.setdefault(values["content_hash"], None)
+
+
+#---------------------------------------------------------------------------#
+# Importação: as imagens vão para o armazenamento e as linhas são inseridas em lotes, com novos ids.
+# Os ids antigos são trocados pelos novos em amigurumi_id, relationship e element_id; list_id e colour_id
+# (agrupadores sem tabela própria) recebem valores ainda não utilizados no banco, mantendo as ligações entre as tabelas
+class IdMap:
+    def __init__(self, name, next_value=None):
+        self.name = name
+        self.values = {}
+        self.next_value = next_value
+
+    def __getitem__(self, old):
+        if old is None:
+            return None
+        try:
+            return self.values[old]
+        except KeyError:
+            raise ArchiveError(f"Arquivo inconsistente: {self.name} {old} não encontrado")
+
+    #agrupadores: cada valor antigo recebe o próximo valor livre
+    def group(self, old):
+        if old is None:
+            return None
+        if old not in self.values:
+            self.values[old] = self.next_value
+            self.next_value += 1
+        return self.values[old]
+
+
+def next_free_value(session, *columns):
+    values = union_all(*(select(func.max(column).label("value")) for column in columns)).subquery()
+    return (session.scalar(select(func.max(values.c.value))) or 0) + 1
+
+
+def spool_archive(stream, max_bytes):
+    spool = tempfile.TemporaryFile()
+    size = 0
+
+    for chunk in iter(lambda: stream.read(FILE_CHUNK_SIZE), b""):
+        size += len(chunk)
+        if size > max_bytes:
+            spool.close()
+            raise UploadTooLarge(f"Arquivo maior que o limite de {max_bytes} bytes")
+        spool.write(chunk)
+
+    spool.seek(0)
+    return spool
+
+
+def import_archive(session, store, source):
+    try:
+        with zipfile.ZipFile(source) as archive:
+            return import_entries(session, store, archive)
+    except zipfile.BadZipFile:
+        raise ArchiveError("Arquivo zip inválido")
+
+
+#---------------------------------------------------------------------------#
+# Validação do manifest antes da leitura de qualquer linha ou imagem: versão, formato das linhas e, para cada tabela,
+# a lista de colunas (com a chave primária e as colunas obrigatórias) e a entrada correspondente no zip
+ROW_FORMATS = ("msgpack", "ndjson")
+ARCHIVE_TABLES = {model.__tablename__: model for model in ARCHIVE_MODELS}
+
+
+def required_columns(model):
+    return [
+        column.key for column in archive_columns(model)
+        if column.primary_key or (not column.nullable and column.default is None and column.server_default is None)
+    ]
+
+
+def read_manifest(archive):
+    try:
+        manifest = json.loads(archive.read("manifest.json"))
+    except KeyError:
+        raise ArchiveError("Arquivo sem manifest.json")
+    except ValueError:
+        raise ArchiveError("manifest.json inválido")
+
+    if not isinstance(manifest, dict):
+        raise ArchiveError("manifest.json inválido")
+
+    if manifest.get("version") != ARCHIVE_VERSION:
+        raise ArchiveError(f"Versão do arquivo não suportada: {manifest.get('version')}")
+
+    fmt = manifest.get("row_format")
+    if fmt not in ROW_FORMATS:
+        raise ArchiveError(f"Formato das linhas não suportado: {fmt}")
+    if fmt == "msgpack" and msgpack is None:
+        raise ArchiveError("Arquivo em msgpack: instale o pacote msgpack para importá-lo")
+
+    tables = manifest.get("tables")
+    if not isinstance(tables, dict):
+        raise ArchiveError("manifest.json sem a lista de tabelas")
+
+    names = set(archive.namelist())
+
+    for table_name, table in tables.items():
+        model = ARCHIVE_TABLES.get(table_name)
+        if model is None:
+            raise ArchiveError(f"Tabela desconhecida no arquivo: {table_name}")
+
+        columns = table.get("columns") if isinstance(table, dict) else None
+        if not isinstance(columns, list) or not all(isinstance(column, str) for column in columns):
+            raise ArchiveError(f"Colunas da tabela {table_name} inválidas no manifest.json")
+
+        missing = [column for column in required_columns(model) if column not in columns]
+        if missing:
+            raise ArchiveError(f"Colunas obrigatórias ausentes na tabela {table_name}: {', '.join(missing)}")
+
+        if f"tables/{table_name}.{fmt}" not in names:
+            raise ArchiveError(f"Arquivo sem as linhas da tabela {table_name}")
+
+    return manifest
+
+
+def import_entries(session, store, archive):
+    manifest = read_manifest(archive)
+    stored = []
+
+    #as imagens já armazenadas têm a data renovada (como em BlobStore.put), e os arquivos que ficarem sem nenhuma linha
+    #quando a importação falha são removidos depois por sweep-image-blobs
+    try:
+        for name in archive.namelist():
+            match = IMAGE_ENTRY.match(name)
+            if match and not store.touch(match.group(1)):
+                stored.append(import_image(store, archive, name, match.group(1)))
+
+        result = import_tables(session, archive, manifest)
+        session.commit()
+    except IntegrityError:
+        #linhas que violam as restrições do banco (coluna obrigatória vazia, duas imagens principais no mesmo amigurumi)
+        session.rollback()
+        raise ArchiveError("Linhas do arquivo violam as restrições do banco")
+    except BaseException:
+        session.rollback()
+        raise
+
+    result["images"] = len(stored)
+    return result
+
+
+#cópia em blocos para um arquivo temporário no armazenamento, conferindo o hash do conteúdo com o nome da entrada
+def import_image(store, archive, name, content_hash):
+    upload_dir = os.path.join(store.root, ".uploads")
+    os.makedirs(upload_dir, exist_ok=True)
+    fd, temp_path = tempfile.mkstemp(dir=upload_dir, prefix="import-")
+
+    try:
+        with os.fdopen(fd, "wb") as output, archive.open(name) as entry:
+            shutil.copyfileobj(entry, output, FILE_CHUNK_SIZE)
+
+        digest = store.put_file(temp_path)
+    finally:
+        if os.path.exists(temp_path):
+            os.remove(temp_path)
+
+    #o arquivo gravado com o hash real, se não for de outra imagem, é removido depois por sweep-image-blobs
+    if digest != content_hash:
+        raise ArchiveError(f"Conteúdo da imagem {content_hash} não confere com o hash")
+
+    return digest
+
+
+def table_rows(archive, manifest, model):
+    table = manifest["tables"].get(model.__tablename__)
+    if table is None:
+        return
+
+    columns = {column.key: column for column in inspect(model).columns}
+    keys = table["columns"]
+    fmt = manifest["row_format"]
+
+    #linhas corrompidas (conteúdo que não é msgpack/JSON, linha que não é uma lista ou data inválida) recusam o arquivo
+    with archive.open(f"tables/{model.__tablename__}.{fmt}") as entry:
+        try:
+            for row in decode_rows(entry, fmt):
+                if not isinstance(row, list) or len(row) != len(keys):
+                    raise ArchiveError(f"Linha inválida na tabela {model.__tablename__}")
+
+                yield {key: from_archive_value(columns[key], value) for key, value in zip(keys, row) if key in columns}
+        except (ValueError, TypeError) as error:
+            if isinstance(error, ArchiveError):
+                raise
+            raise ArchiveError(f"Linhas corrompidas na tabela {model.__tablename__}")
+
+
+#inserção em lote retornando os novos ids, na mesma ordem das linhas (ver bulk_insert em app.py)
+def insert_rows(session, model, rows):
+    primary_key = inspect(model).primary_key[0]
+    return sorted(session.scalars(insert(model).returning(primary_key), rows).all())
+
+
+def import_tables(session, archive, manifest):
+    amigurumis = IdMap("amigurumi_id")
+    elements = IdMap("element_id")
+    lists = IdMap("list_id", next_free_value(session, MaterialList.list_id, Image.list_id))
+    colours = IdMap("colour_id", next_free_value(session, MaterialList.colour_id, StitchBook.colour_id))
+    counts = {}
+
+    #amigurumis sem relationship na inserção; as relações entre amigurumis do arquivo são gravadas depois
+    relationships = []
+    for batch in batches(table_rows(archive, manifest, FoundationList)):
+        old_ids = [row.pop("amigurumi_id") for row in batch]
+        relationships.extend((old_id, row.pop("relationship", None)) for old_id, row in zip(old_ids, batch))
+        amigurumis.values.update(zip(old_ids, insert_rows(session, FoundationList, batch)))
+
+    related = [
+        {"amigurumi_id": amigurumis[old_id], "relationship": amigurumis.values[relationship]}
+        for old_id, relationship in relationships if relationship in amigurumis.values
+    ]
+    if related:
+        session.execute(update(FoundationList), related)
+    counts["foundation_list"] = len(amigurumis.values)
+
+    counts["stitchbook_sequence"] = 0
+    for batch in batches(table_rows(archive, manifest, StitchBookSequence)):
+        old_ids = [row.pop("element_id") for row in batch]
+        for row in batch:
+            row["amigurumi_id"] = amigurumis[row["amigurumi_id"]]
+        elements.values.update(zip(old_ids, insert_rows(session, StitchBookSequence, batch)))
+        counts["stitchbook_sequence"] += len(batch)
+
+    counts["stitchbook"] = 0
+    for batch in batches(table_rows(archive, manifest, StitchBook)):
+        for row in batch:
+            row.pop("line_id", None)
+            row["amigurumi_id"] = amigurumis[row["amigurumi_id"]]
+            row["element_id"] = elements[row["element_id"]]
+            row["colour_id"] = colours.group(row["colour_id"])
+            row.update(stitch_counts(row["stich_sequence"]))
+        insert_rows(session, StitchBook, batch)
+        counts["stitchbook"] += len(batch)
+
+    counts["material_list"] = 0
+    for batch in batches(table_rows(archive, manifest, MaterialList)):
+        for row in batch:
+            row.pop("material_id", None)
+            row["amigurumi_id"] = amigurumis[row["amigurumi_id"]]
+            row["list_id"] = lists.group(row["list_id"])
+            row["colour_id"] = colours.group(row.get("colour_id"))
+        insert_rows(session, MaterialList, batch)
+        counts["material_list"] += len(batch)
+
+    counts["image"] = 0
+    for batch in batches(table_rows(archive, manifest, Image)):
+        for row in batch:
+            row.pop("image_id", None)
+            row["amigurumi_id"] = amigurumis[row["amigurumi_id"]]
+            row["list_id"] = lists.group(row["list_id"])
+        insert_rows(session, Image, batch)
+        counts["image"] += len(batch)
+
+    return {"amigurumi_ids": amigurumis.values, "counts": counts}
@@ -0,0 +1,165 @@
+import base64
+import binascii
+import hashlib
+import os
+import tempfile
+
+
+#---------------------------------------------------------------------------#
+# Identificação do formato da imagem pelos primeiros bytes do arquivo
+IMAGE_SIGNATURES = [
+    (b"\x89PNG\r\n\x1a\n", "image/png"),
+    (b"\xff\xd8\xff", "image/jpeg"),
+    (b"GIF87a", "image/gif"),
+    (b"GIF89a", "image/gif"),
+    (b"BM", "image/bmp"),
+]
+
+def sniff_content_type(data):
+    for signature, content_type in IMAGE_SIGNATURES:
+        if data.startswith(signature):
+            return content_type
+
+    if data[:4] == b"RIFF" and data[8:12] == b"WEBP":
+        return "image/webp"
+
+    return "application/octet-stream"
+
+
+#---------------------------------------------------------------------------#
+# Conversão do base64 recebido pela API (puro ou no formato data URL) para os bytes da imagem. Com strict (imagens
+# novas), o base64 precisa ser válido e o conteúdo um formato de imagem reconhecido; sem strict, usado apenas nas linhas
+# antigas ainda gravadas em base64, o conteúdo é aceito como está e o tipo declarado no data URL serve de alternativa
+def decode_base64_image(value, strict=True):
+    declared_type = None
+
+    if value.startswith("data:"):
+        header, _, value = value.partition(",")
+        declared_type = header[len("data:"):].split(";")[0] or None
+
+    try:
+        data = base64.b64decode("".join(value.split()) if strict else value, validate=strict)
+    except (binascii.Error, ValueError):
+        raise ValueError("Imagem em base64 inválida")
+
+    if not data:
+        raise ValueError("Imagem em base64 inválida")
+
+    content_type = sniff_content_type(data)
+
+    if content_type == "application/octet-stream":
+        if strict:
+            raise ValueError("Formato de imagem não suportado")
+        if declared_type:
+            content_type = declared_type
+
+    return data, content_type
+
+
+FILE_CHUNK_SIZE = 1024 * 1024
+
+
+#---------------------------------------------------------------------------#
+# Armazenamento das imagens em disco, endereçado pelo SHA-256 do conteúdo: imagens repetidas são gravadas uma única vez
+class BlobStore:
+    def __init__(self, root=None):
+        self.root = root
+
+    #caminho definido por BLOB_STORE_PATH, relativo à pasta instance da aplicação
+    def init_app(self, app):
+        self.root = os.path.join(app.instance_path, app.config["BLOB_STORE_PATH"])
+
+    def path(self, digest):
+        return os.path.join(self.root, digest[:2], digest[2:4], digest)
+
+    def exists(self, digest):
+        return os.path.exists(self.path(digest))
+
+    #o arquivo reaproveitado tem a data de modificação renovada, para que sweep_image_blobs não o remova antes do commit
+    #da linha que passa a utilizá-lo; False quando o arquivo não existe (ou acabou de ser removido)
+    def touch(self, digest):
+        try:
+            os.utime(self.path(digest))
+            return True
+        except FileNotFoundError:
+            return False
+
+    def put(self, data):
+        digest = hashlib.sha256(data).hexdigest()
+        path = self.path(digest)
+
+        if self.touch(digest):
+            return digest
+
+        directory = os.path.dirname(path)
+        os.makedirs(directory, exist_ok=True)
+
+        #gravação em arquivo temporário e troca atômica, para que nenhum leitor veja um blob incompleto
+        fd, temp_path = tempfile.mkstemp(dir=directory, prefix=".tmp-")
+        try:
+            with os.fdopen(fd, "wb") as temp_file:
+                temp_file.write(data)
+            os.replace(temp_path, path)
+        except BaseException:
+            if os.path.exists(temp_path):
+                os.remove(temp_path)
+            raise
+
+        return digest
+
+    #arquivo já gravado em disco (envio em segundo plano): o hash é calculado em blocos e o arquivo é movido
+    #para o armazenamento, sem carregar a imagem inteira na memória. A origem deve estar no mesmo disco (dentro de root)
+    def put_file(self, source_path):
+        sha256 = hashlib.sha256()
+        with open(source_path, "rb") as source:
+            for chunk in iter(lambda: source.read(FILE_CHUNK_SIZE), b""):
+                sha256.update(chunk)
+
+        digest = sha256.hexdigest()
+        path = self.path(digest)
+
+        if self.touch(digest):
+            os.remove(source_path)
+            return digest
+
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        os.replace(source_path, path)
+        self.touch(digest)
+        return digest
+
+    #arquivos armazenados, com a data da última gravação ou reaproveitamento (os temporários começam com ponto)
+    def stored(self):
+        if not os.path.isdir(self.root):
+            return
+
+        for first in os.scandir(self.root):
+            if first.name.startswith(".") or not first.is_dir():
+                continue
+
+            for second in os.scandir(first.path):
+                if not second.is_dir():
+                    continue
+
+                for entry in os.scandir(second.path):
+                    if not entry.name.startswith(".") and entry.is_file():
+                        yield entry.name, entry.stat().st_mtime
+
+    #remoção feita apenas por sweep_image_blobs; com older_than, o arquivo gravado ou reaproveitado depois desse
+    #instante é mantido. O arquivo é primeiro renomeado e a data conferida em seguida: um put que o reaproveitou antes
+    #da troca de nome renovou a data (e o arquivo volta para o lugar), e um put depois dela grava o arquivo de novo.
+    #Retorna se o arquivo foi removido
+    def delete(self, digest, older_than=None):
+        path = self.path(digest)
+        removed_path = os.path.join(os.path.dirname(path), f".delete-{digest}")
+
+        try:
+            os.rename(path, removed_path)
+        except FileNotFoundError:
+            return False
+
+        if older_than is not None and os.stat(removed_path).st_mtime >= older_than:
+            os.replace(removed_path, path)
+            return False
+
+        os.remove(removed_path)
+        return True
@@ -0,0 +1,320 @@
+from datetime import datetime, timedelta, timezone
+
+from sqlalchemy import delete, event, func, insert, inspect, select, text
+from sqlalchemy.engine import CursorResult
+
+from serializer import column_keys, columns_of
+from table import ChangeLog, FoundationList, Image, MaterialList, StitchBook, StitchBookSequence
+
+
+#tabelas sincronizadas por /changes; todas possuem a coluna amigurumi_id
+CHANGE_SOURCES = {
+    model.__tablename__: model
+    for model in (FoundationList, StitchBookSequence, StitchBook, MaterialList, Image)
+}
+
+
+#colunas devolvidas com cada alteração: as mesmas das listagens (o conteúdo das imagens é baixado pelo link)
+CHANGE_COLUMNS = {
+    table_name: columns_of(model, exclude=("image_base64",))
+    for table_name, model in CHANGE_SOURCES.items()
+}
+
+
+def primary_key_of(table):
+    return table.primary_key.columns.values()[0]
+
+
+#---------------------------------------------------------------------------#
+# Gravação do registro: uma linha por linha alterada, no mesmo INSERT de múltiplos VALUES e na mesma transação da escrita,
+# de modo que um rollback também desfaz o registro. Repetições da mesma linha na mesma escrita são gravadas uma única vez,
+# e a exclusão prevalece sobre a alteração (linhas alteradas pelo SET NULL e excluídas pela mesma escrita).
+#
+# O cursor de /changes é o maior change_id lido, e por isso os change_id precisam ficar visíveis na ordem em que são
+# gerados: um change_id menor gravado depois do cursor nunca seria entregue. No SQLite há um único escritor por vez,
+# e a ordem é garantida pelo próprio banco. Em bancos com escritas concorrentes (Postgres, pela DATABASE_URL) duas
+# transações podem gerar 10 e 11 e confirmar o 11 primeiro, então a tabela change_log é travada até o fim da transação
+# antes do INSERT: as escritas que alteram as tabelas sincronizadas passam a ser confirmadas uma de cada vez, e as
+# leituras não são bloqueadas
+CHANGE_LOG_LOCK = "LOCK TABLE change_log IN SHARE ROW EXCLUSIVE MODE"
+
+
+def lock_change_log(connection):
+    if connection.dialect.name == "postgresql":
+        connection.execute(text(CHANGE_LOG_LOCK))
+
+
+def log_changes(connection, changes):
+    entries = {}
+
+    for table_name, row_id, operation, amigurumi_id in changes:
+        key = (table_name, row_id, amigurumi_id)
+        if entries.get(key) not in ("delete", "insert"):
+            entries[key] = operation
+
+    if not entries:
+        return
+
+    lock_change_log(connection)
+
+    now = datetime.now(timezone.utc).replace(tzinfo=None)
+    connection.execute(insert(ChangeLog.__table__), [
+        {"table_name": table_name, "row_id": row_id, "operation": operation, "amigurumi_id": amigurumi_id, "changed_at": now}
+        for (table_name, row_id, amigurumi_id), operation in entries.items()
+    ])
+
+
+#linhas de outras tabelas alcançadas pelas chaves estrangeiras na exclusão: excluídas (ON DELETE CASCADE, em todos os
+#níveis) ou alteradas (ON DELETE SET NULL, como a coluna relationship dos amigurumis derivados)
+def cascaded_changes(connection, table, row_ids):
+    changes = []
+
+    for source in CHANGE_SOURCES.values():
+        source_table = source.__table__
+
+        for foreign_key in source_table.foreign_keys:
+            if foreign_key.column.table.name != table.name or foreign_key.ondelete not in ("CASCADE", "SET NULL"):
+                continue
+
+            primary_key = primary_key_of(source_table)
+            rows = connection.execute(
+                select(primary_key, source_table.c.amigurumi_id).where(foreign_key.parent.in_(row_ids))
+            ).all()
+
+            if foreign_key.ondelete == "SET NULL":
+                changes.extend((source_table.name, row_id, "update", amigurumi_id) for row_id, amigurumi_id in rows)
+                continue
+
+            changes.extend((source_table.name, row_id, "delete", amigurumi_id) for row_id, amigurumi_id in rows)
+            if rows:
+                changes.extend(cascaded_changes(connection, source_table, [row_id for row_id, _ in rows]))
+
+    return changes
+
+
+#---------------------------------------------------------------------------#
+# Identificação das linhas alteradas em cada escrita, tanto pelo flush do ORM (add/setattr/delete)
+# quanto pelos INSERT/UPDATE/DELETE em lote executados pela sessão
+def flushed_changes(session):
+    changes = []
+
+    for operation, objects in (("insert", session.new), ("update", session.dirty), ("delete", session.deleted)):
+        for obj in objects:
+            if getattr(obj, "__tablename__", None) not in CHANGE_SOURCES:
+                continue
+
+            if operation == "update" and not session.is_modified(obj, include_collections=False):
+                continue
+
+            state = inspect(obj)
+            row_id = state.dict.get(state.mapper.primary_key[0].key)
+            changes.append((obj.__tablename__, row_id, operation, state.dict.get("amigurumi_id")))
+
+            #a linha movida para outro amigurumi também é registrada no amigurumi anterior
+            if operation == "update":
+                changes.extend(
+                    (obj.__tablename__, row_id, "update", amigurumi_id)
+                    for amigurumi_id in state.attrs.amigurumi_id.history.deleted or ()
+                )
+
+    return changes
+
+
+#linhas alteradas ou excluídas pelo comando, lidas antes da execução (pela chave primária de cada linha ou pelo WHERE)
+def statement_changes(connection, table, statement, parameters, operation):
+    rows = parameters if isinstance(parameters, list) else [parameters] if parameters else []
+    primary_key = primary_key_of(table)
+    selection = select(primary_key, table.c.amigurumi_id)
+
+    primary_keys = [row[primary_key.key] for row in rows if primary_key.key in row]
+    whereclause = getattr(statement, "whereclause", None)
+
+    found = []
+    if primary_keys:
+        found.extend(connection.execute(selection.where(primary_key.in_(primary_keys))))
+    if whereclause is not None:
+        found.extend(connection.execute(selection.where(whereclause)))
+
+    changes = [(table.name, row_id, operation, amigurumi_id) for row_id, amigurumi_id in found]
+
+    #novo amigurumi das linhas movidas pela alteração em lote
+    changes.extend(
+        (table.name, row[primary_key.key], operation, row["amigurumi_id"])
+        for row in rows if primary_key.key in row and "amigurumi_id" in row
+    )
+
+    if operation == "delete" and found:
+        changes.extend(cascaded_changes(connection, table, [row_id for row_id, _ in found]))
+
+    return changes
+
+
+#linhas incluídas pelo comando: as chaves vêm do RETURNING (ou dos parâmetros, quando informadas) e o amigurumi
+#de cada linha é lido em seguida, já que o RETURNING não segue necessariamente a ordem dos parâmetros
+def inserted_changes(connection, table, rows, parameters):
+    primary_key = primary_key_of(table)
+    row_ids = [row[primary_key.key] for row in rows if row.get(primary_key.key) is not None]
+
+    if not row_ids:
+        parameters = parameters if isinstance(parameters, list) else [parameters] if parameters else []
+        row_ids = [row[primary_key.key] for row in parameters if row.get(primary_key.key) is not None]
+
+    if not row_ids:
+        return []
+
+    found = connection.execute(select(primary_key, table.c.amigurumi_id).where(primary_key.in_(row_ids)))
+    return [(table.name, row_id, "insert", amigurumi_id) for row_id, amigurumi_id in found]
+
+
+def track_changes(session):
+    #as linhas alcançadas pelas chaves estrangeiras são lidas antes do flush, enquanto as linhas excluídas ainda existem
+    @event.listens_for(session, "before_flush")
+    def collect_cascades(flush_session, flush_context, instances):
+        deleted = {}
+        for obj in flush_session.deleted:
+            if getattr(obj, "__tablename__", None) in CHANGE_SOURCES and inspect(obj).identity:
+                deleted.setdefault(obj.__table__, []).append(inspect(obj).identity[0])
+
+        if deleted:
+            connection = flush_session.connection()
+            cascades = flush_session.info.setdefault("cascaded_changes", [])
+            for table, row_ids in deleted.items():
+                cascades.extend(cascaded_changes(connection, table, row_ids))
+
+    @event.listens_for(session, "after_flush")
+    def log_after_flush(flush_session, flush_context):
+        changes = flushed_changes(flush_session) + flush_session.info.pop("cascaded_changes", [])
+
+        if changes:
+            log_changes(flush_session.connection(), changes)
+
+    @event.listens_for(session, "after_rollback")
+    def discard_cascades(rollback_session):
+        rollback_session.info.pop("cascaded_changes", None)
+
+    #deve ser registrado antes de track_amigurumi_summaries, que executa o comando; as alterações e exclusões são
+    #registradas antes da execução, e as inclusões depois, a partir do RETURNING
+    @event.listens_for(session, "do_orm_execute")
+    def log_bulk_statement(orm_execute_state):
+        if not (orm_execute_state.is_insert or orm_execute_state.is_update or orm_execute_state.is_delete):
+            return None
+
+        table = getattr(orm_execute_state.statement, "table", None)
+        if table is None or table.name not in CHANGE_SOURCES:
+            return None
+
+        connection = orm_execute_state.session.connection()
+
+        if not orm_execute_state.is_insert:
+            operation = "update" if orm_execute_state.is_update else "delete"
+            log_changes(connection, statement_changes(
+                connection, table, orm_execute_state.statement, orm_execute_state.parameters, operation
+            ))
+            return None
+
+        result = orm_execute_state.invoke_statement()
+        rows = []
+
+        if not isinstance(result, CursorResult) or result.returns_rows:
+            frozen = result.freeze()
+            rows = [row._asdict() for row in frozen()]
+            result = frozen()
+
+        log_changes(connection, inserted_changes(connection, table, rows, orm_execute_state.parameters))
+
+        return result
+
+
+#---------------------------------------------------------------------------#
+# Leitura das alterações desde o cursor. O último change_id é lido antes das alterações, e a página não passa dele:
+# sem páginas seguintes, o cursor retornado é esse último change_id, mesmo quando os filtros não encontram nenhuma linha.
+# Várias alterações da mesma linha na página viram uma só, com os dados atuais da linha (uma consulta por tabela);
+# linhas que não existem mais são devolvidas como exclusão
+class CursorExpired(ValueError):
+    pass
+
+
+def latest_change_id(session):
+    return session.scalar(select(func.max(ChangeLog.change_id))) or 0
+
+
+def read_changes(session, since, limit, table_names=(), amigurumi_id=None):
+    latest = latest_change_id(session)
+
+    #o registro mais antigo que ainda existe: um cursor anterior a ele perdeu alterações removidas por prune-changes
+    oldest = session.scalar(select(func.min(ChangeLog.change_id)))
+    if oldest is not None and since < oldest - 1:
+        raise CursorExpired("O cursor é anterior ao registro de alterações mantido, sincronize as tabelas novamente")
+
+    #cursor de outro banco (recriado ou restaurado de um backup)
+    if since > latest:
+        raise CursorExpired("O cursor não pertence a este registro de alterações, sincronize as tabelas novamente")
+
+    query = select(ChangeLog.change_id, ChangeLog.table_name, ChangeLog.row_id, ChangeLog.operation).where(
+        ChangeLog.change_id > since, ChangeLog.change_id <= latest
+    )
+
+    if table_names:
+        query = query.where(ChangeLog.table_name.in_(table_names))
+    if amigurumi_id is not None:
+        query = query.where(ChangeLog.amigurumi_id == amigurumi_id)
+
+    entries = session.execute(query.order_by(ChangeLog.change_id).limit(limit + 1)).all()
+    has_more = len(entries) > limit
+    entries = entries[:limit]
+
+    changes = {}
+    for change_id, table_name, row_id, operation in entries:
+        change = changes.pop((table_name, row_id), None)
+
+        #uma linha incluída e alterada na mesma página continua sendo uma inclusão
+        if change is not None and change["operation"] == "insert" and operation == "update":
+            operation = "insert"
+
+        changes[(table_name, row_id)] = {"change_id": change_id, "table": table_name, "id": row_id, "operation": operation}
+
+    row_ids = {}
+    for table_name, row_id in changes:
+        row_ids.setdefault(table_name, []).append(row_id)
+
+    for table_name, ids in row_ids.items():
+        columns = CHANGE_COLUMNS[table_name]
+        keys = column_keys(columns)
+        primary_key = primary_key_of(CHANGE_SOURCES[table_name].__table__)
+
+        for row in session.execute(select(*columns).where(primary_key.in_(ids))):
+            data = dict(zip(keys, row))
+            change = changes[(table_name, data[primary_key.key])]
+
+            if change["operation"] != "delete":
+                change["data"] = data
+
+    result = []
+    for change in changes.values():
+        if "data" not in change:
+            change["operation"] = "delete"
+        result.append(change)
+
+    result.sort(key=lambda change: change["change_id"])
+
+    return {
+        "changes": result,
+        "cursor": entries[-1].change_id if has_more else latest,
+        "has_more": has_more,
+    }
+
+
+#---------------------------------------------------------------------------#
+# Remoção dos registros mais antigos que days dias. O último registro é sempre mantido, para que o cursor dos
+# clientes sincronizados continue válido. Retorna a quantidade de registros removidos
+def prune_changes(session, days):
+    cutoff = datetime.now(timezone.utc).replace(tzinfo=None) - timedelta(days=days)
+    latest = latest_change_id(session)
+
+    result = session.execute(
+        delete(ChangeLog).where(ChangeLog.changed_at < cutoff, ChangeLog.change_id < latest),
+        execution_options={"synchronize_session": False},
+    )
+    session.commit()
+
+    return result.rowcount
@@ -0,0 +1,140 @@
+import zlib
+
+from flask import request
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+
+#---------------------------------------------------------------------------#
+# Tipos de conteúdo compressíveis (JSON, NDJSON e texto). Imagens já são comprimidas (JPEG, PNG, WebP)
+# e são enviadas como estão, exceto SVG, que é texto
+COMPRESSIBLE_MIMETYPES = {
+    "application/json", "application/x-ndjson", "application/javascript", "application/xml", "image/svg+xml",
+}
+
+def is_compressible(mimetype):
+    return mimetype is not None and (mimetype.startswith("text/") or mimetype in COMPRESSIBLE_MIMETYPES)
+
+
+#---------------------------------------------------------------------------#
+# Codificadores: compressão do corpo inteiro e compressão em streaming (cada bloco é enviado assim que comprimido).
+# brotli e zstd são opcionais; sem as bibliotecas apenas gzip é oferecido
+class GzipEncoder:
+    def __init__(self, level):
+        self.level = level
+
+    def compress(self, data):
+        compressor = zlib.compressobj(self.level, zlib.DEFLATED, 31)
+        return compressor.compress(data) + compressor.flush()
+
+    def stream(self, chunks):
+        compressor = zlib.compressobj(self.level, zlib.DEFLATED, 31)
+        for chunk in chunks:
+            yield compressor.compress(chunk) + compressor.flush(zlib.Z_SYNC_FLUSH)
+        yield compressor.flush()
+
+
+class BrotliEncoder:
+    def __init__(self, quality):
+        self.quality = quality
+
+    def compress(self, data):
+        return brotli.compress(data, quality=self.quality)
+
+    def stream(self, chunks):
+        compressor = brotli.Compressor(quality=self.quality)
+        for chunk in chunks:
+            yield compressor.process(chunk) + compressor.flush()
+        yield compressor.finish()
+
+
+class ZstdEncoder:
+    def __init__(self, level):
+        self.compressor = zstandard.ZstdCompressor(level=level)
+
+    def compress(self, data):
+        return self.compressor.compress(data)
+
+    def stream(self, chunks):
+        compressor = self.compressor.compressobj()
+        for chunk in chunks:
+            yield compressor.compress(chunk) + compressor.flush(zstandard.COMPRESSOBJ_FLUSH_BLOCK)
+        yield compressor.flush()
+
+
+#---------------------------------------------------------------------------#
+# Compressão das respostas negociada pelo Accept-Encoding. As respostas do cache de leitura já chegam comprimidas
+# (ResponseCache guarda a variante comprimida), as demais são comprimidas no after_request
+class ResponseCompression:
+    def __init__(self):
+        self.encoders = {}
+        self.min_size = 1024
+
+    def init_app(self, app):
+        self.encoders = {}
+        self.min_size = app.config["COMPRESSION_MIN_SIZE"]
+
+        if not app.config["COMPRESSION_ENABLED"]:
+            return
+
+        #ordem de preferência do servidor quando o cliente aceita mais de uma codificação com a mesma qualidade
+        if zstandard is not None:
+            self.encoders["zstd"] = ZstdEncoder(app.config["COMPRESSION_ZSTD_LEVEL"])
+        if brotli is not None:
+            self.encoders["br"] = BrotliEncoder(app.config["COMPRESSION_BROTLI_QUALITY"])
+        self.encoders["gzip"] = GzipEncoder(app.config["COMPRESSION_GZIP_LEVEL"])
+
+        app.after_request(self.compress_response)
+
+    #codificação escolhida para a requisição atual, ou None quando o cliente não aceita nenhuma
+    def negotiate(self):
+        if not self.encoders:
+            return None
+        return request.accept_encodings.best_match(list(self.encoders))
+
+    def should_compress(self, mimetype, size):
+        return is_compressible(mimetype) and size >= self.min_size
+
+    def compress(self, data, encoding):
+        return self.encoders[encoding].compress(data)
+
+    def compress_response(self, response):
+        if not self.encoders or not is_compressible(response.mimetype):
+            return response
+
+        response.vary.add("Accept-Encoding")
+
+        if (
+            request.method == "HEAD"
+            or response.status_code < 200
+            or response.status_code in (204, 206, 304)
+            or response.direct_passthrough
+            or "Content-Encoding" in response.headers
+            or "no-transform" in response.headers.get("Cache-Control", "")
+        ):
+            return response
+
+        encoding = self.negotiate()
+        if encoding is None:
+            return response
+
+        if response.is_streamed:
+            response.response = self.encoders[encoding].stream(response.response)
+            response.headers.pop("Content-Length", None)
+        else:
+            data = response.get_data()
+            if len(data) < self.min_size:
+                return response
+
+            response.set_data(self.compress(data, encoding))
+
+        response.headers["Content-Encoding"] = encoding
+        return response
@@ -1,18 +1,113 @@
 import os
 
+
+#opções do pool de conexões, usadas quando DATABASE_URL aponta para um banco servidor (Postgres, por exemplo)
+def engine_options(database_uri):
+    if database_uri.startswith('sqlite'):
+        return {}
+
+    return {
+        'pool_size': int(os.getenv('DB_POOL_SIZE', 5)),
+        'max_overflow': int(os.getenv('DB_MAX_OVERFLOW', 10)),
+        'pool_recycle': int(os.getenv('DB_POOL_RECYCLE', 1800)),
+        'pool_timeout': int(os.getenv('DB_POOL_TIMEOUT', 30)),
+        'pool_pre_ping': True,
+    }
+
+
 class Config:
+    AUTO_UPGRADE_DATABASE = False
     SQLALCHEMY_DATABASE_URI = os.getenv('DATABASE_URL', 'sqlite:///database.db')
     SQLALCHEMY_TRACK_MODIFICATIONS = False
+    SQLALCHEMY_ENGINE_OPTIONS = engine_options(SQLALCHEMY_DATABASE_URI)
+
+    #PRAGMAs aplicados a cada nova conexão SQLite: WAL permite leituras durante as escritas, busy_timeout espera o lock
+    #em vez de falhar com "database is locked" e foreign_keys ativa as exclusões em cascata declaradas nas tabelas
+    SQLITE_PRAGMAS = {
+        'journal_mode': os.getenv('SQLITE_JOURNAL_MODE', 'WAL'),
+        'synchronous': os.getenv('SQLITE_SYNCHRONOUS', 'NORMAL'),
+        'busy_timeout': int(os.getenv('SQLITE_BUSY_TIMEOUT', 5000)),
+        'foreign_keys': os.getenv('SQLITE_FOREIGN_KEYS', 'ON'),
+        'cache_size': int(os.getenv('SQLITE_CACHE_SIZE', -64000)),
+        'mmap_size': int(os.getenv('SQLITE_MMAP_SIZE', 256 * 1024 * 1024)),
+        'temp_store': 'MEMORY',
+    }
+    BLOB_STORE_PATH = os.getenv('BLOB_STORE_PATH', 'blob_store')
+    #idade mínima dos arquivos de imagem sem uso removidos pelo comando sweep-image-blobs
+    BLOB_SWEEP_GRACE_SECONDS = int(os.getenv('BLOB_SWEEP_GRACE_SECONDS', 3600))
+    THUMBNAIL_CACHE_PATH = os.getenv('THUMBNAIL_CACHE_PATH', 'thumbnail_cache')
+    #limite da pasta inteira das miniaturas, compartilhada pelos workers (ultrapassado no máximo em 5% por worker)
+    THUMBNAIL_CACHE_MAX_BYTES = int(os.getenv('THUMBNAIL_CACHE_MAX_BYTES', 256 * 1024 * 1024))
+
+    #envio de imagens em segundo plano (POST /image/upload): tamanho máximo e threads de processamento por processo
+    IMAGE_UPLOAD_MAX_BYTES = int(os.getenv('IMAGE_UPLOAD_MAX_BYTES', 20 * 1024 * 1024))
+    IMAGE_UPLOAD_WORKERS = int(os.getenv('IMAGE_UPLOAD_WORKERS', 2))
+    #envios sem conclusão há mais que este tempo (worker reiniciado ou encerrado) são marcados como failed
+    IMAGE_UPLOAD_TIMEOUT_SECONDS = int(os.getenv('IMAGE_UPLOAD_TIMEOUT_SECONDS', 900))
+
+    #tamanho máximo dos arquivos de receitas recebidos em POST /import
+    ARCHIVE_MAX_BYTES = int(os.getenv('ARCHIVE_MAX_BYTES', 1024 * 1024 * 1024))
+
+    #linhas por página das listagens JSON sem limit; para ler todas as linhas de uma vez use o envio em NDJSON (?stream=1)
+    PAGE_DEFAULT_LIMIT = int(os.getenv('PAGE_DEFAULT_LIMIT', 100))
+
+    CACHE_URL = os.getenv('CACHE_URL')
+    CACHE_MAX_ENTRIES = int(os.getenv('CACHE_MAX_ENTRIES', 1024))
+
+    #compressão das respostas (zstd, br ou gzip, conforme o Accept-Encoding) a partir de COMPRESSION_MIN_SIZE bytes
+    COMPRESSION_ENABLED = os.getenv('COMPRESSION_ENABLED', 'true').lower() == 'true'
+    COMPRESSION_MIN_SIZE = int(os.getenv('COMPRESSION_MIN_SIZE', 1024))
+    COMPRESSION_GZIP_LEVEL = int(os.getenv('COMPRESSION_GZIP_LEVEL', 6))
+    COMPRESSION_BROTLI_QUALITY = int(os.getenv('COMPRESSION_BROTLI_QUALITY', 5))
+    COMPRESSION_ZSTD_LEVEL = int(os.getenv('COMPRESSION_ZSTD_LEVEL', 3))
+
+    #montagem dos esquemas de validação e da documentação OpenAPI na criação da aplicação, e não na primeira requisição
+    #de cada rota; desativado por padrão para que o processo fique pronto o quanto antes
+    SCHEMA_WARMUP = os.getenv('SCHEMA_WARMUP', 'false').lower() == 'true'
+
+    #sincronização incremental (/changes): dias de registros mantidos pelo comando prune-changes, intervalo entre as
+    #leituras e duração de cada conexão de /changes/stream (o cliente reconecta a partir do último cursor recebido)
+    CHANGES_RETENTION_DAYS = int(os.getenv('CHANGES_RETENTION_DAYS', 30))
+    CHANGES_POLL_SECONDS = float(os.getenv('CHANGES_POLL_SECONDS', 2))
+    CHANGES_STREAM_SECONDS = int(os.getenv('CHANGES_STREAM_SECONDS', 60))
+
+    #métricas das requisições em /metrics e registro das requisições mais lentas que SLOW_REQUEST_MS (0 desativa o registro)
+    METRICS_ENABLED = os.getenv('METRICS_ENABLED', 'true').lower() == 'true'
+    SLOW_REQUEST_MS = int(os.getenv('SLOW_REQUEST_MS', 0))
 
 
 class DevelopmentConfig(Config):
     DEBUG = True
+    AUTO_UPGRADE_DATABASE = True
 
 
+#em produção o esquema é atualizado uma única vez, pelo processo principal do gunicorn ou pelo comando upgrade-database
 class ProductionConfig(Config):
     DEBUG = False
+    AUTO_UPGRADE_DATABASE = os.getenv('AUTO_UPGRADE_DATABASE', 'false').lower() == 'true'
 
 
 class TestingConfig(Config):
     TESTING = True
+    AUTO_UPGRADE_DATABASE = True
     SQLALCHEMY_DATABASE_URI = 'sqlite:///test_database.db'
+    SQLALCHEMY_ENGINE_OPTIONS = {}
+    BLOB_STORE_PATH = 'test_blob_store'
+    THUMBNAIL_CACHE_PATH = 'test_thumbnail_cache'
+
+
+
+#configuração escolhida pela variável de ambiente APP_ENV (development, production ou testing)
+CONFIGS = {
+    'development': DevelopmentConfig,
+    'production': ProductionConfig,
+    'testing': TestingConfig,
+}
+
+def get_config(name=None):
+    name = (name or os.getenv('APP_ENV', 'development')).lower()
+
+    if name not in CONFIGS:
+        raise ValueError(f"APP_ENV inválido: {name}")
+
+    return CONFIGS[name]
@@ -1,4 +1,45 @@
+import os
+import weakref
+
 from flask_sqlalchemy import SQLAlchemy
+from sqlalchemy import event
 
 db = SQLAlchemy()
 
+
+#aplicação dos PRAGMAs configurados em SQLITE_PRAGMAS a cada nova conexão SQLite
+def register_sqlite_pragmas(app):
+    pragmas = app.config.get("SQLITE_PRAGMAS", {})
+
+    with app.app_context():
+        for engine in db.engines.values():
+            if engine.dialect.name != "sqlite" or not pragmas:
+                continue
+
+            @event.listens_for(engine, "connect")
+            def set_sqlite_pragmas(dbapi_connection, connection_record):
+                cursor = dbapi_connection.cursor()
+                for name, value in pragmas.items():
+                    cursor.execute(f"PRAGMA {name}={value}")
+                cursor.close()
+
+
+#descarte das conexões herdadas do processo pai após um fork (workers do gunicorn, por exemplo),
+#para que cada processo abra as suas próprias conexões com o banco. O os.register_at_fork é registrado uma única vez,
+#na importação do módulo, e descarta as conexões de todas as aplicações criadas no processo
+forked_apps = weakref.WeakSet()
+
+
+def dispose_forked_engines():
+    for app in list(forked_apps):
+        with app.app_context():
+            for engine in db.engines.values():
+                engine.dispose(close=False)
+
+
+if hasattr(os, "register_at_fork"):
+    os.register_at_fork(after_in_child=dispose_forked_engines)
+
+
+def dispose_engines_after_fork(app):
+    forked_apps.add(app)
@@ -0,0 +1,47 @@
+#configuração do gunicorn para produção => gunicorn -c gunicorn.conf.py "app:create_app()"
+import multiprocessing
+import os
+
+#o gunicorn utiliza a configuração de produção, a menos que APP_ENV seja informado
+os.environ.setdefault("APP_ENV", "production")
+
+bind = os.getenv("BIND", "0.0.0.0:5000")
+workers = int(os.getenv("WEB_CONCURRENCY", multiprocessing.cpu_count() * 2 + 1))
+threads = int(os.getenv("GUNICORN_THREADS", 4))
+worker_class = "gthread"
+timeout = int(os.getenv("GUNICORN_TIMEOUT", 60))
+graceful_timeout = 30
+keepalive = 5
+
+#cada worker importa e cria a sua própria aplicação, com o seu próprio pool de conexões
+preload_app = False
+
+
+#atualização do esquema do banco uma única vez, no processo principal, antes de iniciar os workers. Usa uma aplicação
+#Flask mínima, só com o banco configurado e descartada em seguida: o módulo app (rotas, caches, threads de envio de imagens)
+#não é importado no processo principal, e cada worker continua criando a sua própria aplicação depois do fork.
+#Os envios de imagem ainda sem conclusão pertenciam aos workers da execução anterior e são marcados como failed
+def on_starting(server):
+    from flask import Flask
+
+    #os modelos precisam estar importados para o db.create_all() de upgrade_database
+    import table
+    from config import get_config
+    from database import db, register_sqlite_pragmas
+    from image_uploads import fail_unfinished_uploads
+    from migrations import upgrade_database
+
+    upgrade_app = Flask("upgrade")
+    upgrade_app.config.from_object(get_config())
+    db.init_app(upgrade_app)
+    register_sqlite_pragmas(upgrade_app)
+
+    with upgrade_app.app_context():
+        upgrade_database()
+
+        interrupted = fail_unfinished_uploads(db.session)
+        if interrupted:
+            server.log.info("%s envios de imagem interrompidos marcados como failed", interrupted)
+
+        db.session.remove()
+        db.engine.dispose()
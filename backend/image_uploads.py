@@ -0,0 +1,297 @@
+import logging
+import os
+import tempfile
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta, timezone
+
+from flask import request
+from sqlalchemy import update
+from sqlalchemy.exc import IntegrityError
+from werkzeug.formparser import parse_form_data
+
+from blob_store import FILE_CHUNK_SIZE, sniff_content_type
+from database import db
+from table import FoundationList, Image, ImageUpload
+
+try:
+    from PIL import Image as PILImage
+except ImportError:
+    PILImage = None
+
+
+logger = logging.getLogger("amigurumi.image_uploads")
+
+
+class UploadTooLarge(ValueError):
+    pass
+
+
+def utcnow():
+    return datetime.now(timezone.utc).replace(tzinfo=None)
+
+
+#---------------------------------------------------------------------------#
+# Dimensões da imagem, lidas apenas do cabeçalho do arquivo (sem decodificar os pixels). Sem o Pillow ficam em branco
+def image_dimensions(source):
+    if PILImage is None:
+        return None, None
+
+    try:
+        with PILImage.open(source) as picture:
+            return picture.size
+    except Exception:
+        return None, None
+
+
+#validação do arquivo enviado (caminho ou arquivo aberto): formato pelos primeiros bytes e integridade pelo Pillow,
+#quando instalado
+def inspect_image(path):
+    if hasattr(path, "read"):
+        content_type = sniff_content_type(path.read(64))
+        path.seek(0)
+    else:
+        with open(path, "rb") as source:
+            content_type = sniff_content_type(source.read(64))
+
+    if content_type == "application/octet-stream":
+        raise ValueError("Formato de imagem não suportado")
+
+    if PILImage is None:
+        return content_type, None, None
+
+    try:
+        with PILImage.open(path) as picture:
+            width, height = picture.size
+            picture.verify()
+    except Exception:
+        raise ValueError("Imagem inválida ou corrompida")
+
+    return content_type, width, height
+
+
+#---------------------------------------------------------------------------#
+# Envios interrompidos: os envios ficam apenas no pool de threads do processo, e um worker reiniciado ou encerrado deixa
+# as suas linhas em pending (ou processing) para sempre. Os envios sem conclusão são marcados como failed pelo processo
+# principal do gunicorn ao iniciar (antes dos workers, todos os envios pendentes foram interrompidos) e, com o servidor
+# no ar, na consulta da situação de um envio recebido há mais de IMAGE_UPLOAD_TIMEOUT_SECONDS. O envio não é
+# reprocessado: o cliente envia a imagem novamente. Os arquivos temporários que sobrarem são removidos por sweep-image-blobs
+UNFINISHED_STATUSES = ("pending", "processing")
+INTERRUPTED_ERROR = "Processamento interrompido pela reinicialização do servidor, envie a imagem novamente"
+
+def fail_unfinished_uploads(session, timeout_seconds=0, job_id=None):
+    statement = update(ImageUpload).where(
+        ImageUpload.status.in_(UNFINISHED_STATUSES),
+        ImageUpload.created_at < utcnow() - timedelta(seconds=timeout_seconds),
+    )
+
+    if job_id is not None:
+        statement = statement.where(ImageUpload.job_id == job_id)
+
+    result = session.execute(
+        statement.values(status="failed", error=INTERRUPTED_ERROR, finished_at=utcnow()),
+        execution_options={"synchronize_session": False},
+    )
+    session.commit()
+
+    return result.rowcount
+
+
+#---------------------------------------------------------------------------#
+# Envio de imagens em segundo plano: o corpo da requisição é gravado em blocos em um arquivo temporário
+# (dentro do armazenamento de imagens, para que o arquivo seja movido sem cópia) e um pool de threads valida a imagem,
+# calcula o hash e as dimensões e cadastra a linha, junto com a troca da imagem principal, em uma única transação
+class ImageUploads:
+    def __init__(self, store):
+        self.store = store
+        self.app = None
+        self.max_bytes = 0
+        self.workers = 1
+        self.timeout_seconds = 0
+        self.pool = None
+        self.lock = threading.Lock()
+
+    def init_app(self, app):
+        self.app = app
+        self.max_bytes = app.config["IMAGE_UPLOAD_MAX_BYTES"]
+        self.workers = app.config["IMAGE_UPLOAD_WORKERS"]
+        self.timeout_seconds = app.config["IMAGE_UPLOAD_TIMEOUT_SECONDS"]
+
+    @property
+    def upload_dir(self):
+        return os.path.join(self.store.root, ".uploads")
+
+    #o pool é criado no primeiro envio, já dentro do processo do worker (depois do fork do gunicorn)
+    def executor(self):
+        with self.lock:
+            if self.pool is None:
+                self.pool = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="image-upload")
+            return self.pool
+
+    #---------------------------------------------------------------------------#
+    # Recebimento do corpo: multipart/form-data (campo image) ou os bytes da imagem. Retorna o caminho do arquivo temporário
+    def receive(self):
+        if request.content_length is not None and request.content_length > self.max_bytes:
+            raise UploadTooLarge(f"Imagem maior que o limite de {self.max_bytes} bytes")
+
+        os.makedirs(self.upload_dir, exist_ok=True)
+
+        if request.mimetype == "multipart/form-data":
+            path = self.receive_multipart()
+        else:
+            path = self.receive_raw()
+
+        if os.path.getsize(path) == 0:
+            os.remove(path)
+            raise ValueError("Imagem não informada")
+
+        return path
+
+    def temp_file(self):
+        fd, path = tempfile.mkstemp(dir=self.upload_dir, prefix="upload-")
+        os.close(fd)
+        return open(path, "w+b"), path
+
+    def receive_raw(self):
+        output, path = self.temp_file()
+        size = 0
+
+        try:
+            with output:
+                for chunk in iter(lambda: request.stream.read(FILE_CHUNK_SIZE), b""):
+                    size += len(chunk)
+                    if size > self.max_bytes:
+                        raise UploadTooLarge(f"Imagem maior que o limite de {self.max_bytes} bytes")
+                    output.write(chunk)
+        except BaseException:
+            os.remove(path)
+            raise
+
+        return path
+
+    #o parser do werkzeug grava cada arquivo do formulário direto no arquivo temporário criado pela stream_factory
+    def receive_multipart(self):
+        paths = []
+
+        def stream_factory(total_content_length, content_type, filename, content_length=None):
+            output, path = self.temp_file()
+            paths.append(path)
+            return output
+
+        try:
+            _, _, files = parse_form_data(request.environ, stream_factory=stream_factory, max_content_length=self.max_bytes)
+            image = files.get("image")
+
+            for _, storage in files.items(multi=True):
+                storage.close()
+
+            if image is None:
+                raise ValueError("Imagem não informada: envie o arquivo no campo image")
+
+            path = image.stream.name
+        except BaseException:
+            for temp_path in paths:
+                os.remove(temp_path)
+            raise
+
+        for temp_path in paths:
+            if temp_path != path:
+                os.remove(temp_path)
+
+        return path
+
+    #---------------------------------------------------------------------------#
+    # Processamento em segundo plano, com o seu próprio contexto da aplicação e a sua própria sessão
+    def submit(self, job_id, path):
+        self.executor().submit(self.process, job_id, path)
+
+    def process(self, job_id, path):
+        with self.app.app_context():
+            try:
+                self.process_job(job_id, path)
+            except Exception as error:
+                db.session.rollback()
+
+                if not isinstance(error, ValueError):
+                    logger.exception("Falha no processamento do envio %s", job_id)
+                    error = "Erro ao processar a imagem"
+
+                self.finish(job_id, status="failed", error=str(error)[:500])
+            finally:
+                if os.path.exists(path):
+                    os.remove(path)
+                db.session.remove()
+
+    def process_job(self, job_id, path):
+        job = db.session.get(ImageUpload, job_id)
+        job.status = "processing"
+        db.session.commit()
+
+        content_type, width, height = inspect_image(path)
+        size = os.path.getsize(path)
+
+        if db.session.get(FoundationList, job.amigurumi_id) is None:
+            raise ValueError("Amigurumi não encontrado")
+
+        digest = self.store.put_file(path)
+
+        try:
+            if job.main_image:
+                Image.query.filter(Image.amigurumi_id == job.amigurumi_id, Image.main_image == db.true()).update({"main_image": False})
+
+            image = Image(
+                amigurumi_id=job.amigurumi_id, list_id=job.list_id, main_image=job.main_image,
+                content_hash=digest, content_type=content_type, content_size=size, width=width, height=height,
+            )
+            db.session.add(image)
+            db.session.flush()
+
+            job.status = "done"
+            job.image_id = image.image_id
+            job.finished_at = utcnow()
+            db.session.commit()
+        except BaseException as error:
+            #o arquivo que ficar sem nenhuma linha é removido depois por sweep-image-blobs
+            db.session.rollback()
+
+            #outra imagem principal gravada ao mesmo tempo (índice único da imagem principal)
+            if isinstance(error, IntegrityError):
+                raise ValueError("Outra imagem principal foi definida ao mesmo tempo para este amigurumi, tente novamente")
+            raise
+
+    #situação do envio, marcado como failed quando está sem conclusão há mais de IMAGE_UPLOAD_TIMEOUT_SECONDS
+    def status(self, job_id):
+        job = db.session.get(ImageUpload, job_id)
+        cutoff = utcnow() - timedelta(seconds=self.timeout_seconds)
+
+        if job is not None and job.status in UNFINISHED_STATUSES and job.created_at < cutoff:
+            fail_unfinished_uploads(db.session, self.timeout_seconds, job_id)
+            db.session.refresh(job)
+
+        return job
+
+    #arquivos temporários de envios interrompidos, gravados antes de cutoff (timestamp). Retorna a quantidade removida
+    def remove_stale_files(self, cutoff):
+        if not os.path.isdir(self.upload_dir):
+            return 0
+
+        removed = 0
+        for entry in os.scandir(self.upload_dir):
+            if entry.is_file() and entry.stat().st_mtime < cutoff:
+                try:
+                    os.remove(entry.path)
+                    removed += 1
+                except FileNotFoundError:
+                    continue
+
+        return removed
+
+    def finish(self, job_id, **values):
+        job = db.session.get(ImageUpload, job_id)
+        if job is None:
+            return
+
+        for key, value in values.items():
+            setattr(job, key, value)
+        job.finished_at = utcnow()
+        db.session.commit()
@@ -0,0 +1,182 @@
+import logging
+import threading
+import time
+
+from flask import g, has_request_context, request
+from sqlalchemy import event
+
+from database import db
+
+
+logger = logging.getLogger("amigurumi.slow_requests")
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+SIZE_BUCKETS = (256, 1024, 4096, 16384, 65536, 262144, 1048576, 4194304, 16777216)
+SQL_COUNT_BUCKETS = (0, 1, 2, 5, 10, 20, 50, 100, 500)
+
+#quantidade máxima de comandos SQL guardados por requisição para o registro de requisições lentas
+SLOW_LOG_MAX_STATEMENTS = 100
+
+
+#---------------------------------------------------------------------------#
+# Histograma no formato do Prometheus: contagem por faixa (le), soma e total de observações, separados por rótulos
+class Histogram:
+    def __init__(self, name, description, buckets, label_names):
+        self.name = name
+        self.description = description
+        self.buckets = buckets
+        self.label_names = label_names
+        self.series = {}
+
+    def observe(self, labels, value):
+        series = self.series.get(labels)
+        if series is None:
+            series = self.series[labels] = [[0] * len(self.buckets), 0.0, 0]
+
+        for index, bound in enumerate(self.buckets):
+            if value <= bound:
+                series[0][index] += 1
+                break
+
+        series[1] += value
+        series[2] += 1
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.description}", f"# TYPE {self.name} histogram"]
+
+        for labels, (counts, total, count) in sorted(self.series.items()):
+            label_text = ",".join(f'{name}="{escape_label(value)}"' for name, value in zip(self.label_names, labels))
+            cumulative = 0
+
+            for bound, bucket_count in zip(self.buckets, counts):
+                cumulative += bucket_count
+                lines.append(f'{self.name}_bucket{{{label_text},le="{format_bound(bound)}"}} {cumulative}')
+
+            lines.append(f'{self.name}_bucket{{{label_text},le="+Inf"}} {count}')
+            lines.append(f"{self.name}_sum{{{label_text}}} {total}")
+            lines.append(f"{self.name}_count{{{label_text}}} {count}")
+
+        return lines
+
+
+def escape_label(value):
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def format_bound(bound):
+    return str(float(bound)) if isinstance(bound, float) else str(bound)
+
+
+#---------------------------------------------------------------------------#
+# Métricas das requisições: duração, tamanho da resposta e quantidade e tempo dos comandos SQL por rota.
+# Os valores ficam na memória de cada processo; com vários workers do gunicorn cada um expõe as suas próprias métricas.
+# Requisições acima de SLOW_REQUEST_MS são registradas no log amigurumi.slow_requests junto com os comandos SQL executados
+class RequestMetrics:
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.slow_request_ms = 0
+        self.latency = Histogram(
+            "http_request_duration_seconds", "Duração das requisições em segundos", LATENCY_BUCKETS, ("method", "route", "status")
+        )
+        self.response_size = Histogram(
+            "http_response_size_bytes", "Tamanho do corpo das respostas em bytes", SIZE_BUCKETS, ("method", "route")
+        )
+        self.sql_count = Histogram(
+            "http_request_sql_statements", "Quantidade de comandos SQL por requisição", SQL_COUNT_BUCKETS, ("method", "route")
+        )
+        self.sql_time = Histogram(
+            "http_request_sql_duration_seconds", "Tempo total dos comandos SQL por requisição em segundos", LATENCY_BUCKETS, ("method", "route")
+        )
+
+    def init_app(self, app):
+        self.slow_request_ms = app.config["SLOW_REQUEST_MS"]
+
+        if not app.config["METRICS_ENABLED"]:
+            return
+
+        app.before_request(self.start_request)
+        app.after_request(self.finish_request)
+        app.teardown_request(self.finish_failed_request)
+
+        #os eventos são adicionados uma única vez por engine, mesmo com init_app chamado de novo
+        with app.app_context():
+            for engine in db.engines.values():
+                if not event.contains(engine, "before_cursor_execute", self.start_statement):
+                    event.listen(engine, "before_cursor_execute", self.start_statement)
+                    event.listen(engine, "after_cursor_execute", self.finish_statement)
+
+    #---------------------------------------------------------------------------#
+    # Contagem dos comandos SQL da requisição atual, guardada em flask.g
+    def start_request(self):
+        g.metrics_start = time.perf_counter()
+        g.metrics_sql_count = 0
+        g.metrics_sql_time = 0.0
+        g.metrics_statements = []
+
+    def start_statement(self, connection, cursor, statement, parameters, context, executemany):
+        connection.info.setdefault("metrics_statement_start", []).append(time.perf_counter())
+
+    def finish_statement(self, connection, cursor, statement, parameters, context, executemany):
+        started = connection.info.get("metrics_statement_start")
+        if not started:
+            return
+
+        elapsed = time.perf_counter() - started.pop()
+
+        if not has_request_context() or "metrics_start" not in g:
+            return
+
+        g.metrics_sql_count += 1
+        g.metrics_sql_time += elapsed
+
+        if self.slow_request_ms and len(g.metrics_statements) < SLOW_LOG_MAX_STATEMENTS:
+            g.metrics_statements.append((elapsed, statement))
+
+    #---------------------------------------------------------------------------#
+    # Registro da requisição. Nas respostas em streaming o tempo medido vai até o início do envio
+    def finish_request(self, response):
+        self.record(response.status_code, response.content_length)
+        return response
+
+    #requisições interrompidas por uma exceção não tratada: com PROPAGATE_EXCEPTIONS (DEBUG e TESTING) o after_request
+    #não é executado, assim como quando outro after_request falha antes deste; são registradas aqui com status 500
+    def finish_failed_request(self, error):
+        if error is not None:
+            self.record(500, None)
+
+    def record(self, status_code, content_length):
+        if "metrics_start" not in g or g.get("metrics_recorded"):
+            return
+
+        g.metrics_recorded = True
+        elapsed = time.perf_counter() - g.metrics_start
+        route = request.url_rule.rule if request.url_rule is not None else "<não encontrada>"
+        method = request.method
+
+        with self.lock:
+            self.latency.observe((method, route, str(status_code)), elapsed)
+            if content_length is not None:
+                self.response_size.observe((method, route), content_length)
+            self.sql_count.observe((method, route), g.metrics_sql_count)
+            self.sql_time.observe((method, route), g.metrics_sql_time)
+
+        if self.slow_request_ms and elapsed * 1000 >= self.slow_request_ms:
+            self.log_slow_request(method, elapsed, status_code)
+
+    def log_slow_request(self, method, elapsed, status_code):
+        statements = "\n".join(
+            f"  [{duration * 1000:.1f} ms] {' '.join(statement.split())[:500]}" for duration, statement in g.metrics_statements
+        )
+        logger.warning(
+            "Requisição lenta: %s %s -> %s em %.1f ms, %d comandos SQL em %.1f ms\n%s",
+            method, request.full_path.rstrip("?"), status_code, elapsed * 1000,
+            g.metrics_sql_count, g.metrics_sql_time * 1000, statements,
+        )
+
+    def render(self):
+        with self.lock:
+            lines = []
+            for histogram in (self.latency, self.response_size, self.sql_count, self.sql_time):
+                lines.extend(histogram.render())
+
+        return "\n".join(lines) + "\n"
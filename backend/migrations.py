@@ -0,0 +1,203 @@
+from database import db
+
+
+#---------------------------------------------------------------------------#
+# Controle de versão do esquema: bancos novos são criados direto na versão atual pelo db.create_all(),
+# bancos existentes recebem apenas as migrações ainda não aplicadas, registradas na tabela schema_version
+def current_version(connection):
+    connection.execute(db.text("CREATE TABLE IF NOT EXISTS schema_version (version INTEGER NOT NULL)"))
+    return connection.execute(db.text("SELECT MAX(version) FROM schema_version")).scalar() or 0
+
+
+def set_version(connection, version):
+    connection.execute(db.text("DELETE FROM schema_version"))
+    connection.execute(db.text("INSERT INTO schema_version (version) VALUES (:version)"), {"version": version})
+
+
+#---------------------------------------------------------------------------#
+# Recriação de uma tabela a partir do modelo, copiando as colunas em comum. Necessário no SQLite,
+# que não permite alterar a obrigatoriedade de uma coluna existente. Segue a ordem recomendada pelo SQLite
+# (nova tabela, cópia, exclusão da antiga e renomeação) para não alterar as chaves estrangeiras das outras tabelas
+def rebuild_table(connection, table):
+    new_name = f"{table.name}_new"
+    existing = {column["name"] for column in db.inspect(connection).get_columns(table.name)}
+    columns = ", ".join(column.name for column in table.columns if column.name in existing)
+
+    #as demais tabelas acompanham a cópia para que as chaves estrangeiras sejam resolvidas
+    metadata = db.MetaData()
+    for other in table.metadata.tables.values():
+        if other is not table:
+            other.to_metadata(metadata)
+
+    new_table = table.to_metadata(metadata, name=new_name)
+    new_table.indexes.clear()
+    new_table.create(connection)
+
+    connection.execute(db.text(f"INSERT INTO {new_name} ({columns}) SELECT {columns} FROM {table.name}"))
+    connection.execute(db.text(f"DROP TABLE {table.name}"))
+    connection.execute(db.text(f"ALTER TABLE {new_name} RENAME TO {table.name}"))
+
+    for index in table.indexes:
+        index.create(connection)
+
+
+#---------------------------------------------------------------------------#
+# Migrações, em ordem de aplicação
+def migration_image_blob_columns(connection):
+    from table import Image
+
+    rebuild_table(connection, Image.__table__)
+
+
+#índices das chaves estrangeiras e das colunas de ordenação das listagens
+def migration_foreign_key_indexes(connection):
+    for table in db.metadata.sorted_tables:
+        for index in table.indexes:
+            index.create(connection, checkfirst=True)
+
+
+#remoção das chaves estrangeiras para colunas não únicas (image.list_id e material_list.colour_id), que impediam
+#a verificação de chaves estrangeiras no SQLite, e exclusão em cascata das carreiras junto com a sua parte.
+#Linhas órfãs, deixadas quando as chaves não eram verificadas, são removidas antes da cópia
+def migration_enforceable_foreign_keys(connection):
+    from table import Image, MaterialList, StitchBook
+
+    for table_name in ("image", "material_list", "stitchbook"):
+        connection.execute(db.text(
+            f"DELETE FROM {table_name} WHERE amigurumi_id NOT IN (SELECT amigurumi_id FROM foundation_list)"
+        ))
+
+    connection.execute(db.text(
+        "DELETE FROM stitchbook WHERE element_id NOT IN (SELECT element_id FROM stitchbook_sequence)"
+    ))
+
+    for table in (Image.__table__, MaterialList.__table__, StitchBook.__table__):
+        rebuild_table(connection, table)
+
+
+#contagem de pontos das carreiras, calculada para as linhas já cadastradas
+def migration_stitch_counts(connection):
+    from stitch_notation import stitch_counts
+
+    existing = {column["name"] for column in db.inspect(connection).get_columns("stitchbook")}
+    for column_name in ("stitch_count", "increase_count", "decrease_count"):
+        if column_name not in existing:
+            connection.execute(db.text(f"ALTER TABLE stitchbook ADD COLUMN {column_name} INTEGER"))
+
+    rows = connection.execute(db.text("SELECT line_id, stich_sequence FROM stitchbook")).all()
+    updates = [{"line_id": line_id, **stitch_counts(stich_sequence)} for line_id, stich_sequence in rows]
+
+    if updates:
+        connection.execute(db.text(
+            "UPDATE stitchbook SET stitch_count = :stitch_count, increase_count = :increase_count, "
+            "decrease_count = :decrease_count WHERE line_id = :line_id"
+        ), updates)
+
+
+#resumo dos amigurumis já cadastrados
+def migration_amigurumi_summary(connection):
+    from summary import refresh_amigurumi_summaries
+
+    refresh_amigurumi_summaries(connection)
+
+
+#largura e altura das imagens, preenchidas pelos novos envios (as imagens já cadastradas ficam sem as dimensões)
+def migration_image_dimensions(connection):
+    existing = {column["name"] for column in db.inspect(connection).get_columns("image")}
+    for column_name in ("width", "height"):
+        if column_name not in existing:
+            connection.execute(db.text(f"ALTER TABLE image ADD COLUMN {column_name} INTEGER"))
+
+
+#índice único parcial da imagem principal, no lugar do índice de ordenação das imagens pela imagem principal
+def migration_main_image_unique(connection):
+    from table import Image
+
+    connection.execute(db.text("DROP INDEX IF EXISTS ix_image_main_image"))
+
+    for index in Image.__table__.indexes:
+        if index.name == "ux_image_main_image":
+            index.create(connection, checkfirst=True)
+
+
+#versão de cada linha, usada nas alterações condicionais (If-Match); as linhas já cadastradas começam na versão 1
+def migration_row_versions(connection):
+    from row_versions import VERSIONED_TABLES
+
+    for table_name in VERSIONED_TABLES:
+        existing = {column["name"] for column in db.inspect(connection).get_columns(table_name)}
+        if "version" not in existing:
+            connection.execute(db.text(f"ALTER TABLE {table_name} ADD COLUMN version INTEGER NOT NULL DEFAULT 1"))
+
+
+#bancos antigos podem ter mais de uma imagem principal por amigurumi; apenas a mais recente é mantida como principal.
+#Executado antes das migrações, que recriam os índices do modelo (incluindo o índice único da imagem principal)
+def deduplicate_main_images(connection):
+    from table import Image
+
+    image = Image.__table__
+    other = image.alias("other")
+    latest = (
+        db.select(db.func.max(other.c.image_id))
+        .where(other.c.amigurumi_id == image.c.amigurumi_id, other.c.main_image == db.true())
+        .scalar_subquery()
+    )
+
+    connection.execute(
+        db.update(image).where(image.c.main_image == db.true(), image.c.image_id < latest).values(main_image=False)
+    )
+
+
+MIGRATIONS = [
+    (1, migration_image_blob_columns),
+    (2, migration_foreign_key_indexes),
+    (3, migration_enforceable_foreign_keys),
+    (4, migration_stitch_counts),
+    (5, migration_amigurumi_summary),
+    (6, migration_image_dimensions),
+    (7, migration_main_image_unique),
+    (8, migration_row_versions),
+]
+
+
+def upgrade_database():
+    from search import create_search_index
+
+    fresh = not db.inspect(db.engine).has_table("foundation_list")
+    db.create_all()
+
+    with db.engine.connect() as connection:
+        sqlite = connection.dialect.name == "sqlite"
+
+        #no SQLite a verificação das chaves estrangeiras é desligada durante a recriação das tabelas (só pode ser alterada
+        #fora de uma transação) e a consistência é conferida com foreign_key_check antes do commit
+        if sqlite:
+            connection.exec_driver_sql("PRAGMA foreign_keys=OFF")
+            connection.commit()
+
+        try:
+            with connection.begin():
+                version = current_version(connection)
+
+                if fresh:
+                    set_version(connection, MIGRATIONS[-1][0])
+                else:
+                    if version < MIGRATIONS[-1][0]:
+                        deduplicate_main_images(connection)
+
+                    for migration_version, migration in MIGRATIONS:
+                        if migration_version > version:
+                            migration(connection)
+                            set_version(connection, migration_version)
+
+                #índice de busca (FTS5), criado depois das migrações que recriam tabelas e removem os seus gatilhos
+                create_search_index(connection)
+
+                if sqlite:
+                    violations = connection.exec_driver_sql("PRAGMA foreign_key_check").all()
+                    if violations:
+                        raise RuntimeError(f"Chaves estrangeiras inválidas após a migração: {violations}")
+        finally:
+            #a conexão é descartada para que o pool abra uma nova, com os PRAGMAs configurados
+            if sqlite:
+                connection.invalidate()
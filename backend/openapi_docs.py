@@ -0,0 +1,70 @@
+import threading
+
+from flask_openapi3 import APIBlueprint, OpenAPI
+from flask_openapi3.utils import parse_parameters
+
+
+#---------------------------------------------------------------------------#
+# Documentação OpenAPI gerada sob demanda. O flask-openapi3 gera o JSON Schema de cada corpo, consulta e resposta
+# já na declaração das rotas (na importação de app.py), em todo processo iniciado. Aqui a declaração guarda apenas
+# os dados da documentação e obtém os modelos usados na validação; a documentação é gerada no primeiro acesso
+# a /openapi/openapi.json (ou no aquecimento, com SCHEMA_WARMUP).
+# As rotas declaradas ficam guardadas no blueprint, que é compartilhado por todas as aplicações criadas no processo
+# (create_app chamado mais de uma vez, como nos testes): cada aplicação conta quantas já copiou para a sua documentação
+class DeferredDocsBlueprint(APIBlueprint):
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.deferred_docs = []
+        self.documented = 0
+        self.docs_lock = threading.Lock()
+
+    def _collect_openapi_info(self, rule, func, **kwargs):
+        self.deferred_docs.append((rule, func, kwargs))
+        return parse_parameters(func, doc_ui=False)
+
+    #gera a documentação das rotas declaradas e ainda não documentadas; retorna quantas rotas estão documentadas
+    def collect_docs(self):
+        with self.docs_lock:
+            for rule, func, kwargs in self.deferred_docs[self.documented:]:
+                super()._collect_openapi_info(rule, func, **kwargs)
+
+            self.documented = len(self.deferred_docs)
+            return self.documented
+
+
+class DeferredDocsOpenAPI(OpenAPI):
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.deferred_apis = {}
+        self.docs_lock = threading.Lock()
+
+    def register_api(self, api, **options):
+        super().register_api(api, **options)
+
+        if isinstance(api, DeferredDocsBlueprint):
+            self.deferred_apis[api] = 0
+
+    #as rotas são documentadas no blueprint e copiadas para a aplicação, como em register_api
+    def collect_docs(self):
+        with self.docs_lock:
+            for api, copied in self.deferred_apis.items():
+                if copied == len(api.deferred_docs):
+                    continue
+
+                self.deferred_apis[api] = api.collect_docs()
+
+                for tag in api.tags:
+                    if tag.name not in self.tag_names:
+                        self.tags.append(tag)
+                        self.tag_names.append(tag.name)
+
+                self.paths.update(**api.paths)
+                self.components_schemas.update(**api.components_schemas)
+                self.spec_json = {}
+
+    @property
+    def api_doc(self):
+        self.collect_docs()
+
+        with self.docs_lock:
+            return super().api_doc
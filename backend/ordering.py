@@ -0,0 +1,53 @@
+from sqlalchemy import case, inspect, or_, select, update
+
+
+#---------------------------------------------------------------------------#
+# Reordenação das partes (element_order dentro do amigurumi) e das carreiras (number_row dentro da parte) com um único
+# UPDATE por operação, em vez de uma alteração por linha. As posições continuam inteiras (number_row é o número da
+# carreira na receita), e cada UPDATE filtra pelo grupo e pela faixa de posições, coberto pelos índices
+# (amigurumi_id, element_order) e (element_id, number_row), os mesmos usados na ordenação das listagens
+
+
+#abertura da posição para uma nova linha: as linhas do grupo a partir da posição descem uma posição.
+#Retorna a quantidade de linhas deslocadas
+def open_position(session, model, group_column, group, position_column, position):
+    primary_key = inspect(model).primary_key[0]
+
+    statement = (
+        update(model)
+        .where(group_column == group, position_column >= position)
+        .values({position_column: position_column + 1})
+        .returning(primary_key)
+    )
+
+    return len(session.execute(statement, execution_options={"synchronize_session": False}).all())
+
+
+#movimentação de uma linha para outra posição do seu grupo: a própria linha e as linhas entre a posição atual e a nova
+#são alteradas no mesmo UPDATE (CASE), as demais deslocadas uma posição. Retorna None quando a linha não existe,
+#senão a quantidade de outras linhas deslocadas
+def move_to_position(session, model, key, group_column, position_column, position):
+    primary_key = inspect(model).primary_key[0]
+    current = session.execute(select(group_column, position_column).where(primary_key == key)).first()
+
+    if current is None:
+        return None
+
+    group, current_position = current
+    if position == current_position:
+        return 0
+
+    if position < current_position:
+        low, high, step = position, current_position, 1
+    else:
+        low, high, step = current_position, position, -1
+
+    statement = (
+        update(model)
+        .where(group_column == group, or_(primary_key == key, position_column.between(low, high)))
+        .values({position_column: case((primary_key == key, position), else_=position_column + step)})
+        .returning(primary_key)
+    )
+
+    moved = session.execute(statement, execution_options={"synchronize_session": False}).all()
+    return len(moved) - 1
@@ -0,0 +1,72 @@
+import base64
+import json
+
+from sqlalchemy import and_, or_
+
+
+#---------------------------------------------------------------------------#
+# Paginação por cursor (keyset): em vez de OFFSET, cada página continua a partir dos valores de ordenação
+# da última linha entregue, o que mantém o custo de cada página constante independente do tamanho da tabela
+def encode_cursor(values):
+    raw = json.dumps(list(values), separators=(",", ":")).encode("utf-8")
+    return base64.urlsafe_b64encode(raw).decode("ascii").rstrip("=")
+
+
+def decode_cursor(cursor, size):
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        values = json.loads(base64.urlsafe_b64decode(padded.encode("ascii")))
+    except (ValueError, TypeError):
+        raise ValueError("Cursor inválido")
+
+    if not isinstance(values, list) or len(values) != size:
+        raise ValueError("Cursor inválido")
+
+    return values
+
+
+#---------------------------------------------------------------------------#
+# Montagem da condição "depois do cursor" para uma ordenação composta, sendo ordering uma lista de (coluna, descendente).
+# Um valor nulo no cursor encerra a comparação: as colunas seguintes pertencem a uma linha sem par no outer join
+def keyset_after(ordering, values):
+    clauses = []
+    equals = []
+
+    for (column, descending), value in zip(ordering, values):
+        if value is None:
+            break
+
+        comparison = column < value if descending else column > value
+        clauses.append(and_(*equals, comparison))
+        equals.append(column == value)
+
+    return or_(*clauses)
+
+
+def order_clauses(ordering):
+    return [column.desc() if descending else column.asc() for column, descending in ordering]
+
+
+#---------------------------------------------------------------------------#
+# Aplicação da ordenação e do cursor na consulta, sem executá-la
+def keyset_query(query, ordering, after=None):
+    query = query.order_by(*order_clauses(ordering))
+
+    if after:
+        query = query.filter(keyset_after(ordering, decode_cursor(after, len(ordering))))
+
+    return query
+
+
+# Aplicação da ordenação e da paginação na consulta. Toda página tem um limite (as listagens usam PAGE_DEFAULT_LIMIT
+# quando limit não é informado), para que nenhuma resposta JSON carregue a tabela inteira na memória.
+# Retorna as linhas da página e o cursor da próxima página (None quando não há mais linhas)
+def paginate(query, ordering, key, limit, after=None):
+    query = keyset_query(query, ordering, after)
+    rows = query.limit(limit + 1).all()
+
+    if len(rows) <= limit:
+        return rows, None
+
+    rows = rows[:limit]
+    return rows, encode_cursor(key(rows[-1]))
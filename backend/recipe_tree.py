@@ -0,0 +1,131 @@
+from sqlalchemy import String, cast, false, literal, not_, select, union_all
+
+from serializer import column_keys, columns_of
+from table import AmigurumiSummary, FoundationList
+
+
+#colunas de cada amigurumi da árvore e, com contents, os totais mantidos em amigurumi_summary
+TREE_COLUMNS = columns_of(FoundationList)
+TREE_CONTENT_COLUMNS = columns_of(AmigurumiSummary, exclude=("amigurumi_id",))
+
+
+#---------------------------------------------------------------------------#
+# Família de receitas de um amigurumi pela coluna relationship (o amigurumi do qual a receita deriva): os ancestrais
+# (relationship acima, até a raiz) e os descendentes (amigurumis que apontam para este, em todos os níveis), resolvidos
+# em uma única consulta com duas CTEs recursivas. Cada linha leva o caminho percorrido ('/1/7/12/'): um amigurumi que
+# já está no caminho é marcado como ciclo e não é expandido, e a profundidade é limitada por max_depth nos dois sentidos
+def path_of(amigurumi_id):
+    return cast(amigurumi_id, String) + literal("/")
+
+
+def walk(amigurumi_id, max_depth, upwards):
+    foundation = FoundationList.__table__
+
+    start = select(
+        foundation.c.amigurumi_id,
+        foundation.c.relationship,
+        literal(0).label("depth"),
+        (literal("/") + path_of(foundation.c.amigurumi_id)).label("path"),
+        false().label("cycle"),
+    ).where(foundation.c.amigurumi_id == amigurumi_id)
+
+    nodes = start.cte("recipe_ancestors" if upwards else "recipe_descendants", recursive=True)
+    step = -1 if upwards else 1
+    link = foundation.c.amigurumi_id == nodes.c.relationship if upwards else foundation.c.relationship == nodes.c.amigurumi_id
+
+    visited = nodes.c.path.like(literal("%/") + path_of(foundation.c.amigurumi_id) + literal("%"))
+
+    nodes = nodes.union_all(
+        select(
+            foundation.c.amigurumi_id,
+            foundation.c.relationship,
+            nodes.c.depth + step,
+            nodes.c.path + path_of(foundation.c.amigurumi_id),
+            visited,
+        ).join_from(nodes, foundation, link).where(
+            not_(nodes.c.cycle),
+            (nodes.c.depth > -max_depth) if upwards else (nodes.c.depth < max_depth),
+        )
+    )
+
+    return nodes
+
+
+def recipe_tree_query(amigurumi_id, max_depth, contents=False):
+    ancestors = walk(amigurumi_id, max_depth, upwards=True)
+    descendants = walk(amigurumi_id, max_depth, upwards=False)
+
+    #o próprio amigurumi vem apenas dos descendentes (profundidade 0)
+    family = union_all(
+        select(ancestors.c.amigurumi_id, ancestors.c.depth, ancestors.c.cycle).where(ancestors.c.depth < 0),
+        select(descendants.c.amigurumi_id, descendants.c.depth, descendants.c.cycle),
+    ).subquery("recipe_family")
+
+    columns = TREE_COLUMNS + (family.c.depth, family.c.cycle)
+    if contents:
+        columns += TREE_CONTENT_COLUMNS
+
+    query = select(*columns).join_from(family, FoundationList, FoundationList.amigurumi_id == family.c.amigurumi_id)
+
+    if contents:
+        query = query.outerjoin(AmigurumiSummary, AmigurumiSummary.amigurumi_id == FoundationList.amigurumi_id)
+
+    return query.order_by(family.c.depth, FoundationList.amigurumi_id)
+
+
+#---------------------------------------------------------------------------#
+# Montagem da resposta: os ancestrais do mais próximo até a raiz, e os descendentes aninhados em children.
+# Linhas marcadas como ciclo (ou um amigurumi alcançado pelos dois sentidos) não são repetidas na árvore
+def recipe_tree(session, amigurumi_id, max_depth, contents=False):
+    query = recipe_tree_query(amigurumi_id, max_depth, contents)
+    keys = column_keys(query.selected_columns)
+
+    nodes = {}
+    ancestors = []
+    cycle = False
+
+    for row in session.execute(query):
+        node = dict(zip(keys, row))
+
+        if node.pop("cycle") or node["amigurumi_id"] in nodes:
+            cycle = True
+            continue
+
+        if contents:
+            node["contents"] = {column.key: node.pop(column.key) for column in TREE_CONTENT_COLUMNS}
+
+        nodes[node["amigurumi_id"]] = node
+
+        if node["depth"] < 0:
+            ancestors.append(node)
+            continue
+
+        node["children"] = []
+
+        #em um ciclo que passa pelo próprio amigurumi o pai de um descendente pode estar entre os ancestrais
+        if node["depth"] > 0:
+            nodes[node["relationship"]].setdefault("children", []).append(node)
+
+    root = nodes.get(amigurumi_id)
+    if root is None:
+        return None
+
+    ancestors.sort(key=lambda node: -node["depth"])
+
+    result = {
+        "amigurumi_id": amigurumi_id,
+        "max_depth": max_depth,
+        "cycle": cycle,
+        "ancestors": ancestors,
+        "tree": root,
+    }
+
+    #totais da família inteira (ancestrais, o próprio amigurumi e descendentes)
+    if contents:
+        result["totals"] = {
+            column.key: sum(node["contents"][column.key] or 0 for node in nodes.values())
+            for column in TREE_CONTENT_COLUMNS
+            if column.key not in ("has_main_image", "main_image_id")
+        }
+
+    return result
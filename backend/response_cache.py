@@ -0,0 +1,223 @@
+import functools
+import hashlib
+import json
+import threading
+from collections import OrderedDict
+from datetime import datetime, timezone
+
+from flask import Response, make_response, request
+from sqlalchemy import event, insert, select, update
+
+from table import TableVersion
+
+
+#---------------------------------------------------------------------------#
+# Backends do cache: todos guardam bytes por chave. O backend em memória atende um único processo
+# (e substitui o compartilhado nos testes); o Redis permite compartilhar o cache entre os workers
+class MemoryCacheBackend:
+    def __init__(self, max_entries=1024):
+        self.max_entries = max_entries
+        self.entries = OrderedDict()
+        self.lock = threading.Lock()
+
+    def get(self, key):
+        with self.lock:
+            value = self.entries.get(key)
+            if value is not None:
+                self.entries.move_to_end(key)
+            return value
+
+    def set(self, key, value):
+        with self.lock:
+            self.entries[key] = value
+            self.entries.move_to_end(key)
+
+            while len(self.entries) > self.max_entries:
+                self.entries.popitem(last=False)
+
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
+
+
+class RedisCacheBackend:
+    def __init__(self, url, ttl=3600):
+        import redis
+
+        self.client = redis.Redis.from_url(url)
+        self.ttl = ttl
+
+    def get(self, key):
+        return self.client.get(key)
+
+    def set(self, key, value):
+        self.client.set(key, value, ex=self.ttl)
+
+    def clear(self):
+        for key in self.client.scan_iter("response:*"):
+            self.client.delete(key)
+
+
+def create_cache_backend(url=None, max_entries=1024):
+    if not url or url == "memory://":
+        return MemoryCacheBackend(max_entries)
+
+    if url.startswith(("redis://", "rediss://", "unix://")):
+        return RedisCacheBackend(url)
+
+    raise ValueError(f"Backend de cache não suportado: {url}")
+
+
+#---------------------------------------------------------------------------#
+# Versão das tabelas: cada escrita incrementa o contador da tabela alterada dentro da sua própria transação,
+# tanto pelo flush do ORM (add/setattr/delete) quanto pelos INSERT/UPDATE/DELETE em lote executados pela sessão
+def bump_table_versions(connection, table_names):
+    table_names = set(table_names) - {TableVersion.__tablename__}
+    now = datetime.now(timezone.utc).replace(tzinfo=None)
+
+    for table_name in sorted(table_names):
+        result = connection.execute(
+            update(TableVersion.__table__)
+            .where(TableVersion.__table__.c.table_name == table_name)
+            .values(version=TableVersion.__table__.c.version + 1, updated_at=now)
+        )
+
+        if result.rowcount == 0:
+            connection.execute(insert(TableVersion.__table__).values(table_name=table_name, version=1, updated_at=now))
+
+
+def track_table_versions(session):
+    @event.listens_for(session, "after_flush")
+    def bump_after_flush(flush_session, flush_context):
+        changed = flush_session.new | flush_session.dirty | flush_session.deleted
+        table_names = {obj.__table__.name for obj in changed if hasattr(obj, "__table__")}
+
+        if table_names:
+            bump_table_versions(flush_session.connection(), table_names)
+
+    @event.listens_for(session, "do_orm_execute")
+    def bump_on_bulk_statement(orm_execute_state):
+        if not (orm_execute_state.is_insert or orm_execute_state.is_update or orm_execute_state.is_delete):
+            return
+
+        table = getattr(orm_execute_state.statement, "table", None)
+        if table is not None:
+            bump_table_versions(orm_execute_state.session.connection(), [table.name])
+
+
+def read_table_versions(session, table_names):
+    table = TableVersion.__table__
+    rows = session.execute(
+        select(table.c.table_name, table.c.version, table.c.updated_at).where(table.c.table_name.in_(table_names))
+    ).all()
+
+    versions = {table_name: (version, updated_at) for table_name, version, updated_at in rows}
+    return [(table_name, *versions.get(table_name, (0, None))) for table_name in table_names]
+
+
+#---------------------------------------------------------------------------#
+# Cache das respostas de leitura. A ETag é o hash do endpoint, dos parâmetros de consulta, do Accept e das versões das tabelas lidas,
+# então uma escrita muda a ETag e as entradas antigas simplesmente deixam de ser consultadas.
+# Um If-None-Match igual à ETag atual recebe 304 sem consultar os dados nem montar o JSON.
+# Com compressão, a variante comprimida também é guardada (chave com a codificação), comprimida uma única vez por versão
+CACHED_HEADERS = ("X-Next-Cursor", "Content-Encoding")
+
+class ResponseCache:
+    def __init__(self, session, backend=None, compression=None):
+        self.session = session
+        self.backend = backend or MemoryCacheBackend()
+        self.compression = compression
+
+    def init_app(self, app):
+        self.backend = create_cache_backend(app.config["CACHE_URL"], app.config["CACHE_MAX_ENTRIES"])
+
+    def etag_for(self, versions):
+        query = sorted(request.args.items(multi=True))
+        accept = request.headers.get("Accept", "")
+        key = json.dumps([request.path, query, accept, [[name, version] for name, version, _ in versions]])
+        return hashlib.sha256(key.encode("utf-8")).hexdigest()
+
+    def cached(self, *table_names):
+        def decorator(view):
+            @functools.wraps(view)
+            def wrapper(*args, **kwargs):
+                versions = read_table_versions(self.session, table_names)
+                etag = self.etag_for(versions)
+                modified = [updated_at for _, _, updated_at in versions if updated_at is not None]
+                last_modified = max(modified).replace(tzinfo=timezone.utc) if modified else None
+
+                #cada codificação é uma representação com a sua própria ETag
+                encoding = self.compression.negotiate() if self.compression is not None else None
+                encoded_etag = f"{etag}-{encoding}" if encoding else etag
+
+                if self.is_not_modified((etag, encoded_etag), last_modified):
+                    return self.build_response(Response(status=304), encoded_etag, last_modified)
+
+                entry = self.backend.get(f"response:{etag}")
+
+                if entry is None:
+                    response = make_response(view(*args, **kwargs))
+
+                    if response.status_code != 200 or response.is_streamed:
+                        return response
+
+                    entry = self.encode_entry(response)
+                    self.backend.set(f"response:{etag}", entry)
+
+                if encoding:
+                    encoded_entry = self.encoded_entry(entry, etag, encoding)
+                    if encoded_entry is not None:
+                        return self.build_response(self.decode_entry(encoded_entry), encoded_etag, last_modified)
+
+                return self.build_response(self.decode_entry(entry), etag, last_modified)
+
+            return wrapper
+
+        return decorator
+
+    #variante comprimida da entrada, guardada no cache; None quando o conteúdo não deve ser comprimido (tipo ou tamanho)
+    def encoded_entry(self, entry, etag, encoding):
+        meta, _, body = entry.partition(b"\n")
+        meta = json.loads(meta)
+
+        if not self.compression.should_compress(meta["mimetype"], len(body)):
+            return None
+
+        key = f"response:{etag}:{encoding}"
+        encoded_entry = self.backend.get(key)
+
+        if encoded_entry is None:
+            meta["headers"]["Content-Encoding"] = encoding
+            encoded_entry = json.dumps(meta).encode("utf-8") + b"\n" + self.compression.compress(body, encoding)
+            self.backend.set(key, encoded_entry)
+
+        return encoded_entry
+
+    def is_not_modified(self, etags, last_modified):
+        if request.if_none_match:
+            return any(request.if_none_match.contains(etag) for etag in etags)
+
+        if last_modified is not None and request.if_modified_since is not None:
+            return last_modified.replace(microsecond=0) <= request.if_modified_since
+
+        return False
+
+    @staticmethod
+    def build_response(response, etag, last_modified):
+        response.set_etag(etag)
+        if last_modified is not None:
+            response.last_modified = last_modified
+        return response
+
+    #a entrada guarda o cabeçalho em JSON na primeira linha e o corpo da resposta em seguida
+    @staticmethod
+    def encode_entry(response):
+        headers = {name: response.headers[name] for name in CACHED_HEADERS if name in response.headers}
+        meta = json.dumps({"mimetype": response.mimetype, "headers": headers}).encode("utf-8")
+        return meta + b"\n" + response.get_data()
+
+    @staticmethod
+    def decode_entry(entry):
+        meta, _, body = entry.partition(b"\n")
+        meta = json.loads(meta)
+        return Response(body, mimetype=meta["mimetype"], headers=meta["headers"])
@@ -0,0 +1,97 @@
+from flask import request
+from sqlalchemy import event, inspect, select, update
+
+from table import FoundationList, Image, MaterialList, StitchBook, StitchBookSequence
+
+
+#tabelas com a coluna version, incrementada a cada alteração da linha
+VERSIONED_TABLES = {
+    model.__tablename__: model.__table__
+    for model in (FoundationList, StitchBookSequence, StitchBook, MaterialList, Image)
+}
+
+
+class VersionConflict(ValueError):
+    pass
+
+
+#linhas alteradas pela exclusão de outra linha (ON DELETE SET NULL, como a coluna relationship dos amigurumis derivados):
+#a chave estrangeira é anulada pelo banco ou pelo ORM durante o flush, sem passar pelos incrementos abaixo, então a versão
+#é incrementada aqui, antes da exclusão, em um UPDATE por chave estrangeira
+def bump_set_null_references(connection, table, row_ids):
+    for source in VERSIONED_TABLES.values():
+        for foreign_key in source.foreign_keys:
+            if foreign_key.column.table.name == table.name and foreign_key.ondelete == "SET NULL":
+                connection.execute(
+                    update(source).where(foreign_key.parent.in_(row_ids)).values(version=source.c.version + 1)
+                )
+
+
+#---------------------------------------------------------------------------#
+# Incremento da versão em todas as escritas: nos UPDATEs executados pela sessão (inclusive em lote), nas linhas
+# alteradas pelo ORM (setattr + commit) e nas linhas anuladas pelo SET NULL de uma exclusão.
+# Deve ser registrado antes de track_amigurumi_summaries, que executa o comando
+def track_row_versions(session):
+    @event.listens_for(session, "do_orm_execute")
+    def bump_on_update_statement(orm_execute_state):
+        if not (orm_execute_state.is_update or orm_execute_state.is_delete):
+            return
+
+        table = getattr(orm_execute_state.statement, "table", None)
+        if table is None or table.name not in VERSIONED_TABLES:
+            return
+
+        if orm_execute_state.is_update:
+            orm_execute_state.statement = orm_execute_state.statement.values(version=table.c.version + 1)
+            return
+
+        whereclause = orm_execute_state.statement.whereclause
+        primary_key = table.primary_key.columns.values()[0]
+        row_ids = select(primary_key) if whereclause is None else select(primary_key).where(whereclause)
+        bump_set_null_references(orm_execute_state.session.connection(), table, row_ids)
+
+    @event.listens_for(session, "before_flush")
+    def bump_on_flush(flush_session, flush_context, instances):
+        for obj in flush_session.dirty:
+            if getattr(obj, "__tablename__", None) in VERSIONED_TABLES and flush_session.is_modified(obj, include_collections=False):
+                obj.version = type(obj).version + 1
+
+        deleted = {}
+        for obj in flush_session.deleted:
+            if getattr(obj, "__tablename__", None) in VERSIONED_TABLES and inspect(obj).identity:
+                deleted.setdefault(obj.__table__, []).append(inspect(obj).identity[0])
+
+        for table, row_ids in deleted.items():
+            bump_set_null_references(flush_session.connection(), table, row_ids)
+
+
+#---------------------------------------------------------------------------#
+# Versões aceitas pelo header If-Match (ETags fortes com o número da versão, como "3").
+# None quando o header não foi enviado ou é *, ou seja, a alteração não depende da versão atual
+def expected_versions():
+    if not request.if_match or request.if_match.star_tag:
+        return None
+
+    return [int(etag) for etag in request.if_match.as_set() if etag.isdigit()]
+
+
+#---------------------------------------------------------------------------#
+# Alteração condicional em um único UPDATE ... WHERE chave = ? AND version IN (...), apenas com as colunas enviadas,
+# sem ler a linha antes. Retorna a nova versão, None quando a linha não existe, ou VersionConflict quando a linha
+# existe com outra versão (a consulta da existência só acontece nesse caso)
+def conditional_update(session, model, key, values):
+    primary_key = inspect(model).primary_key[0]
+    versions = expected_versions()
+
+    statement = update(model).where(primary_key == key).values(**values).returning(model.version)
+    if versions is not None:
+        statement = statement.where(model.version.in_(versions))
+
+    version = session.execute(statement, execution_options={"synchronize_session": False}).scalar()
+
+    if version is None and versions is not None:
+        current = session.scalar(select(model.version).where(primary_key == key))
+        if current is not None:
+            raise VersionConflict(f"A linha foi alterada por outra requisição (versão atual {current}), leia-a novamente")
+
+    return version
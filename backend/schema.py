@@ -1,16 +1,87 @@
+import threading
+from functools import cache
+
 from table import *
-from pydantic import create_model, Field
-from typing import Optional
+from pydantic import BaseModel, ConfigDict, RootModel, create_model, Field
+from typing import Annotated, List, Literal, Optional
 from sqlalchemy.inspection import inspect
 
 
 #---------------------------------------------------------------------------#
-# Código padrão para trazer todas as colunas de cada tabela, identificação da sua formatação, descriçao da coluna e obrigatoriedade de preenchimento
+# Os esquemas gerados a partir das tabelas são criados uma única vez por tabela e variante (cache das funções abaixo)
+# e com defer_build: o validador e o serializador do pydantic, a parte cara da criação, só são montados na primeira
+# validação de cada esquema, e não na importação. warm_up_schemas monta todos de uma vez (SCHEMA_WARMUP)
+SCHEMA_CONFIG = ConfigDict(defer_build=True)
+
+#a montagem adiada do pydantic não é segura entre threads: requisições simultâneas na primeira validação de um esquema
+#podem ler o modelo montado pela metade (model_json_schema sem as propriedades, e o flask-openapi3 falha com 500).
+#A montagem passa por uma trava, antes de qualquer uso do esquema pelo flask-openapi3
+SCHEMA_BUILD_LOCK = threading.RLock()
+
+
+def build_schema(model):
+    if model.__pydantic_complete__:
+        return False
+
+    with SCHEMA_BUILD_LOCK:
+        if model.__pydantic_complete__:
+            return False
+
+        model.model_rebuild(force=True)
+        return True
+
+
+class DeferredBuild:
+    @classmethod
+    def model_json_schema(cls, *args, **kwargs):
+        build_schema(cls)
+        return super().model_json_schema(*args, **kwargs)
+
+    @classmethod
+    def model_validate(cls, *args, **kwargs):
+        build_schema(cls)
+        return super().model_validate(*args, **kwargs)
+
+    @classmethod
+    def model_validate_json(cls, *args, **kwargs):
+        build_schema(cls)
+        return super().model_validate_json(*args, **kwargs)
+
+
+class DeferredModel(DeferredBuild, BaseModel):
+    model_config = SCHEMA_CONFIG
+
+
+class DeferredRootModel(DeferredBuild, RootModel):
+    model_config = SCHEMA_CONFIG
+
+
+#montagem antecipada de todos os esquemas deste módulo, para que a primeira requisição de cada rota não pague por ela
+def warm_up_schemas():
+    built = 0
+
+    for value in list(globals().values()):
+        if value in (BaseModel, RootModel, DeferredModel, DeferredRootModel):
+            continue
+
+        if isinstance(value, type) and issubclass(value, BaseModel) and build_schema(value):
+            built += 1
+
+    return built
+
+
+#---------------------------------------------------------------------------#
+# Código padrão para trazer todas as colunas de cada tabela, identificação da sua formatação, descriçao da coluna e obrigatoriedade de preenchimento.
+# As colunas marcadas como "computed" são preenchidas pelo servidor e não fazem parte dos dados enviados pelo usuário
+@cache
 def bringAllCollumns(model_class):
     columns = inspect(model_class).c
     annotations = {}
 
     for column in columns:
+        if column.info.get("computed"):
+            continue
+
         column_type = column.type.python_type  
         description = column.info.get("description", "Campo sem descrição")
         
@@ -21,7 +92,7 @@ def bringAllCollumns(model_class):
         else:
             annotations[column.name] = (column_type, Field(..., description=description))
  
-    return create_model(f"{model_class.__name__}Schema_All", **annotations)
+    return create_model(f"{model_class.__name__}Schema_All", __base__=DeferredModel, **annotations)
 
 FoundationListSchema_All = bringAllCollumns(FoundationList)
 MaterialListSchema_All = bringAllCollumns(MaterialList)
@@ -30,15 +101,49 @@ StitchBookSchema_All = bringAllCollumns(StitchBook)
 StitchBookSequenceSchema_All = bringAllCollumns(StitchBookSequence)
 
 
+#---------------------------------------------------------------------------#
+# Código padrão para as alterações parciais (PUT): apenas a chave principal é obrigatória, e somente as colunas enviadas
+# são alteradas. As colunas obrigatórias da tabela podem ser omitidas, mas não enviadas como null
+@cache
+def bringPartialCollumns(model_class):
+    columns = inspect(model_class).c
+    annotations = {}
+
+    for column in columns:
+        if column.info.get("computed"):
+            continue
+
+        column_type = column.type.python_type
+        description = column.info.get("description", "Campo sem descrição")
+
+        if column.primary_key:
+            annotations[column.name] = (column_type, Field(..., description=description))
+
+        elif column.nullable:
+            annotations[column.name] = (Optional[column_type], Field(None, description=description))
+
+        else:
+            annotations[column.name] = (column_type, Field(None, description=f"{description} (omitido, não é alterado)"))
+
+    return create_model(f"{model_class.__name__}Schema_Partial", __base__=DeferredModel, **annotations)
+
+FoundationListSchema_Partial = bringPartialCollumns(FoundationList)
+MaterialListSchema_Partial = bringPartialCollumns(MaterialList)
+ImageSchema_Partial = bringPartialCollumns(Image)
+StitchBookSchema_Partial = bringPartialCollumns(StitchBook)
+StitchBookSequenceSchema_Partial = bringPartialCollumns(StitchBookSequence)
+
+
 #---------------------------------------------------------------------------#
 # Código padrão para trazer todas as colunas de cada tabela, com excessão das colunas de chave principal, identificação da sua formatação, 
 # descriçao da coluna e obrigatoriedade de preenchimento
+@cache
 def bringOnlyNoPrimaryKeyCollumns(model_class):
     columns = inspect(model_class).c
     annotations = {}
 
     for column in columns:
-        if not column.primary_key:
+        if not column.primary_key and not column.info.get("computed"):
             column_type = column.type.python_type  
             description = column.info.get("description", "Campo sem descrição")
             
@@ -49,7 +154,7 @@ def bringOnlyNoPrimaryKeyCollumns(model_class):
             else:
                 annotations[column.name] = (column_type, Field(..., description=description))
  
-    return create_model(f"{model_class.__name__}Schema_No_Auto", **annotations)
+    return create_model(f"{model_class.__name__}Schema_No_Auto", __base__=DeferredModel, **annotations)
 
 FoundationListSchema_No_Auto = bringOnlyNoPrimaryKeyCollumns(FoundationList)
 MaterialListSchema_No_Auto = bringOnlyNoPrimaryKeyCollumns(MaterialList)
@@ -61,6 +166,7 @@ StitchBookSequenceSchema_No_Auto = bringOnlyNoPrimaryKeyCollumns(StitchBookSeque
 
 #---------------------------------------------------------------------------#
 # Código padrão para trazer apenas a coluna de chave principal, identificação da sua formatação, descriçao da coluna e obrigatoriedade de preenchimento
+@cache
 def bringOnlyPrimaryKey(model_class):
     columns = inspect(model_class).c
     annotations = {}
@@ -77,7 +183,7 @@ def bringOnlyPrimaryKey(model_class):
             else:
                 annotations[column.name] = (column_type, Field(..., description=description))
  
-    return create_model(f"{model_class.__name__}Schema_PrimaryKey", **annotations)
+    return create_model(f"{model_class.__name__}Schema_PrimaryKey", __base__=DeferredModel, **annotations)
 
 FoundationListSchema_PrimaryKey = bringOnlyPrimaryKey(FoundationList)
 MaterialListSchema_PrimaryKey = bringOnlyPrimaryKey(MaterialList)
@@ -86,3 +192,151 @@ StitchBookSchema_PrimaryKey = bringOnlyPrimaryKey(StitchBook)
 StitchBookSequenceSchema_PrimaryKey = bringOnlyPrimaryKey(StitchBookSequence)
 
 
+
+#---------------------------------------------------------------------------#
+# Código padrão para as operações em lote: uma lista com os mesmos campos da operação de uma única linha
+BULK_MAX_ITEMS = 5000
+
+@cache
+def bringBulkList(schema):
+    items = Annotated[List[schema], Field(min_length=1, max_length=BULK_MAX_ITEMS)]
+    return create_model(f"{schema.__name__}_Bulk", __base__=DeferredRootModel[items])
+
+MaterialListSchema_No_Auto_Bulk = bringBulkList(MaterialListSchema_No_Auto)
+StitchBookSchema_No_Auto_Bulk = bringBulkList(StitchBookSchema_No_Auto)
+StitchBookSequenceSchema_No_Auto_Bulk = bringBulkList(StitchBookSequenceSchema_No_Auto)
+
+MaterialListSchema_All_Bulk = bringBulkList(MaterialListSchema_All)
+StitchBookSchema_All_Bulk = bringBulkList(StitchBookSchema_All)
+StitchBookSequenceSchema_All_Bulk = bringBulkList(StitchBookSequenceSchema_All)
+
+MaterialListSchema_PrimaryKey_Bulk = bringBulkList(MaterialListSchema_PrimaryKey)
+StitchBookSchema_PrimaryKey_Bulk = bringBulkList(StitchBookSchema_PrimaryKey)
+StitchBookSequenceSchema_PrimaryKey_Bulk = bringBulkList(StitchBookSequenceSchema_PrimaryKey)
+
+
+
+#---------------------------------------------------------------------------#
+# Parâmetros de consulta das listagens: paginação por cursor (limit/after) e filtros aplicados no servidor.
+# Sem limit a página tem PAGE_DEFAULT_LIMIT linhas (padrão 100); o cursor da próxima página vem no header X-Next-Cursor.
+# Com stream as linhas são enviadas em NDJSON conforme são lidas, sem cursor da próxima página
+PAGE_MAX_LIMIT = 1000
+
+class PaginationQuery(DeferredModel):
+    limit: Optional[int] = Field(None, ge=1, le=PAGE_MAX_LIMIT, description="quantidade máxima de linhas retornadas na página (padrão PAGE_DEFAULT_LIMIT, 100)")
+    after: Optional[str] = Field(None, description="cursor da página anterior, recebido no header X-Next-Cursor")
+    stream: bool = Field(False, description="envio das linhas em NDJSON, à medida que são lidas (o mesmo que Accept: application/x-ndjson)")
+
+
+class FoundationListQuery(PaginationQuery):
+    autor: Optional[str] = Field(None, description="filtro pelo dono da receita")
+
+
+class StitchBookQuery(PaginationQuery):
+    amigurumi_id: Optional[int] = Field(None, description="filtro pelo id do amigurumi")
+    element_id: Optional[int] = Field(None, description="filtro pelo id da parte do amigurumi")
+
+
+class ImageQuery(PaginationQuery):
+    amigurumi_id: Optional[int] = Field(None, description="filtro pelo id do amigurumi")
+    list_id: Optional[int] = Field(None, description="filtro pelo id da lista de materiais")
+
+
+class MaterialListQuery(PaginationQuery):
+    amigurumi_id: Optional[int] = Field(None, description="filtro pelo id do amigurumi")
+    list_id: Optional[int] = Field(None, description="filtro pelo id da lista de materiais")
+
+
+class StitchBookSequenceQuery(PaginationQuery):
+    amigurumi_id: Optional[int] = Field(None, description="filtro pelo id do amigurumi")
+    element_id: Optional[int] = Field(None, description="filtro pelo id da parte do amigurumi")
+
+
+
+#filtros das contagens de pontos, sem paginação: o resultado tem uma linha por parte ou por amigurumi
+class StitchCountQuery(DeferredModel):
+    amigurumi_id: Optional[int] = Field(None, description="filtro pelo id do amigurumi")
+    element_id: Optional[int] = Field(None, description="filtro pelo id da parte do amigurumi")
+
+
+
+#busca por palavras, com os resultados mais relevantes primeiro; limit padrão de 20 resultados por página
+class SearchQuery(DeferredModel):
+    q: str = Field(..., min_length=1, max_length=200, description="palavras buscadas nos nomes, autores, partes, materiais e observações")
+    limit: int = Field(20, ge=1, le=PAGE_MAX_LIMIT, description="quantidade máxima de resultados retornados na página")
+    after: Optional[str] = Field(None, description="cursor da página anterior, recebido no header X-Next-Cursor")
+
+
+
+#nova posição na reordenação: as linhas entre a posição atual e a nova são deslocadas uma posição
+class StitchBookMove(DeferredModel):
+    number_row: int = Field(..., ge=0, description="nova posição (número da carreira) dentro da parte")
+
+
+class StitchBookSequenceMove(DeferredModel):
+    element_order: int = Field(..., ge=0, description="nova posição da parte dentro do amigurumi")
+
+
+
+#família de receitas de um amigurumi (ancestrais e descendentes pela coluna relationship)
+TREE_MAX_DEPTH = 50
+
+class RecipeTreeQuery(DeferredModel):
+    depth: int = Field(10, ge=1, le=TREE_MAX_DEPTH, description="quantidade máxima de níveis percorridos acima e abaixo do amigurumi")
+    contents: bool = Field(False, description="inclusão dos totais de cada receita: partes, carreiras, materiais, imagens e pontos")
+
+
+
+#dados da imagem enviada em segundo plano; o conteúdo vai no corpo (multipart, campo image, ou os bytes da imagem)
+class ImageUploadQuery(DeferredModel):
+    amigurumi_id: int = Field(..., description="chave estrangeira, para indicação do amigurumi")
+    list_id: int = Field(..., description="chave estrangeira, para identificação da lista de materiais")
+    main_image: bool = Field(False, description="declaração da imagem principal, sendo True, como a principal")
+
+
+
+#amigurumis exportados (?amigurumi_id=1&amigurumi_id=2); sem o filtro, todos os amigurumis
+class ExportQuery(DeferredModel):
+    amigurumi_id: List[int] = Field([], description="ids dos amigurumis exportados")
+
+
+
+#alterações desde o cursor (change_id) da última sincronização; sem since, apenas o cursor atual é retornado
+CHANGE_TABLES = Literal["foundation_list", "stitchbook_sequence", "stitchbook", "material_list", "image"]
+
+class ChangesQuery(DeferredModel):
+    since: Optional[int] = Field(None, ge=0, description="cursor recebido na sincronização anterior")
+    limit: int = Field(500, ge=1, le=PAGE_MAX_LIMIT, description="quantidade máxima de alterações lidas do registro")
+    table: List[CHANGE_TABLES] = Field([], description="tabelas sincronizadas (?table=stitchbook&table=image); sem o filtro, todas")
+    amigurumi_id: Optional[int] = Field(None, description="sincronização das linhas de um único amigurumi")
+
+
+
+#---------------------------------------------------------------------------#
+# Parâmetros de rota
+class ImagePath(DeferredModel):
+    image_id: int = Field(..., description="chave primária das imagens")
+
+
+class AmigurumiPath(DeferredModel):
+    amigurumi_id: int = Field(..., description="chave primária dos amigurumis")
+
+
+class StitchBookPath(DeferredModel):
+    line_id: int = Field(..., description="chave primária das carreiras")
+
+
+class StitchBookSequencePath(DeferredModel):
+    element_id: int = Field(..., description="chave primária das partes do amigurumi")
+
+
+class ImageUploadPath(DeferredModel):
+    job_id: str = Field(..., max_length=32, description="id do envio, retornado no upload da imagem")
+
+
+
+#---------------------------------------------------------------------------#
+# Parâmetros das miniaturas de imagem
+class ThumbnailQuery(DeferredModel):
+    w: int = Field(256, ge=16, le=2048, description="largura máxima da miniatura em pixels")
+    fmt: Literal["webp", "jpeg", "png"] = Field("webp", description="formato da miniatura")
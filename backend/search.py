@@ -0,0 +1,181 @@
+import re
+
+from sqlalchemy import Column, Integer, MetaData, String, Table, case, func, literal, literal_column, or_, select, union_all
+
+from table import FoundationList, MaterialList, StitchBook, StitchBookSequence
+
+
+#---------------------------------------------------------------------------#
+# Textos pesquisáveis de cada tabela: (código da tabela, tabela, título, detalhe). O título tem peso maior na ordenação.
+# O código compõe o rowid do índice (chave primária * 8 + código), o que permite localizar o documento de cada linha
+# sem percorrer o índice
+SEARCH_SOURCES = [
+    (1, FoundationList.__table__, "name", "autor"),
+    (2, StitchBookSequence.__table__, "element_name", None),
+    (3, MaterialList.__table__, "material_name", None),
+    (4, StitchBook.__table__, None, "observation"),
+]
+
+TITLE_WEIGHT = 2.0
+DETAIL_WEIGHT = 1.0
+
+SEARCH_INDEX = "search_index"
+
+#tabela virtual FTS5 do SQLite, declarada fora do db.metadata para não ser criada pelo db.create_all()
+search_index = Table(
+    SEARCH_INDEX, MetaData(),
+    Column("rowid", Integer, primary_key=True),
+    Column("title", String),
+    Column("detail", String),
+    Column("kind", String),
+    Column("source_id", Integer),
+    Column("amigurumi_id", Integer),
+)
+
+
+def primary_key_of(table):
+    return table.primary_key.columns.values()[0].name
+
+
+#---------------------------------------------------------------------------#
+# Criação do índice no SQLite: tabela FTS5 (sem acentos: "cabeca" encontra "cabeça") e gatilhos que mantêm os documentos
+# atualizados em qualquer escrita, inclusive nos comandos em lote e nas exclusões em cascata do banco.
+# Os comandos usam IF NOT EXISTS: a recriação de uma tabela pelas migrações remove os seus gatilhos, recriados aqui
+def document_values(code, table, title, detail, row):
+    primary_key = primary_key_of(table)
+    title_value = f"{row}.{title}" if title else "NULL"
+    detail_value = f"{row}.{detail}" if detail else "NULL"
+
+    return (
+        f"({row}.{primary_key} * 8 + {code}, {title_value}, {detail_value}, "
+        f"'{table.name}', {row}.{primary_key}, {row}.amigurumi_id)"
+    )
+
+
+def search_index_ddl():
+    statements = [
+        f"CREATE VIRTUAL TABLE IF NOT EXISTS {SEARCH_INDEX} USING fts5("
+        "title, detail, kind UNINDEXED, source_id UNINDEXED, amigurumi_id UNINDEXED, "
+        "tokenize = 'unicode61 remove_diacritics 2')"
+    ]
+
+    columns = f"{SEARCH_INDEX} (rowid, title, detail, kind, source_id, amigurumi_id)"
+
+    for code, table, title, detail in SEARCH_SOURCES:
+        primary_key = primary_key_of(table)
+        watched = ", ".join(column for column in (title, detail, "amigurumi_id") if column)
+        delete_old = f"DELETE FROM {SEARCH_INDEX} WHERE rowid = old.{primary_key} * 8 + {code};"
+        insert_new = f"INSERT INTO {columns} VALUES {document_values(code, table, title, detail, 'new')};"
+
+        statements += [
+            f"CREATE TRIGGER IF NOT EXISTS {table.name}_search_insert AFTER INSERT ON {table.name} BEGIN {insert_new} END",
+            f"CREATE TRIGGER IF NOT EXISTS {table.name}_search_update AFTER UPDATE OF {watched} ON {table.name} "
+            f"BEGIN {delete_old} {insert_new} END",
+            f"CREATE TRIGGER IF NOT EXISTS {table.name}_search_delete AFTER DELETE ON {table.name} BEGIN {delete_old} END",
+        ]
+
+    return statements
+
+
+def create_search_index(connection):
+    if connection.dialect.name != "sqlite":
+        return
+
+    exists = connection.exec_driver_sql(
+        "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = ?", (SEARCH_INDEX,)
+    ).first()
+
+    for statement in search_index_ddl():
+        connection.exec_driver_sql(statement)
+
+    if not exists:
+        rebuild_search_index(connection)
+
+
+#indexação de todas as linhas já cadastradas
+def rebuild_search_index(connection):
+    connection.exec_driver_sql(f"DELETE FROM {SEARCH_INDEX}")
+
+    for code, table, title, detail in SEARCH_SOURCES:
+        values = document_values(code, table, title, detail, table.name)[1:-1]
+        connection.exec_driver_sql(
+            f"INSERT INTO {SEARCH_INDEX} (rowid, title, detail, kind, source_id, amigurumi_id) SELECT {values} FROM {table.name}"
+        )
+
+
+#---------------------------------------------------------------------------#
+# Conversão do texto pesquisado em termos: cada palavra vira um prefixo entre aspas ("urs"*), combinados com AND.
+# Os operadores do FTS5 digitados pelo usuário são tratados como texto comum, sem erros de sintaxe
+def search_terms(text):
+    return re.findall(r"\w+", text.lower())
+
+
+def fts_query(terms):
+    return " ".join('"' + term.replace('"', '""') + '"*' for term in terms)
+
+
+#---------------------------------------------------------------------------#
+# Consultas de busca, com as colunas kind, source_id, amigurumi_id, title, detail e score (menor é mais relevante)
+# e a ordenação usada na paginação por cursor
+def sqlite_search(session, terms):
+    match = literal_column(SEARCH_INDEX).op("MATCH")(fts_query(terms))
+    score = func.bm25(literal_column(SEARCH_INDEX), TITLE_WEIGHT, DETAIL_WEIGHT).label("score")
+    rowid = search_index.c.rowid
+
+    query = session.query(
+        search_index.c.kind, search_index.c.source_id, search_index.c.amigurumi_id,
+        func.highlight(literal_column(SEARCH_INDEX), 0, "<b>", "</b>").label("title"),
+        func.highlight(literal_column(SEARCH_INDEX), 1, "<b>", "</b>").label("detail"),
+        score, rowid,
+    ).select_from(search_index).filter(match)
+
+    return query, [(score, False), (rowid, False)]
+
+
+#nos demais bancos, busca por LIKE em cada tabela (sem índice), com os resultados no título à frente dos no detalhe
+def fallback_search(session, terms):
+    selects = []
+
+    for code, table, title, detail in SEARCH_SOURCES:
+        primary_key = table.c[primary_key_of(table)]
+        title_column = table.c[title] if title else literal(None, String)
+        detail_column = table.c[detail] if detail else literal(None, String)
+        searched = [table.c[name] for name in (title, detail) if name]
+
+        #todas as palavras precisam aparecer no título ou no detalhe
+        conditions = [or_(*[func.lower(column).like(f"%{term}%") for column in searched]) for term in terms]
+
+        title_hits = literal(0)
+        if title:
+            title_hits = sum(case((func.lower(title_column).like(f"%{term}%"), 1), else_=0) for term in terms)
+
+        selects.append(
+            select(
+                literal(table.name, String).label("kind"),
+                primary_key.label("source_id"),
+                table.c.amigurumi_id.label("amigurumi_id"),
+                title_column.label("title"),
+                detail_column.label("detail"),
+                (-1.0 * (1 + title_hits * TITLE_WEIGHT)).label("score"),
+                (primary_key * 8 + code).label("rowid"),
+            ).where(*conditions)
+        )
+
+    results = union_all(*selects).subquery("search_results")
+    query = session.query(
+        results.c.kind, results.c.source_id, results.c.amigurumi_id, results.c.title, results.c.detail,
+        results.c.score, results.c.rowid,
+    )
+
+    return query, [(results.c.score, False), (results.c.rowid, False)]
+
+
+def search_query(session, text):
+    terms = search_terms(text)
+    if not terms:
+        raise ValueError("Informe ao menos uma palavra para a busca")
+
+    if session.get_bind().dialect.name == "sqlite":
+        return sqlite_search(session, terms)
+
+    return fallback_search(session, terms)
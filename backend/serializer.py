@@ -0,0 +1,69 @@
+import functools
+import json
+from datetime import date
+from itertools import islice
+
+from flask import Response, stream_with_context
+from sqlalchemy import inspect
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+
+#---------------------------------------------------------------------------#
+# Colunas de cada modelo, lidas dos mesmos metadados usados em schema.py. As listagens selecionam apenas essas colunas,
+# recebendo tuplas simples em vez de objetos do ORM (sem identity map e sem relacionamentos carregados por engano)
+@functools.lru_cache(maxsize=None)
+def columns_of(model, exclude=()):
+    return tuple(getattr(model, column.key) for column in inspect(model).column_attrs if column.key not in exclude)
+
+
+def column_keys(columns):
+    return tuple(column.key for column in columns)
+
+
+#apenas as colunas carregadas de um objeto do ORM, sem os relacionamentos
+def object_to_dict(obj):
+    state = inspect(obj)
+    return {column.key: state.dict[column.key] for column in state.mapper.column_attrs if column.key in state.dict}
+
+
+#---------------------------------------------------------------------------#
+# Codificação JSON: orjson quando instalado, com o json padrão como alternativa. Datas seguem o formato ISO (AAAA-MM-DD) nos dois casos
+def json_default(value):
+    if isinstance(value, date):
+        return value.isoformat()
+
+    raise TypeError(f"Tipo não serializável em JSON: {type(value).__name__}")
+
+
+def dumps(data):
+    if orjson is not None:
+        return orjson.dumps(data)
+
+    return json.dumps(data, default=json_default, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+
+
+def json_response(data, status=200):
+    return Response(dumps(data), status=status, mimetype="application/json")
+
+
+#---------------------------------------------------------------------------#
+# Resposta em NDJSON (um objeto JSON por linha), enviada em blocos enquanto as linhas são lidas do banco,
+# com uso de memória constante independente do tamanho da tabela
+STREAM_BATCH_SIZE = 500
+
+def ndjson_response(rows, to_dict):
+    rows = iter(rows)
+
+    def generate():
+        while True:
+            batch = list(islice(rows, STREAM_BATCH_SIZE))
+            if not batch:
+                break
+
+            yield b"".join(dumps(to_dict(row)) + b"\n" for row in batch)
+
+    return Response(stream_with_context(generate()), mimetype="application/x-ndjson")
@@ -0,0 +1,206 @@
+import re
+import unicodedata
+
+
+#---------------------------------------------------------------------------#
+# Pontos reconhecidos na notação das carreiras, em inglês e em português, com o que cada um contribui para a carreira:
+# (pontos resultantes, aumentos, diminuições). O aumento resulta em 2 pontos e a diminuição em 1.
+# Anel mágico e ponto baixíssimo não somam pontos à carreira
+STITCHES = {
+    "sc": (1, 0, 0), "pb": (1, 0, 0),
+    "hdc": (1, 0, 0), "mpa": (1, 0, 0),
+    "dc": (1, 0, 0), "pa": (1, 0, 0),
+    "tr": (1, 0, 0), "pad": (1, 0, 0),
+    "ch": (1, 0, 0), "corr": (1, 0, 0),
+    "inc": (2, 1, 0), "aum": (2, 1, 0),
+    "dec": (1, 0, 1), "invdec": (1, 0, 1), "dim": (1, 0, 1),
+    "slst": (0, 0, 0), "ss": (0, 0, 0), "pbx": (0, 0, 0),
+    "mr": (0, 0, 0), "am": (0, 0, 0),
+}
+
+#palavras que apenas descrevem onde o ponto é feito (no anel, na alça de trás...) e não alteram a contagem
+MODIFIERS = {"in", "into", "each", "blo", "flo", "bl", "fl", "em", "no", "na", "cada", "st", "sts", "pt", "pts", "ponto", "pontos"}
+
+#expressões de mais de uma palavra, reduzidas a um único termo antes da leitura
+PHRASES = [
+    (r"\bsl\s*st\b", "slst"),
+    (r"\binv\s*dec\b", "invdec"),
+    (r"\banel\s+magico\b", "am"),
+    (r"\bponto\s+baixissimo\b", "pbx"),
+    (r"\bponto\s+baixo\b", "pb"),
+    (r"\bmeio\s+ponto\s+alto\b", "mpa"),
+    (r"\bponto\s+alto\s+duplo\b", "pad"),
+    (r"\bponto\s+alto\b", "pa"),
+    (r"\baumentos?\b", "aum"),
+    (r"\bdiminuic(?:ao|oes)\b", "dim"),
+    (r"\bcorrentinhas?\b", "corr"),
+    (r"(\d+)\s*(?:vezes|times)\b", r"x \1"),
+]
+
+TOKEN = re.compile(r"\s*(?:(\d+)|([a-z]+)|([()\[\],;*=]))")
+CLOSING = {"(": ")", "[": "]"}
+
+
+def normalize(text):
+    text = unicodedata.normalize("NFKD", text.lower().replace("×", "x"))
+    text = "".join(char for char in text if not unicodedata.combining(char))
+
+    for pattern, replacement in PHRASES:
+        text = re.sub(pattern, replacement, text)
+
+    return text
+
+
+def tokenize(text):
+    tokens = []
+    position = 0
+    text = text.rstrip()
+
+    while position < len(text):
+        match = TOKEN.match(text, position)
+        if not match:
+            raise ValueError(f"Caractere não reconhecido na sequência de pontos: {text[position:].strip()[:1]!r}")
+
+        number, word, symbol = match.groups()
+        tokens.append(("num", int(number)) if number else ("word", word) if word else ("sym", symbol))
+        position = match.end()
+
+    return tokens
+
+
+#---------------------------------------------------------------------------#
+# Leitura da notação por descida recursiva. Formatos aceitos, combináveis entre si:
+#   6sc | 6 sc | ch 1 | sc, inc | (sc, inc)*6 | [2sc, dec]x4 | 6x(sc, inc) | 6sc in mr | (sc, inc) x 6 (18) | (pb, aum) 6 vezes
+# Um número isolado entre parênteses, ou depois de "=", é o total declarado da carreira e não entra na soma
+class StitchNotationParser:
+    def __init__(self, text):
+        self.tokens = tokenize(normalize(text))
+        self.position = 0
+        self.declared = None
+
+    def peek(self, offset=0):
+        index = self.position + offset
+        return self.tokens[index] if index < len(self.tokens) else (None, None)
+
+    def take(self):
+        token = self.peek()
+        self.position += 1
+        return token
+
+    def parse(self):
+        total = self.sequence(closing=None)
+
+        if self.position < len(self.tokens):
+            raise ValueError(f"Sequência de pontos inválida próximo de {self.peek()[1]!r}")
+
+        return total
+
+    def sequence(self, closing):
+        total = (0, 0, 0)
+
+        while True:
+            kind, value = self.peek()
+
+            if kind is None or (kind == "sym" and value == closing):
+                return total
+
+            if kind == "sym" and value in (",", ";"):
+                self.take()
+                continue
+
+            total = add(total, self.item())
+
+    def item(self):
+        count = 1
+        kind, value = self.peek()
+
+        #total declarado: "= 18"
+        if kind == "sym" and value == "=":
+            self.take()
+            self.declared = self.expect_number()
+            return (0, 0, 0)
+
+        #total declarado: "(18)" ou "[18]"
+        if kind == "sym" and value in CLOSING and self.peek(1)[0] == "num" and self.peek(2) == ("sym", CLOSING[value]):
+            self.take()
+            self.declared = self.take()[1]
+            self.take()
+            return (0, 0, 0)
+
+        #repetição antes do ponto ou do grupo: "6sc", "6 x (sc, inc)"
+        if kind == "num":
+            count = self.take()[1]
+            if self.is_repeat_mark(self.peek()):
+                self.take()
+
+        is_stitch = self.peek()[0] == "word"
+        tally = self.atom()
+
+        #quantidade depois do ponto, no fim do item: "ch 1", "sl st 3"
+        if is_stitch and self.peek()[0] == "num" and self.peek(1) in ((None, None), ("sym", ","), ("sym", ";"), ("sym", ")"), ("sym", "]")):
+            count *= self.take()[1]
+
+        #repetição depois do ponto ou do grupo: "(sc, inc)*6", "[2sc, dec] x 4"
+        while self.is_repeat_mark(self.peek()) and self.peek(1)[0] == "num":
+            self.take()
+            count *= self.take()[1]
+
+        return multiply(tally, count)
+
+    def atom(self):
+        kind, value = self.take()
+
+        if kind == "sym" and value in CLOSING:
+            tally = self.sequence(closing=CLOSING[value])
+            if self.take() != ("sym", CLOSING[value]):
+                raise ValueError(f"Grupo sem fechamento na sequência de pontos: falta {CLOSING[value]!r}")
+            return tally
+
+        if kind == "word" and value in STITCHES:
+            while self.peek()[0] == "word" and self.peek()[1] in MODIFIERS:
+                self.take()
+            return STITCHES[value]
+
+        if kind is None:
+            raise ValueError("Sequência de pontos incompleta")
+
+        raise ValueError(f"Ponto não reconhecido na sequência de pontos: {value!r}")
+
+    def expect_number(self):
+        kind, value = self.take()
+        if kind != "num":
+            raise ValueError("Total declarado inválido na sequência de pontos")
+        return value
+
+    @staticmethod
+    def is_repeat_mark(token):
+        return token in (("word", "x"), ("sym", "*"))
+
+
+def add(first, second):
+    return tuple(a + b for a, b in zip(first, second))
+
+
+def multiply(tally, count):
+    return tuple(value * count for value in tally)
+
+
+#---------------------------------------------------------------------------#
+# Contagem de uma carreira, nos nomes das colunas de StitchBook. Se a notação não for reconhecida as contagens ficam nulas,
+# já que stich_sequence continua aceitando texto livre
+def stitch_counts(stich_sequence):
+    unknown = {"stitch_count": None, "increase_count": None, "decrease_count": None}
+
+    try:
+        parser = StitchNotationParser(stich_sequence or "")
+        if not parser.tokens:
+            return unknown
+        stitches, increases, decreases = parser.parse()
+    except ValueError:
+        return unknown
+
+    #carreira descrita apenas pelo total, como "(18)"
+    if stitches == 0 and parser.declared is not None:
+        stitches = parser.declared
+
+    return {"stitch_count": stitches, "increase_count": increases, "decrease_count": decreases}
@@ -0,0 +1,317 @@
+from sqlalchemy import and_, bindparam, delete, event, exists, func, insert, inspect, or_, select, update
+from sqlalchemy.engine import CursorResult
+
+from table import AmigurumiSummary, FoundationList, Image, MaterialList, StitchBook, StitchBookSequence
+
+
+#tabelas cujas escritas alteram o resumo do amigurumi; todas possuem a coluna amigurumi_id
+SUMMARY_SOURCES = {
+    model.__tablename__: model.__table__
+    for model in (FoundationList, StitchBookSequence, StitchBook, MaterialList, Image)
+}
+
+
+#---------------------------------------------------------------------------#
+# Recálculo do resumo apenas dos amigurumis informados (ou de todos, quando amigurumi_ids é None).
+# Cada total é uma subconsulta correlacionada sobre os índices de amigurumi_id, então o custo depende apenas das linhas
+# dos amigurumis alterados. Amigurumis que não existem mais simplesmente não voltam a ser inseridos
+def summary_select():
+    foundation = FoundationList.__table__
+    sequence = StitchBookSequence.__table__
+    stitchbook = StitchBook.__table__
+    material = MaterialList.__table__
+    image = Image.__table__
+    amigurumi_id = foundation.c.amigurumi_id
+
+    def count(table):
+        return select(func.count()).select_from(table).where(table.c.amigurumi_id == amigurumi_id).scalar_subquery()
+
+    main_image = and_(image.c.amigurumi_id == amigurumi_id, image.c.main_image.is_(True))
+
+    total_stitch_count = select(func.coalesce(func.sum(stitchbook.c.stitch_count * sequence.c.repetition), 0)).select_from(
+        stitchbook.join(sequence, stitchbook.c.element_id == sequence.c.element_id)
+    ).where(stitchbook.c.amigurumi_id == amigurumi_id).scalar_subquery()
+
+    return select(
+        amigurumi_id,
+        count(sequence),
+        count(stitchbook),
+        count(material),
+        count(image),
+        exists().where(main_image),
+        select(func.min(image.c.image_id)).where(main_image).scalar_subquery(),
+        total_stitch_count,
+    )
+
+
+def refresh_amigurumi_summaries(connection, amigurumi_ids=None):
+    summary = AmigurumiSummary.__table__
+    selection = summary_select()
+    removal = delete(summary)
+
+    if amigurumi_ids is not None:
+        amigurumi_ids = sorted({amigurumi_id for amigurumi_id in amigurumi_ids if amigurumi_id is not None})
+        if not amigurumi_ids:
+            return
+
+        selection = selection.where(FoundationList.__table__.c.amigurumi_id.in_(amigurumi_ids))
+        removal = removal.where(summary.c.amigurumi_id.in_(amigurumi_ids))
+
+    columns = [
+        "amigurumi_id", "element_count", "row_count", "material_count", "image_count",
+        "has_main_image", "main_image_id", "total_stitch_count",
+    ]
+
+    connection.execute(removal)
+    connection.execute(insert(summary).from_select(columns, selection))
+
+
+#---------------------------------------------------------------------------#
+# Atualização incremental: cada escrita soma ao resumo a diferença entre a contribuição das linhas afetadas depois e antes
+# do comando (contagens e pontos agrupados por amigurumi), em um UPDATE col = col + delta. As consultas filtram apenas
+# as chaves das linhas afetadas (e as carreiras das partes afetadas, que mudam de total com a repetição ou são excluídas
+# em cascata com a parte), então o custo depende do tamanho da escrita e não do tamanho da receita.
+# O recálculo completo (refresh_amigurumi_summaries) fica para os amigurumis novos e para os resumos ausentes
+SUMMARY_COUNTS = ("element_count", "row_count", "material_count", "image_count", "total_stitch_count")
+
+COUNTED_TABLES = {
+    "stitchbook_sequence": "element_count",
+    "material_list": "material_count",
+    "image": "image_count",
+}
+
+
+def primary_key_of(table):
+    return table.primary_key.columns.values()[0]
+
+
+#contribuição das linhas informadas (chaves por tabela) para o resumo de cada amigurumi, e os amigurumis das imagens
+def contributions(connection, affected):
+    totals = {}
+    image_amigurumis = set()
+
+    def add(amigurumi_id, column, value):
+        counts = totals.setdefault(amigurumi_id, dict.fromkeys(SUMMARY_COUNTS, 0))
+        counts[column] += value or 0
+
+    stitchbook = StitchBook.__table__
+    sequence = StitchBookSequence.__table__
+    line_ids = affected.get("stitchbook")
+    element_ids = affected.get("stitchbook_sequence")
+
+    if line_ids or element_ids:
+        conditions = []
+        if line_ids:
+            conditions.append(stitchbook.c.line_id.in_(line_ids))
+        if element_ids:
+            conditions.append(stitchbook.c.element_id.in_(element_ids))
+
+        rows = connection.execute(
+            select(
+                stitchbook.c.amigurumi_id,
+                func.count(stitchbook.c.line_id),
+                func.sum(stitchbook.c.stitch_count * sequence.c.repetition),
+            )
+            .select_from(stitchbook.outerjoin(sequence, stitchbook.c.element_id == sequence.c.element_id))
+            .where(or_(*conditions))
+            .group_by(stitchbook.c.amigurumi_id)
+        )
+
+        for amigurumi_id, row_count, total_stitch_count in rows:
+            add(amigurumi_id, "row_count", row_count)
+            add(amigurumi_id, "total_stitch_count", total_stitch_count)
+
+    for table_name, column in COUNTED_TABLES.items():
+        row_ids = affected.get(table_name)
+        if not row_ids:
+            continue
+
+        table = SUMMARY_SOURCES[table_name]
+        rows = connection.execute(
+            select(table.c.amigurumi_id, func.count())
+            .where(primary_key_of(table).in_(row_ids))
+            .group_by(table.c.amigurumi_id)
+        )
+
+        for amigurumi_id, count in rows:
+            add(amigurumi_id, column, count)
+            if table_name == "image":
+                image_amigurumis.add(amigurumi_id)
+
+    return totals, image_amigurumis
+
+
+#imagem principal recalculada pelos índices de image, apenas nos amigurumis com imagens alteradas
+def refresh_main_images(connection, amigurumi_ids):
+    summary = AmigurumiSummary.__table__
+    image = Image.__table__
+    main_image = and_(image.c.amigurumi_id == summary.c.amigurumi_id, image.c.main_image.is_(True))
+
+    connection.execute(
+        update(summary)
+        .where(summary.c.amigurumi_id.in_(sorted(amigurumi_ids)))
+        .values(
+            has_main_image=exists().where(main_image),
+            main_image_id=select(func.min(image.c.image_id)).where(main_image).scalar_subquery(),
+        )
+    )
+
+
+def apply_contributions(connection, before, after):
+    (before_totals, before_images), (after_totals, after_images) = before, after
+
+    deltas = {}
+    for amigurumi_id in before_totals.keys() | after_totals.keys():
+        old = before_totals.get(amigurumi_id, {})
+        new = after_totals.get(amigurumi_id, {})
+        delta = {column: new.get(column, 0) - old.get(column, 0) for column in SUMMARY_COUNTS}
+
+        if any(delta.values()):
+            deltas[amigurumi_id] = delta
+
+    touched = set(deltas) | before_images | after_images
+    if not touched:
+        return
+
+    summary = AmigurumiSummary.__table__
+    existing = set(connection.scalars(
+        select(summary.c.amigurumi_id).where(summary.c.amigurumi_id.in_(sorted(touched)))
+    ))
+
+    updates = [
+        {"summary_id": amigurumi_id, **{f"delta_{column}": delta[column] for column in SUMMARY_COUNTS}}
+        for amigurumi_id, delta in sorted(deltas.items()) if amigurumi_id in existing
+    ]
+
+    if updates:
+        connection.execute(
+            update(summary)
+            .where(summary.c.amigurumi_id == bindparam("summary_id"))
+            .values({column: summary.c[column] + bindparam(f"delta_{column}") for column in SUMMARY_COUNTS}),
+            updates,
+        )
+
+    main_images = (before_images | after_images) & existing
+    if main_images:
+        refresh_main_images(connection, main_images)
+
+    #resumos ausentes (amigurumis anteriores à tabela de resumos, por exemplo) são recalculados por inteiro
+    missing = touched - existing
+    if missing:
+        refresh_amigurumi_summaries(connection, missing)
+
+
+#---------------------------------------------------------------------------#
+# Linhas afetadas em cada escrita, tanto pelo flush do ORM (add/setattr/delete) quanto pelos INSERT/UPDATE/DELETE
+# em lote executados pela sessão. Amigurumis novos recebem o resumo zerado pelo recálculo (ainda não têm linhas);
+# a exclusão de um amigurumi remove o resumo em cascata
+def flushed_rows(objects):
+    affected = {}
+
+    for obj in objects:
+        table_name = getattr(obj, "__tablename__", None)
+        if table_name not in SUMMARY_SOURCES:
+            continue
+
+        state = inspect(obj)
+        row_id = state.dict.get(state.mapper.primary_key[0].key)
+        if row_id is not None:
+            affected.setdefault(table_name, set()).add(row_id)
+
+    return affected
+
+
+def statement_rows(connection, table, statement, parameters):
+    rows = parameters if isinstance(parameters, list) else [parameters] if parameters else []
+    primary_key = primary_key_of(table)
+
+    row_ids = {row[primary_key.key] for row in rows if row.get(primary_key.key) is not None}
+
+    whereclause = getattr(statement, "whereclause", None)
+    if whereclause is not None:
+        row_ids.update(connection.scalars(select(primary_key).where(whereclause)))
+
+    return row_ids
+
+
+def track_amigurumi_summaries(session):
+    #contribuição das linhas alteradas e excluídas, lida antes do flush
+    @event.listens_for(session, "before_flush")
+    def read_before_flush(flush_session, flush_context, instances):
+        changed = [obj for obj in flush_session.dirty if flush_session.is_modified(obj, include_collections=False)]
+        affected = flushed_rows(changed + list(flush_session.deleted))
+        affected.pop("foundation_list", None)
+
+        if affected:
+            flush_session.info["summary_before"] = (affected, contributions(flush_session.connection(), affected))
+
+    @event.listens_for(session, "after_flush")
+    def apply_after_flush(flush_session, flush_context):
+        affected, before = flush_session.info.pop("summary_before", ({}, ({}, set())))
+        connection = flush_session.connection()
+
+        for table_name, row_ids in flushed_rows(flush_session.new).items():
+            affected.setdefault(table_name, set()).update(row_ids)
+
+        new_amigurumis = affected.pop("foundation_list", None)
+        if new_amigurumis:
+            refresh_amigurumi_summaries(connection, new_amigurumis)
+
+        if affected:
+            apply_contributions(connection, before, contributions(connection, affected))
+
+    @event.listens_for(session, "after_rollback")
+    def discard_before(rollback_session):
+        rollback_session.info.pop("summary_before", None)
+
+    #o comando em lote é executado aqui mesmo (invoke_statement), entre a leitura das contribuições antes e depois;
+    #por isso este evento deve ser registrado depois dos demais do_orm_execute da sessão
+    @event.listens_for(session, "do_orm_execute")
+    def apply_on_bulk_statement(orm_execute_state):
+        if not (orm_execute_state.is_insert or orm_execute_state.is_update or orm_execute_state.is_delete):
+            return None
+
+        table = getattr(orm_execute_state.statement, "table", None)
+        if table is None or table.name not in SUMMARY_SOURCES:
+            return None
+
+        #alterações e exclusões de amigurumis não mudam os totais (os resumos são removidos em cascata)
+        foundation = table.name == "foundation_list"
+        if foundation and not orm_execute_state.is_insert:
+            return None
+
+        connection = orm_execute_state.session.connection()
+        parameters = orm_execute_state.parameters
+        row_ids = set() if orm_execute_state.is_insert else statement_rows(
+            connection, table, orm_execute_state.statement, parameters
+        )
+        before = contributions(connection, {table.name: row_ids}) if row_ids and not foundation else ({}, set())
+
+        #linhas do RETURNING lidas antes dos comandos do resumo, na mesma conexão
+        result = orm_execute_state.invoke_statement()
+        returned = []
+        if not isinstance(result, CursorResult) or result.returns_rows:
+            frozen = result.freeze()
+            returned = [row._asdict() for row in frozen()]
+            result = frozen()
+
+        if orm_execute_state.is_insert:
+            primary_key = primary_key_of(table)
+            row_ids = {row[primary_key.key] for row in returned if row.get(primary_key.key) is not None}
+
+            #sem RETURNING as chaves não são conhecidas: recálculo completo dos amigurumis informados
+            if not row_ids:
+                rows = parameters if isinstance(parameters, list) else [parameters] if parameters else []
+                amigurumi_ids = {row.get("amigurumi_id") for row in rows} - {None}
+                if amigurumi_ids:
+                    refresh_amigurumi_summaries(connection, amigurumi_ids)
+                return result
+
+            if foundation:
+                refresh_amigurumi_summaries(connection, row_ids)
+                return result
+
+        if row_ids:
+            apply_contributions(connection, before, contributions(connection, {table.name: row_ids}))
+
+        return result
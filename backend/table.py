@@ -7,6 +7,10 @@ class FoundationList(db.Model):
     Esses amigurumis podem ser os principais, ou podem ser também os relacionados com a receita principal
     """
     __tablename__ = 'foundation_list'
+    __table_args__ = (
+        db.Index('ix_foundation_list_relationship', 'relationship'),
+        db.Index('ix_foundation_list_autor', 'autor'),
+    )
 
     amigurumi_id = db.Column(db.Integer, primary_key=True, autoincrement=True, 
                     info={"description": "chave primária dos amigurumis"})
@@ -28,6 +32,9 @@ class FoundationList(db.Model):
     
     relationship = db.Column(db.Integer, db.ForeignKey('foundation_list.amigurumi_id', ondelete="SET NULL"), nullable=True, 
                     info={"description": "preencher com o id do amigurumi principal, no qual esta receita está relacionada"})
+
+    version = db.Column(db.Integer, nullable=False, default=1, server_default=db.text("1"),
+                    info={"description": "versão da linha, incrementada a cada alteração (ETag enviada no If-Match)", "computed": True})
     
 
     #declaração de relacionamento
@@ -51,6 +58,11 @@ class MaterialList(db.Model):
     Esta lista pode ter mais de 1 conjunto de materiais, pois há diversas formas de construir um amigurumi com a mesma receita
     """
     __tablename__ = 'material_list'
+    __table_args__ = (
+        db.Index('ix_material_list_amigurumi_list', 'amigurumi_id', 'list_id', 'material_id'),
+        db.Index('ix_material_list_list_id', 'list_id'),
+        db.Index('ix_material_list_colour_id', 'colour_id'),
+    )
 
     material_id = db.Column(db.Integer, primary_key=True, autoincrement=True, 
                     info={"description": "chave primária dos materiais"})
@@ -67,9 +79,13 @@ class MaterialList(db.Model):
     list_id = db.Column(db.Integer, nullable=False, 
                     info={"description": "id do conjunto de materiais utilizados por receita"})
 
-    colour_id = db.Column(db.Integer, db.ForeignKey('stitchbook.colour_id'), nullable=True, 
+    #colour_id não é único na tabela stitchbook, por isso a referência não é declarada como chave estrangeira no banco
+    colour_id = db.Column(db.Integer, nullable=True, 
                     info={"description": "chave estrangeira, exclusiva para as linhas de amigurumi, para identificação das cores"})
 
+    version = db.Column(db.Integer, nullable=False, default=1, server_default=db.text("1"),
+                    info={"description": "versão da linha, incrementada a cada alteração (ETag enviada no If-Match)", "computed": True})
+
     def __init__(self, **kwargs):
         for key, value in kwargs.items():
             if hasattr(self, key):
@@ -82,6 +98,14 @@ class Image(db.Model):
     A tabela Image é destinada para armazenamento das imagens relacionadas aos amigurumis
     """
     __tablename__ = 'image'
+    __table_args__ = (
+        db.Index('ix_image_amigurumi_id', 'amigurumi_id'),
+        db.Index('ix_image_list_id', 'list_id'),
+        #no máximo uma imagem principal por amigurumi; o índice parcial também atende a busca da imagem principal
+        db.Index('ux_image_main_image', 'amigurumi_id', unique=True,
+                 sqlite_where=db.text('main_image = 1'), postgresql_where=db.text('main_image')),
+        db.Index('ix_image_content_hash', 'content_hash'),
+    )
 
     image_id = db.Column(db.Integer, primary_key=True, autoincrement=True, 
                     info={"description": "chave primária das imagens"})
@@ -92,11 +116,30 @@ class Image(db.Model):
     main_image = db.Column(db.Boolean, default = False, 
                     info={"description": "declaração da imagem principal, sendo True, como a principal"})
 
-    list_id = db.Column(db.Integer, db.ForeignKey('material_list.list_id'), nullable=False, 
+    #list_id não é único na tabela material_list, por isso a referência não é declarada como chave estrangeira no banco
+    list_id = db.Column(db.Integer, nullable=False, 
                     info={"description": "chave estrangeira, para identificação da lista de materiais"})
     
-    image_base64 = db.Column(db.String, nullable=False, 
-                    info={"description": "imagem criptografada em base64"})
+    image_base64 = db.Column(db.String, nullable=True, 
+                    info={"description": "imagem criptografada em base64, recebida no cadastro e gravada no armazenamento de imagens"})
+
+    content_hash = db.Column(db.String(64), nullable=True, 
+                    info={"description": "SHA-256 do conteúdo da imagem no armazenamento de imagens", "computed": True})
+
+    content_type = db.Column(db.String(100), nullable=True, 
+                    info={"description": "formato da imagem (Content-Type)", "computed": True})
+
+    content_size = db.Column(db.Integer, nullable=True, 
+                    info={"description": "tamanho da imagem em bytes", "computed": True})
+
+    width = db.Column(db.Integer, nullable=True, 
+                    info={"description": "largura da imagem em pixels", "computed": True})
+
+    height = db.Column(db.Integer, nullable=True, 
+                    info={"description": "altura da imagem em pixels", "computed": True})
+
+    version = db.Column(db.Integer, nullable=False, default=1, server_default=db.text("1"),
+                    info={"description": "versão da linha, incrementada a cada alteração (ETag enviada no If-Match)", "computed": True})
 
     def __init__(self, **kwargs):
         for key, value in kwargs.items():
@@ -110,6 +153,11 @@ class StitchBook(db.Model):
     A tabela Stitchbook é destinada para armazenar todas as receitas dos amigurumis
     """
     __tablename__ = 'stitchbook'
+    __table_args__ = (
+        db.Index('ix_stitchbook_amigurumi_element_row', 'amigurumi_id', 'element_id', 'number_row', 'line_id'),
+        db.Index('ix_stitchbook_element_row', 'element_id', 'number_row'),
+        db.Index('ix_stitchbook_colour_id', 'colour_id'),
+    )
 
     line_id = db.Column(db.Integer, primary_key=True, autoincrement=True, 
                     info={"description": "chave primária das carreiras"})
@@ -120,7 +168,7 @@ class StitchBook(db.Model):
     observation = db.Column(db.String, nullable=False, 
                     info={"description": "comentário sobre a carreira"})
     
-    element_id = db.Column(db.Integer, db.ForeignKey('stitchbook_sequence.element_id'), nullable=False, 
+    element_id = db.Column(db.Integer, db.ForeignKey('stitchbook_sequence.element_id', ondelete='CASCADE'), nullable=False, 
                     info={"description": "chave estrangeira, para identificação das partes do amigurumi"})
     
     number_row = db.Column(db.Integer, nullable=False, 
@@ -132,6 +180,18 @@ class StitchBook(db.Model):
     stich_sequence = db.Column(db.String, nullable=False, 
                     info={"description": "pontos utilizados na carreira"})
 
+    stitch_count = db.Column(db.Integer, nullable=True, 
+                    info={"description": "quantidade de pontos da carreira, calculada a partir de stich_sequence (nula se a notação não for reconhecida)", "computed": True})
+
+    increase_count = db.Column(db.Integer, nullable=True, 
+                    info={"description": "quantidade de aumentos da carreira, calculada a partir de stich_sequence", "computed": True})
+
+    decrease_count = db.Column(db.Integer, nullable=True, 
+                    info={"description": "quantidade de diminuições da carreira, calculada a partir de stich_sequence", "computed": True})
+
+    version = db.Column(db.Integer, nullable=False, default=1, server_default=db.text("1"),
+                    info={"description": "versão da linha, incrementada a cada alteração (ETag enviada no If-Match)", "computed": True})
+
     def __init__(self, **kwargs):
         for key, value in kwargs.items():
             if hasattr(self, key):
@@ -144,6 +204,9 @@ class StitchBookSequence(db.Model):
     A tabela Stitchbook Sequence, é uma tabela que organiza os dados da tabelas Stichbook e consolida as partes dos amigurumis
     """
     __tablename__ = 'stitchbook_sequence'
+    __table_args__ = (
+        db.Index('ix_stitchbook_sequence_amigurumi_order', 'amigurumi_id', 'element_order', 'element_id'),
+    )
 
     element_id = db.Column(db.Integer, primary_key=True, autoincrement=True, 
                     info={"description": "chave primária, das partes dos amigurumis"})
@@ -160,7 +223,148 @@ class StitchBookSequence(db.Model):
     repetition = db.Column(db.Integer, nullable=False, 
                     info={"description": "quantidade de cada parte"})
 
+    version = db.Column(db.Integer, nullable=False, default=1, server_default=db.text("1"),
+                    info={"description": "versão da linha, incrementada a cada alteração (ETag enviada no If-Match)", "computed": True})
+
+
+    #declaração de relacionamento
+    stitchBook = db.relationship("StitchBook", backref="element", cascade="all, delete-orphan", lazy=True)
+
+    def __init__(self, **kwargs):
+        for key, value in kwargs.items():
+            if hasattr(self, key):
+                setattr(self, key, value)
+
+
+
+class TableVersion(db.Model):
+    """
+    A tabela Table Version guarda um contador de alterações por tabela, incrementado na mesma transação de cada escrita,
+    e é utilizada para validar o cache das respostas das listagens
+    """
+    __tablename__ = 'table_version'
+
+    table_name = db.Column(db.String(100), primary_key=True, 
+                    info={"description": "nome da tabela monitorada"})
+    
+    version = db.Column(db.Integer, nullable=False, default=0, 
+                    info={"description": "quantidade de escritas realizadas na tabela"})
+    
+    updated_at = db.Column(db.DateTime, nullable=True, 
+                    info={"description": "data e hora (UTC) da última escrita na tabela"})
+
+    def __init__(self, **kwargs):
+        for key, value in kwargs.items():
+            if hasattr(self, key):
+                setattr(self, key, value)
+
+
+
+class AmigurumiSummary(db.Model):
+    """
+    A tabela Amigurumi Summary guarda os totais de cada amigurumi (partes, carreiras, materiais e imagens),
+    recalculados na mesma transação das escritas nas tabelas de origem, para a listagem do catálogo
+    """
+    __tablename__ = 'amigurumi_summary'
+
+    amigurumi_id = db.Column(db.Integer, db.ForeignKey('foundation_list.amigurumi_id', ondelete='CASCADE'), primary_key=True, 
+                    info={"description": "chave primária e estrangeira, para indicação do amigurumi"})
+
+    element_count = db.Column(db.Integer, nullable=False, default=0, 
+                    info={"description": "quantidade de partes cadastradas"})
+
+    row_count = db.Column(db.Integer, nullable=False, default=0, 
+                    info={"description": "quantidade de carreiras cadastradas"})
+
+    material_count = db.Column(db.Integer, nullable=False, default=0, 
+                    info={"description": "quantidade de materiais cadastrados"})
+
+    image_count = db.Column(db.Integer, nullable=False, default=0, 
+                    info={"description": "quantidade de imagens cadastradas"})
+
+    has_main_image = db.Column(db.Boolean, nullable=False, default=False, 
+                    info={"description": "indica se o amigurumi possui uma imagem principal"})
+
+    main_image_id = db.Column(db.Integer, nullable=True, 
+                    info={"description": "id da imagem principal, quando houver"})
+
+    total_stitch_count = db.Column(db.Integer, nullable=False, default=0, 
+                    info={"description": "total de pontos das carreiras, multiplicado pela quantidade de cada parte"})
+
+    def __init__(self, **kwargs):
+        for key, value in kwargs.items():
+            if hasattr(self, key):
+                setattr(self, key, value)
+
+
+
+class ChangeLog(db.Model):
+    """
+    A tabela Change Log registra, na mesma transação de cada escrita, as linhas incluídas, alteradas e excluídas
+    nas tabelas das receitas, para a sincronização incremental em /changes. O change_id é o cursor dos clientes
+    """
+    __tablename__ = 'change_log'
+
+    change_id = db.Column(db.Integer, primary_key=True, autoincrement=True, 
+                    info={"description": "chave primária, sequencial na ordem das escritas"})
+
+    table_name = db.Column(db.String(100), nullable=False, 
+                    info={"description": "nome da tabela alterada"})
+
+    row_id = db.Column(db.Integer, nullable=False, 
+                    info={"description": "chave primária da linha alterada"})
+
+    operation = db.Column(db.String(10), nullable=False, 
+                    info={"description": "tipo da escrita: insert, update ou delete"})
+
+    amigurumi_id = db.Column(db.Integer, nullable=True, 
+                    info={"description": "amigurumi da linha alterada, para a sincronização de um único amigurumi"})
+
+    changed_at = db.Column(db.DateTime, nullable=False, 
+                    info={"description": "data e hora (UTC) da escrita"})
+
     def __init__(self, **kwargs):
         for key, value in kwargs.items():
             if hasattr(self, key):
-                setattr(self, key, value)
\ No newline at end of file
+                setattr(self, key, value)
+
+
+
+class ImageUpload(db.Model):
+    """
+    A tabela Image Upload acompanha os envios de imagem processados em segundo plano (validação, hash e cadastro),
+    consultados pelo id do envio retornado no upload
+    """
+    __tablename__ = 'image_upload'
+
+    job_id = db.Column(db.String(32), primary_key=True, 
+                    info={"description": "id do envio, retornado no upload"})
+
+    amigurumi_id = db.Column(db.Integer, nullable=False, 
+                    info={"description": "amigurumi da imagem enviada"})
+
+    list_id = db.Column(db.Integer, nullable=False, 
+                    info={"description": "lista de materiais da imagem enviada"})
+
+    main_image = db.Column(db.Boolean, nullable=False, default=False, 
+                    info={"description": "declaração da imagem principal, sendo True, como a principal"})
+
+    status = db.Column(db.String(20), nullable=False, default="pending", 
+                    info={"description": "situação do envio: pending, processing, done ou failed"})
+
+    image_id = db.Column(db.Integer, nullable=True, 
+                    info={"description": "imagem cadastrada, quando o envio é concluído"})
+
+    error = db.Column(db.String(500), nullable=True, 
+                    info={"description": "motivo da falha, quando o envio não é concluído"})
+
+    created_at = db.Column(db.DateTime, nullable=False, 
+                    info={"description": "data e hora (UTC) do recebimento do envio"})
+
+    finished_at = db.Column(db.DateTime, nullable=True, 
+                    info={"description": "data e hora (UTC) da conclusão ou falha do processamento"})
+
+    def __init__(self, **kwargs):
+        for key, value in kwargs.items():
+            if hasattr(self, key):
+                setattr(self, key, value)
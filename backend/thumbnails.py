@@ -0,0 +1,159 @@
+import io
+import os
+import shutil
+import tempfile
+import threading
+
+try:
+    from PIL import Image as PILImage, ImageOps
+except ImportError:
+    PILImage = None
+
+
+THUMBNAIL_FORMATS = {
+    "webp": ("WEBP", "image/webp"),
+    "jpeg": ("JPEG", "image/jpeg"),
+    "png": ("PNG", "image/png"),
+}
+
+
+#---------------------------------------------------------------------------#
+# Geração da miniatura: decodificação reduzida (draft, para JPEG), redimensionamento pela largura e nova codificação
+def render_thumbnail(content, width, fmt):
+    if PILImage is None:
+        raise RuntimeError("Geração de miniaturas indisponível: instale o pacote Pillow")
+
+    pil_format, _ = THUMBNAIL_FORMATS[fmt]
+
+    with PILImage.open(io.BytesIO(content)) as picture:
+        picture.draft("RGB", (width, width))
+        picture = ImageOps.exif_transpose(picture)
+
+        if picture.width > width:
+            height = max(1, round(picture.height * width / picture.width))
+            picture = picture.resize((width, height), PILImage.LANCZOS)
+
+        if pil_format == "JPEG" and picture.mode != "RGB":
+            picture = picture.convert("RGB")
+        elif picture.mode not in ("RGB", "RGBA", "L", "LA"):
+            picture = picture.convert("RGBA")
+
+        output = io.BytesIO()
+        picture.save(output, pil_format, quality=80)
+
+    return output.getvalue()
+
+
+#---------------------------------------------------------------------------#
+# Cache em disco das miniaturas, organizado por hash do conteúdo original (root/<hash>/<largura>.<formato>).
+# O total em bytes é limitado por max_bytes e, ao estourar o limite, os arquivos acessados há mais tempo são removidos.
+# A pasta é compartilhada pelos workers do gunicorn, e cada processo só conhece as próprias gravações: o uso do disco é
+# medido novamente a cada RESCAN_FRACTION do limite gravado pelo processo, de modo que o limite vale para a pasta inteira
+# e é ultrapassado no máximo em RESCAN_FRACTION por worker
+RESCAN_FRACTION = 0.05
+
+class ThumbnailCache:
+    def __init__(self, root=None, max_bytes=0):
+        self.root = root
+        self.max_bytes = max_bytes
+        self.lock = threading.Lock()
+        self.total_bytes = None
+        self.unscanned_bytes = 0
+
+    #caminho definido por THUMBNAIL_CACHE_PATH, relativo à pasta instance da aplicação
+    def init_app(self, app):
+        self.root = os.path.join(app.instance_path, app.config["THUMBNAIL_CACHE_PATH"])
+        self.max_bytes = app.config["THUMBNAIL_CACHE_MAX_BYTES"]
+        self.total_bytes = None
+        self.unscanned_bytes = 0
+
+    def path(self, content_hash, width, fmt):
+        return os.path.join(self.root, content_hash, f"{width}.{fmt}")
+
+    def get(self, content_hash, width, fmt):
+        path = self.path(content_hash, width, fmt)
+
+        try:
+            os.utime(path)
+        except FileNotFoundError:
+            return None
+
+        return path
+
+    def put(self, content_hash, width, fmt, data):
+        path = self.path(content_hash, width, fmt)
+        directory = os.path.dirname(path)
+        os.makedirs(directory, exist_ok=True)
+
+        fd, temp_path = tempfile.mkstemp(dir=directory, prefix=".tmp-")
+        try:
+            with os.fdopen(fd, "wb") as temp_file:
+                temp_file.write(data)
+            os.replace(temp_path, path)
+        except BaseException:
+            if os.path.exists(temp_path):
+                os.remove(temp_path)
+            raise
+
+        with self.lock:
+            self.unscanned_bytes += len(data)
+
+            if self.total_bytes is None or self.unscanned_bytes >= self.max_bytes * RESCAN_FRACTION:
+                self.total_bytes = self.disk_usage()
+                self.unscanned_bytes = 0
+            else:
+                self.total_bytes += len(data)
+
+            if self.total_bytes > self.max_bytes:
+                self.evict()
+
+        return path
+
+    def invalidate(self, content_hash):
+        shutil.rmtree(os.path.join(self.root, content_hash), ignore_errors=True)
+
+        with self.lock:
+            self.total_bytes = None
+
+    def entries(self):
+        if not os.path.isdir(self.root):
+            return []
+
+        found = []
+        for directory in os.scandir(self.root):
+            if not directory.is_dir():
+                continue
+
+            for entry in os.scandir(directory.path):
+                if entry.is_file() and not entry.name.startswith(".tmp-"):
+                    stat = entry.stat()
+                    found.append((stat.st_mtime, stat.st_size, entry.path))
+
+        return found
+
+    def disk_usage(self):
+        return sum(size for _, size, _ in self.entries())
+
+    #remoção das miniaturas menos usadas até ficar abaixo de 90% do limite, evitando uma nova limpeza a cada gravação
+    def evict(self):
+        entries = sorted(self.entries())
+        total = sum(size for _, size, _ in entries)
+        target = self.max_bytes * 0.9
+
+        for _, size, path in entries:
+            if total <= target:
+                break
+
+            try:
+                os.remove(path)
+                total -= size
+            except FileNotFoundError:
+                continue
+
+            try:
+                os.rmdir(os.path.dirname(path))
+            except OSError:
+                pass
+
+        self.total_bytes = total
+        self.unscanned_bytes = 0
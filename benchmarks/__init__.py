@@ -0,0 +1,17 @@
+"""
+Benchmarks da API. Execute a partir da raiz do repositório:
+
+    python -m benchmarks --mode client                  # Flask test client, sem rede
+    python -m benchmarks --mode http --concurrency 8    # servidor HTTP em outro processo e requisições concorrentes
+    python -m benchmarks.startup --runs 20             # tempo de inicialização de processos novos
+    python benchmarks/sqlite_engine.py                  # PRAGMAs do SQLite com processos concorrentes
+
+Os resultados (vazão, latências p50/p95/p99 e pico de memória por endpoint) são gravados em JSON para comparação entre commits.
+"""
+import os
+import sys
+
+BACKEND_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "backend")
+
+if BACKEND_DIR not in sys.path:
+    sys.path.insert(0, BACKEND_DIR)
@@ -0,0 +1,167 @@
+import argparse
+import json
+import os
+import platform
+import re
+import socket
+import sqlite3
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime, timezone
+
+from benchmarks import BACKEND_DIR
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(prog="python -m benchmarks", description="Benchmark de todas as rotas da API")
+    parser.add_argument("--mode", choices=["client", "http", "both"], default="both")
+    parser.add_argument("--amigurumis", type=int, default=100)
+    parser.add_argument("--elements", type=int, default=8, help="partes por amigurumi")
+    parser.add_argument("--rows", type=int, default=30, help="carreiras por parte")
+    parser.add_argument("--materials", type=int, default=10, help="materiais por amigurumi")
+    parser.add_argument("--images", type=int, default=2, help="imagens por amigurumi")
+    parser.add_argument("--image-bytes", type=int, default=100_000, help="tamanho aproximado de cada imagem")
+    parser.add_argument("--iterations", type=int, default=50, help="requisições por cenário (reduzidas nas listagens completas)")
+    parser.add_argument("--concurrency", type=int, default=8, help="threads do gerador de carga no modo http")
+    parser.add_argument("--scenarios", default=None, help="expressão regular para filtrar os cenários pelo nome")
+    parser.add_argument("--with-cache", action="store_true", help="mantém o cache das respostas de leitura ativo")
+    parser.add_argument("--output", default=None, help="arquivo JSON dos resultados (padrão: saída padrão)")
+    parser.add_argument("--workdir", default=None, help="pasta do banco e das imagens (padrão: pasta temporária)")
+    return parser.parse_args()
+
+
+#configuração da aplicação pelas variáveis de ambiente, antes da importação de config.py
+def configure_environment(args, workdir):
+    os.environ.update({
+        "APP_ENV": "production",
+        "AUTO_UPGRADE_DATABASE": "false",
+        "DATABASE_URL": f"sqlite:///{os.path.join(workdir, 'benchmark.db')}",
+        "BLOB_STORE_PATH": os.path.join(workdir, "blob_store"),
+        "THUMBNAIL_CACHE_PATH": os.path.join(workdir, "thumbnail_cache"),
+        "CACHE_MAX_ENTRIES": "1024" if args.with_cache else "0",
+        "SLOW_REQUEST_MS": "0",
+        #/changes/stream envia as alterações pendentes e encerra a conexão, em vez de esperar por novas alterações
+        "CHANGES_STREAM_SECONDS": "0",
+        "PYTHONPATH": os.pathsep.join(filter(None, [os.path.dirname(BACKEND_DIR), BACKEND_DIR, os.environ.get("PYTHONPATH")])),
+    })
+
+
+def git_commit():
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], cwd=os.path.dirname(BACKEND_DIR), capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def report(result):
+    print(
+        f"{result['mode']:6} {result['scenario']:45} {result['throughput_rps'] or 0:9.1f} req/s  "
+        f"p50 {result['p50_ms'] or 0:8.2f}  p95 {result['p95_ms'] or 0:8.2f}  p99 {result['p99_ms'] or 0:8.2f} ms  "
+        f"rss {result['peak_rss_mb'] or 0:7.1f} MB  erros {result['errors']}",
+        file=sys.stderr,
+    )
+
+
+#---------------------------------------------------------------------------#
+# Modo http: servidor em outro processo (werkzeug com threads) e o gerador de carga neste processo
+def start_server():
+    port = free_port()
+    server = subprocess.Popen(
+        [sys.executable, "-m", "benchmarks.server", "--port", str(port)],
+        cwd=os.path.dirname(BACKEND_DIR), stdout=subprocess.PIPE, text=True,
+    )
+
+    if server.stdout.readline().strip() != "ready":
+        server.kill()
+        raise RuntimeError("O servidor do benchmark não iniciou")
+
+    return server, port
+
+
+def main():
+    args = parse_args()
+    workdir = args.workdir or tempfile.mkdtemp(prefix="amigurumi-benchmark-")
+    os.makedirs(workdir, exist_ok=True)
+    configure_environment(args, workdir)
+
+    from app import create_app
+    from database import db
+    from migrations import upgrade_database
+
+    from benchmarks.runner import ClientTransport, HttpTransport, PeakRss, run_scenarios
+    from benchmarks.scenarios import BenchmarkState, all_scenarios
+    from benchmarks.seed import blob_store_bytes, catalog_sizes, seed_catalog
+
+    app = create_app()
+    with app.app_context():
+        upgrade_database()
+        db.engine.dispose()
+
+    started = time.perf_counter()
+    catalog = seed_catalog(
+        app, amigurumis=args.amigurumis, elements=args.elements, rows=args.rows,
+        materials=args.materials, images=args.images, image_bytes=args.image_bytes,
+    )
+    seed_seconds = time.perf_counter() - started
+    print(f"catálogo semeado em {seed_seconds:.1f} s: {catalog_sizes(catalog)}", file=sys.stderr)
+
+    scenarios = all_scenarios()
+    if args.scenarios:
+        scenarios = [scenario for scenario in scenarios if re.search(args.scenarios, scenario.name)]
+
+    results = []
+
+    if args.mode in ("client", "both"):
+        state = BenchmarkState(catalog, args.image_bytes)
+        results += run_scenarios(
+            ClientTransport(app), scenarios, state, args.iterations, 1, PeakRss(os.getpid()), "client", report
+        )
+
+    if args.mode in ("http", "both"):
+        server, port = start_server()
+        try:
+            state = BenchmarkState(catalog, args.image_bytes)
+            results += run_scenarios(
+                HttpTransport("127.0.0.1", port), scenarios, state, args.iterations, args.concurrency,
+                PeakRss(server.pid), "http", report
+            )
+        finally:
+            server.terminate()
+            server.wait()
+
+    output = {
+        "meta": {
+            "timestamp": datetime.now(timezone.utc).isoformat(),
+            "commit": git_commit(),
+            "python": platform.python_version(),
+            "sqlite": sqlite3.sqlite_version,
+            "platform": platform.platform(),
+            "cpu_count": os.cpu_count(),
+            "args": vars(args),
+            "catalog": catalog_sizes(catalog),
+            "blob_store_bytes": blob_store_bytes(os.environ["BLOB_STORE_PATH"]),
+            "seed_seconds": round(seed_seconds, 2),
+        },
+        "results": results,
+    }
+
+    text = json.dumps(output, indent=2, ensure_ascii=False)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as output_file:
+            output_file.write(text + "\n")
+    else:
+        print(text)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,165 @@
+import http.client
+import itertools
+import json
+import math
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+
+#---------------------------------------------------------------------------#
+# Pico de memória (VmHWM) de um processo no Linux. O pico é zerado antes de cada cenário escrevendo 5 em clear_refs;
+# sem permissão para isso o valor passa a ser o pico desde o início do processo
+class PeakRss:
+    def __init__(self, pid):
+        self.pid = pid
+
+    def reset(self):
+        try:
+            with open(f"/proc/{self.pid}/clear_refs", "w") as clear_refs:
+                clear_refs.write("5")
+        except OSError:
+            pass
+
+    def peak_mb(self):
+        try:
+            with open(f"/proc/{self.pid}/status") as status:
+                for line in status:
+                    if line.startswith("VmHWM:"):
+                        return round(int(line.split()[1]) / 1024, 1)
+        except OSError:
+            pass
+        return None
+
+
+#---------------------------------------------------------------------------#
+# Formas de envio das requisições: Flask test client no mesmo processo, ou HTTP com uma conexão keep-alive por thread
+class ClientTransport:
+    def __init__(self, app):
+        self.client = app.test_client()
+
+    def request(self, method, path, body, headers):
+        if isinstance(body, bytes):
+            response = self.client.open(path, method=method, data=body, headers=headers)
+        else:
+            response = self.client.open(path, method=method, json=body, headers=headers)
+        return response.status_code, response.get_data()
+
+
+class HttpTransport:
+    def __init__(self, host, port):
+        self.host = host
+        self.port = port
+        self.local = threading.local()
+
+    def connection(self):
+        if getattr(self.local, "connection", None) is None:
+            self.local.connection = http.client.HTTPConnection(self.host, self.port, timeout=120)
+        return self.local.connection
+
+    def request(self, method, path, body, headers):
+        headers = dict(headers)
+        payload = None
+
+        if isinstance(body, bytes):
+            payload = body
+        elif body is not None:
+            payload = json.dumps(body).encode("utf-8")
+            headers["Content-Type"] = "application/json"
+
+        connection = self.connection()
+        try:
+            connection.request(method, path, body=payload, headers=headers)
+            response = connection.getresponse()
+            return response.status, response.read()
+        except (http.client.HTTPException, OSError):
+            connection.close()
+            self.local.connection = None
+            raise
+
+
+#---------------------------------------------------------------------------#
+# Execução de um cenário: requests requisições distribuídas entre concurrency threads
+def percentile(values, fraction):
+    if not values:
+        return None
+    return values[max(0, math.ceil(fraction * len(values)) - 1)]
+
+
+def run_scenario(transport, scenario, state, requests, concurrency, peak_rss):
+    latencies = []
+    sizes = []
+    errors = []
+    counter = itertools.count()
+
+    def worker():
+        while True:
+            index = next(counter)
+            if index >= requests:
+                return
+
+            try:
+                path, body = scenario.build(state, index)
+            except LookupError as error:
+                errors.append(str(error))
+                continue
+
+            started = time.perf_counter()
+            try:
+                status, content = transport.request(scenario.method, path, body, scenario.headers)
+            except Exception as error:
+                errors.append(repr(error))
+                continue
+            latencies.append(time.perf_counter() - started)
+            sizes.append(len(content))
+
+            if not scenario.is_success(status):
+                errors.append(f"HTTP {status}: {content[:200]!r}")
+            elif scenario.on_response is not None:
+                scenario.on_response(state, content if scenario.raw_response else json.loads(content), body)
+
+    peak_rss.reset()
+    started = time.perf_counter()
+
+    if concurrency <= 1:
+        worker()
+    else:
+        with ThreadPoolExecutor(max_workers=concurrency) as executor:
+            for future in [executor.submit(worker) for _ in range(concurrency)]:
+                future.result()
+
+    wall = time.perf_counter() - started
+    latencies.sort()
+
+    def ms(value):
+        return None if value is None else round(value * 1000, 3)
+
+    return {
+        "scenario": scenario.name,
+        "method": scenario.method,
+        "requests": len(latencies),
+        "errors": len(errors),
+        "first_error": errors[0] if errors else None,
+        "concurrency": concurrency,
+        "wall_seconds": round(wall, 4),
+        "throughput_rps": round(len(latencies) / wall, 2) if wall > 0 else None,
+        "mean_ms": ms(sum(latencies) / len(latencies)) if latencies else None,
+        "p50_ms": ms(percentile(latencies, 0.50)),
+        "p95_ms": ms(percentile(latencies, 0.95)),
+        "p99_ms": ms(percentile(latencies, 0.99)),
+        "max_ms": ms(latencies[-1]) if latencies else None,
+        "mean_response_bytes": round(sum(sizes) / len(sizes)) if sizes else None,
+        "peak_rss_mb": peak_rss.peak_mb(),
+    }
+
+
+def run_scenarios(transport, scenarios, state, iterations, concurrency, peak_rss, mode, report):
+    results = []
+
+    for scenario in scenarios:
+        requests = max(1, int(iterations * scenario.weight))
+        result = {"mode": mode, **run_scenario(transport, scenario, state, requests, concurrency, peak_rss)}
+        results.append(result)
+        report(result)
+
+    return results
@@ -0,0 +1,277 @@
+import base64
+import random
+from urllib.parse import quote
+
+from benchmarks.seed import ROW_NOTATIONS, make_image
+
+
+#---------------------------------------------------------------------------#
+# Cenário: uma rota da API com a montagem de cada requisição (caminho e corpo) a partir do estado compartilhado.
+# O corpo é enviado em JSON, ou como está quando é bytes (arquivos de /import e /image/upload), com os headers do cenário.
+# weight reduz a quantidade de requisições das rotas pesadas (listagens completas) em relação às demais.
+# expected_status indica o status esperado dos cenários de entrada inválida; raw_response entrega o corpo da resposta
+# sem decodificar o JSON para on_response (arquivos de /export)
+class Scenario:
+    def __init__(self, name, method, build, on_response=None, weight=1.0, expected_status=None, headers=None, raw_response=False):
+        self.name = name
+        self.method = method
+        self.build = build
+        self.on_response = on_response
+        self.weight = weight
+        self.expected_status = expected_status
+        self.headers = headers or {}
+        self.raw_response = raw_response
+
+    def is_success(self, status):
+        if self.expected_status is not None:
+            return status == self.expected_status
+        return status < 400
+
+
+#---------------------------------------------------------------------------#
+# Estado compartilhado entre os cenários: ids do catálogo semeado e ids criados pelos cenários de escrita,
+# consumidos depois pelos cenários de alteração e exclusão (as listas são seguras entre threads no CPython)
+class BenchmarkState:
+    def __init__(self, catalog, image_bytes, seed=4321):
+        self.catalog = catalog
+        self.created = {}
+
+        self.image = make_image(random.Random(seed), image_bytes)
+        self.image_base64 = base64.b64encode(self.image).decode("ascii")
+
+    def pick(self, name, index):
+        ids = self.catalog[name]
+        return ids[(index * 7919) % len(ids)]
+
+    def add(self, name, value):
+        self.created.setdefault(name, []).append(value)
+
+    def nth(self, name, index):
+        values = self.created.get(name)
+        if not values:
+            raise LookupError(f"Nenhum registro criado em {name}")
+        return values[index % len(values)]
+
+    def take(self, name):
+        try:
+            return self.created.get(name, []).pop()
+        except IndexError:
+            raise LookupError(f"Nenhum registro criado em {name}")
+
+
+def amigurumi_body(index):
+    return {"name": f"Benchmark {index}", "size": 12.5, "autor": "benchmark", "link": "https://example.com", "relationship": None}
+
+
+def element_body(amigurumi_id, index):
+    return {"amigurumi_id": amigurumi_id, "element_order": index + 1, "element_name": f"parte {index}", "repetition": 2}
+
+
+def row_body(amigurumi_id, element_id, index):
+    return {
+        "amigurumi_id": amigurumi_id, "element_id": element_id, "number_row": index + 1, "colour_id": 1,
+        "stich_sequence": ROW_NOTATIONS[index % len(ROW_NOTATIONS)], "observation": "carreira do benchmark",
+    }
+
+
+def material_body(amigurumi_id, index):
+    return {"amigurumi_id": amigurumi_id, "material_name": f"linha {index}", "quantity": "50g", "list_id": 1, "colour_id": 1}
+
+
+def image_body(state, amigurumi_id, main_image):
+    return {"amigurumi_id": amigurumi_id, "main_image": main_image, "list_id": 1, "image_base64": state.image_base64}
+
+
+def remember(name, key):
+    def on_response(state, payload, request_body):
+        state.add(name, {**request_body, key: payload[key]})
+    return on_response
+
+
+def remember_many(name, key, ids_key):
+    def on_response(state, payload, request_body):
+        state.add(name, [{**row, key: new_id} for row, new_id in zip(request_body, payload[ids_key])])
+    return on_response
+
+
+#guarda um valor da resposta (ou a resposta inteira, nos cenários com raw_response), sem o corpo da requisição
+def remember_value(name, key=None):
+    def on_response(state, payload, request_body):
+        state.add(name, payload if key is None else payload[key])
+    return on_response
+
+
+#ids novos de uma resposta no formato {id antigo: id novo}, como os amigurumis de POST /import
+def remember_new_ids(name, key):
+    def on_response(state, payload, request_body):
+        for new_id in payload[key].values():
+            state.add(name, new_id)
+    return on_response
+
+
+#---------------------------------------------------------------------------#
+# Cenários de leitura, sobre o catálogo semeado
+def read_scenarios():
+    return [
+        Scenario("GET /foundation_list", "GET", lambda s, i: ("/foundation_list", None)),
+        Scenario("GET /foundation_list?limit=50", "GET", lambda s, i: ("/foundation_list?limit=50", None)),
+        Scenario("GET /foundation_list/summary", "GET", lambda s, i: ("/foundation_list/summary", None)),
+        Scenario("GET /search", "GET", lambda s, i: (f"/search?q={quote(['urso cabeça', 'orelha', 'linha', 'bordar olhos'][i % 4])}", None)),
+        Scenario("GET /amigurumi/<id>/full", "GET", lambda s, i: (f"/amigurumi/{s.pick('amigurumi_ids', i)}/full", None)),
+        Scenario("GET /foundation_list/<id>/tree", "GET",
+                 lambda s, i: (f"/foundation_list/{s.pick('amigurumi_ids', i)}/tree?contents=true", None)),
+        Scenario("GET /amigurumi/<id>/stitch_count", "GET", lambda s, i: (f"/amigurumi/{s.pick('amigurumi_ids', i)}/stitch_count", None)),
+        Scenario("GET /stitchbook?amigurumi_id", "GET", lambda s, i: (f"/stitchbook?amigurumi_id={s.pick('amigurumi_ids', i)}", None)),
+        Scenario("GET /stitchbook?limit=500", "GET", lambda s, i: ("/stitchbook?limit=500", None)),
+        Scenario("GET /stitchbook", "GET", lambda s, i: ("/stitchbook", None), weight=0.1),
+        Scenario("GET /stitchbook?stream=true", "GET", lambda s, i: ("/stitchbook?stream=true", None), weight=0.1),
+        Scenario("GET /stitchbook_sequence?amigurumi_id", "GET", lambda s, i: (f"/stitchbook_sequence?amigurumi_id={s.pick('amigurumi_ids', i)}", None)),
+        Scenario("GET /stitchbook_sequence/stitch_count", "GET", lambda s, i: (f"/stitchbook_sequence/stitch_count?amigurumi_id={s.pick('amigurumi_ids', i)}", None)),
+        Scenario("GET /material_list?amigurumi_id", "GET", lambda s, i: (f"/material_list?amigurumi_id={s.pick('amigurumi_ids', i)}", None)),
+        Scenario("GET /material_list", "GET", lambda s, i: ("/material_list", None), weight=0.2),
+        Scenario("GET /image?amigurumi_id", "GET", lambda s, i: (f"/image?amigurumi_id={s.pick('amigurumi_ids', i)}", None)),
+        Scenario("GET /image", "GET", lambda s, i: ("/image", None), weight=0.2),
+        Scenario("GET /amigurumi/<id>/main_image", "GET", lambda s, i: (f"/amigurumi/{s.pick('amigurumi_ids', i)}/main_image", None)),
+        Scenario("GET /image/<id>/content", "GET", lambda s, i: (f"/image/{s.pick('image_ids', i)}/content", None)),
+        Scenario("GET /image/<id>/thumb", "GET", lambda s, i: (f"/image/{s.pick('image_ids', i)}/thumb?w=256", None)),
+        Scenario("GET /changes?since", "GET", lambda s, i: ("/changes?since=0&limit=500", None)),
+        Scenario("GET /changes?since&amigurumi_id", "GET",
+                 lambda s, i: (f"/changes?since=0&amigurumi_id={s.pick('amigurumi_ids', i)}", None)),
+        Scenario("GET /changes/stream?since&amigurumi_id", "GET",
+                 lambda s, i: (f"/changes/stream?since=0&amigurumi_id={s.pick('amigurumi_ids', i)}", None)),
+        #os arquivos exportados são enviados depois pelo cenário POST /import
+        Scenario("GET /export?amigurumi_id", "GET", lambda s, i: (f"/export?amigurumi_id={s.pick('amigurumi_ids', i)}", None),
+                 on_response=remember_value("archives"), raw_response=True, weight=0.2),
+        Scenario("GET /metrics", "GET", lambda s, i: ("/metrics", None)),
+        Scenario("GET /openapi", "GET", lambda s, i: ("/openapi", None)),
+    ]
+
+
+#---------------------------------------------------------------------------#
+# Cenários de escrita, em ordem: criação, alteração e exclusão, sobre amigurumis criados pelo próprio benchmark.
+# Ao final os registros criados são removidos e o catálogo semeado fica como estava
+def write_scenarios():
+    def amigurumi_of(state, index):
+        return state.nth("amigurumis", index)["amigurumi_id"]
+
+    def element_of(state, index):
+        return state.nth("elements", index)
+
+    return [
+        Scenario("POST /foundation_list", "POST",
+                 lambda s, i: ("/foundation_list", amigurumi_body(i)), on_response=remember("amigurumis", "amigurumi_id")),
+        Scenario("PUT /foundation_list/amigurumi_id", "PUT",
+                 lambda s, i: ("/foundation_list/amigurumi_id", {**s.nth("amigurumis", i), "date": None, "name": f"Alterado {i}"})),
+
+        Scenario("POST /stitchbook_sequence", "POST",
+                 lambda s, i: ("/stitchbook_sequence", element_body(amigurumi_of(s, i), i)), on_response=remember("elements", "element_id")),
+        Scenario("PUT /stitchbook_sequence/element_id", "PUT",
+                 lambda s, i: ("/stitchbook_sequence/element_id", {**s.nth("elements", i), "repetition": 3})),
+        Scenario("POST /stitchbook_sequence/bulk", "POST",
+                 lambda s, i: ("/stitchbook_sequence/bulk", [element_body(amigurumi_of(s, i), n) for n in range(10)]),
+                 on_response=remember_many("element_batches", "element_id", "element_ids")),
+        Scenario("PUT /stitchbook_sequence/bulk", "PUT",
+                 lambda s, i: ("/stitchbook_sequence/bulk", [{**row, "repetition": 4} for row in s.nth("element_batches", i)])),
+        Scenario("POST /stitchbook_sequence/insert", "POST",
+                 lambda s, i: ("/stitchbook_sequence/insert", element_body(amigurumi_of(s, i), i % 10))),
+        Scenario("POST /stitchbook_sequence/<id>/move", "POST",
+                 lambda s, i: (f"/stitchbook_sequence/{element_of(s, i)['element_id']}/move", {"element_order": i % 10 + 1})),
+
+        Scenario("POST /stitchbook", "POST",
+                 lambda s, i: ("/stitchbook", row_body(element_of(s, i)["amigurumi_id"], element_of(s, i)["element_id"], i)),
+                 on_response=remember("rows", "line_id")),
+        Scenario("PUT /stitchbook/line_id", "PUT",
+                 lambda s, i: ("/stitchbook/line_id", {**s.nth("rows", i), "stich_sequence": "(sc, inc)*6"})),
+        Scenario("POST /stitchbook/bulk", "POST",
+                 lambda s, i: ("/stitchbook/bulk", [
+                     row_body(element_of(s, i)["amigurumi_id"], element_of(s, i)["element_id"], n) for n in range(50)
+                 ]), on_response=remember_many("row_batches", "line_id", "line_ids")),
+        Scenario("PUT /stitchbook/bulk", "PUT",
+                 lambda s, i: ("/stitchbook/bulk", [{**row, "colour_id": 2} for row in s.nth("row_batches", i)])),
+        Scenario("POST /stitchbook/insert", "POST",
+                 lambda s, i: ("/stitchbook/insert", row_body(element_of(s, i)["amigurumi_id"], element_of(s, i)["element_id"], i % 30))),
+        Scenario("POST /stitchbook/<id>/move", "POST",
+                 lambda s, i: (f"/stitchbook/{s.pick('line_ids', i)}/move", {"number_row": i % 30 + 1})),
+        Scenario("DELETE /stitchbook/bulk", "DELETE",
+                 lambda s, i: ("/stitchbook/bulk", [{"line_id": row["line_id"]} for row in s.take("row_batches")])),
+        Scenario("DELETE /stitchbook/line_id", "DELETE",
+                 lambda s, i: ("/stitchbook/line_id", {"line_id": s.take("rows")["line_id"]})),
+
+        Scenario("POST /material_list", "POST",
+                 lambda s, i: ("/material_list", material_body(amigurumi_of(s, i), i)), on_response=remember("materials", "material_id")),
+        Scenario("PUT /material_list/material_id", "PUT",
+                 lambda s, i: ("/material_list/material_id", {**s.nth("materials", i), "quantity": "80g"})),
+        Scenario("POST /material_list/bulk", "POST",
+                 lambda s, i: ("/material_list/bulk", [material_body(amigurumi_of(s, i), n) for n in range(20)]),
+                 on_response=remember_many("material_batches", "material_id", "material_ids")),
+        Scenario("PUT /material_list/bulk", "PUT",
+                 lambda s, i: ("/material_list/bulk", [{**row, "quantity": "10g"} for row in s.nth("material_batches", i)])),
+        Scenario("DELETE /material_list/bulk", "DELETE",
+                 lambda s, i: ("/material_list/bulk", [{"material_id": row["material_id"]} for row in s.take("material_batches")])),
+        Scenario("DELETE /material_list/material_id", "DELETE",
+                 lambda s, i: ("/material_list/material_id", {"material_id": s.take("materials")["material_id"]})),
+
+        Scenario("POST /image", "POST",
+                 lambda s, i: ("/image", image_body(s, amigurumi_of(s, i), i % 2 == 0)), on_response=remember("images", "image_id")),
+        Scenario("PUT /image/image_id", "PUT",
+                 lambda s, i: ("/image/image_id", {**s.nth("images", i), "image_base64": None, "main_image": True})),
+        Scenario("DELETE /image/image_id", "DELETE",
+                 lambda s, i: ("/image/image_id", {"image_id": s.take("images")["image_id"]})),
+        Scenario("POST /image/upload", "POST",
+                 lambda s, i: (f"/image/upload?amigurumi_id={amigurumi_of(s, i)}&list_id=1", s.image),
+                 on_response=remember_value("upload_jobs", "job_id"), expected_status=202, headers={"Content-Type": "image/jpeg"}),
+        Scenario("GET /image/upload/<job_id>", "GET", lambda s, i: (f"/image/upload/{s.nth('upload_jobs', i)}", None)),
+
+        Scenario("POST /import", "POST", lambda s, i: ("/import", s.nth("archives", i)),
+                 on_response=remember_new_ids("imported_amigurumis", "amigurumi_ids"), headers={"Content-Type": "application/zip"}),
+
+        Scenario("DELETE /stitchbook_sequence/bulk", "DELETE",
+                 lambda s, i: ("/stitchbook_sequence/bulk", [{"element_id": row["element_id"]} for row in s.take("element_batches")])),
+        Scenario("DELETE /stitchbook_sequence/element_id", "DELETE",
+                 lambda s, i: ("/stitchbook_sequence/element_id", {"element_id": s.take("elements")["element_id"]})),
+        Scenario("DELETE /foundation_list/amigurumi_id", "DELETE",
+                 lambda s, i: ("/foundation_list/amigurumi_id", {"amigurumi_id": s.take("amigurumis")["amigurumi_id"]})),
+        Scenario("DELETE /foundation_list/amigurumi_id (importados)", "DELETE",
+                 lambda s, i: ("/foundation_list/amigurumi_id", {"amigurumi_id": s.take("imported_amigurumis")})),
+    ]
+
+
+#---------------------------------------------------------------------------#
+# Cenários de entrada inválida: cada requisição deve ser recusada com o status indicado, sem alterar o catálogo.
+# Medem o custo das validações e garantem que nenhuma delas termina em 500
+def invalid_input_scenarios():
+    def element_update(state, index):
+        return {
+            "element_id": state.pick("element_ids", index), "amigurumi_id": state.pick("amigurumi_ids", index),
+            "element_order": 1, "element_name": "parte", "repetition": 2,
+        }
+
+    return [
+        Scenario("GET /foundation_list?after=inválido", "GET", lambda s, i: ("/foundation_list?after=invalido", None), expected_status=400),
+        Scenario("GET /foundation_list?limit=0", "GET", lambda s, i: ("/foundation_list?limit=0", None), expected_status=422),
+        Scenario("POST /foundation_list sem campos", "POST", lambda s, i: ("/foundation_list", {}), expected_status=422),
+        Scenario("POST /stitchbook parte inexistente", "POST",
+                 lambda s, i: ("/stitchbook", row_body(s.pick("amigurumi_ids", i), 0, i)), expected_status=404),
+        Scenario("POST /stitchbook/bulk amigurumi inexistente", "POST",
+                 lambda s, i: ("/stitchbook/bulk", [row_body(0, s.pick("element_ids", i), n) for n in range(10)]), expected_status=404),
+        Scenario("PUT /stitchbook/bulk linha inexistente", "PUT",
+                 lambda s, i: ("/stitchbook/bulk", [{**row_body(s.pick("amigurumi_ids", i), s.pick("element_ids", i), i), "line_id": 0}]),
+                 expected_status=404),
+        Scenario("DELETE /stitchbook/bulk linha inexistente", "DELETE",
+                 lambda s, i: ("/stitchbook/bulk", [{"line_id": 0}]), expected_status=404),
+        #a versão 0 nunca existe: a alteração é recusada sem modificar a parte
+        Scenario("PUT /stitchbook_sequence/element_id If-Match antigo", "PUT",
+                 lambda s, i: ("/stitchbook_sequence/element_id", element_update(s, i)), expected_status=412, headers={"If-Match": '"0"'}),
+        Scenario("POST /image base64 sem imagem", "POST",
+                 lambda s, i: ("/image", {**image_body(s, s.pick("amigurumi_ids", i), False), "image_base64": "dGV4dG8gc2ltcGxlcw=="}),
+                 expected_status=400),
+        Scenario("POST /import arquivo inválido", "POST",
+                 lambda s, i: ("/import", b"arquivo que nao e um zip"), expected_status=400, headers={"Content-Type": "application/zip"}),
+        Scenario("GET /export amigurumi inexistente", "GET", lambda s, i: ("/export?amigurumi_id=0", None), expected_status=404),
+        Scenario("GET /changes cursor futuro", "GET", lambda s, i: ("/changes?since=999999999", None), expected_status=410),
+        Scenario("GET /image/upload/<job_id> inexistente", "GET", lambda s, i: ("/image/upload/inexistente", None), expected_status=404),
+    ]
+
+
+def all_scenarios():
+    return read_scenarios() + invalid_input_scenarios() + write_scenarios()
@@ -0,0 +1,124 @@
+import io
+import os
+import random
+
+try:
+    from PIL import Image as PILImage
+except ImportError:
+    PILImage = None
+
+
+ROW_NOTATIONS = [
+    "6sc in mr", "6inc", "(sc, inc)*6", "(2sc, inc)*6", "(3sc, inc)*6", "30sc",
+    "(3sc, dec)*6", "(2sc, dec)*6", "[sc, dec]x6", "6dec", "ch 1, 18sc", "(pb, aum) 6 vezes",
+]
+
+WORDS = [
+    "urso", "gato", "coelho", "cabeça", "corpo", "braço", "perna", "orelha", "focinho", "rabo",
+    "encher", "fechar", "bordar", "olhos", "trocar", "cor", "costurar", "marcador", "linha", "agulha",
+]
+
+MATERIALS = ["linha de algodão", "fibra siliconada", "olhos de segurança", "agulha de crochê 2mm", "marcador de ponto", "feltro"]
+
+
+def words(rng, count):
+    return " ".join(rng.choice(WORDS) for _ in range(count))
+
+
+#---------------------------------------------------------------------------#
+# Imagem sintética com tamanho aproximado de size_bytes: ruído em JPEG quando o Pillow está instalado
+# (as miniaturas podem ser geradas), ou bytes aleatórios com o cabeçalho PNG
+def make_image(rng, size_bytes):
+    if PILImage is None:
+        return b"\x89PNG\r\n\x1a\n" + rng.randbytes(max(size_bytes - 8, 1))
+
+    #ruído em JPEG ocupa cerca de 1,5 byte por pixel
+    pixels = max(size_bytes / 1.5, 64)
+    width = max(int((pixels * 4 / 3) ** 0.5), 8)
+    height = max(int(pixels / width), 8)
+
+    picture = PILImage.frombytes("RGB", (width, height), rng.randbytes(width * height * 3))
+    output = io.BytesIO()
+    picture.save(output, "JPEG", quality=85)
+    return output.getvalue()
+
+
+#---------------------------------------------------------------------------#
+# Catálogo sintético gravado pelos modelos de table.py, com os mesmos cálculos feitos pela API
+# (contagem de pontos das carreiras e conteúdo das imagens no armazenamento de imagens)
+def seed_catalog(app, amigurumis=100, elements=8, rows=30, materials=10, images=2, image_bytes=100_000, seed=1234):
+    from app import image_store
+    from database import db
+    from stitch_notation import stitch_counts
+    from table import FoundationList, Image, MaterialList, StitchBook, StitchBookSequence
+
+    rng = random.Random(seed)
+    catalog = {"amigurumi_ids": [], "element_ids": [], "line_ids": [], "material_ids": [], "image_ids": []}
+
+    #cada amigurumi deriva de um anterior (relationship), formando uma família em árvore com três variações por receita
+    family = []
+
+    with app.app_context():
+        for index in range(amigurumis):
+            amigurumi = FoundationList(
+                name=f"{rng.choice(WORDS).capitalize()} {index}", size=rng.uniform(5, 40),
+                autor=f"autor {index % 20}", link=f"https://example.com/receitas/{index}",
+                relationship=family[(index - 1) // 3] if index else None,
+            )
+            db.session.add(amigurumi)
+            db.session.flush()
+            family.append(amigurumi.amigurumi_id)
+
+            element_objects = [
+                StitchBookSequence(
+                    amigurumi_id=amigurumi.amigurumi_id, element_order=order, element_name=words(rng, 2),
+                    repetition=rng.choice([1, 1, 2, 4]),
+                )
+                for order in range(1, elements + 1)
+            ]
+            db.session.add_all(element_objects)
+            db.session.flush()
+
+            for element in element_objects:
+                for number_row in range(1, rows + 1):
+                    notation = rng.choice(ROW_NOTATIONS)
+                    db.session.add(StitchBook(
+                        amigurumi_id=amigurumi.amigurumi_id, element_id=element.element_id, number_row=number_row,
+                        colour_id=rng.randint(1, 5), stich_sequence=notation, observation=words(rng, 4),
+                        **stitch_counts(notation),
+                    ))
+
+            for list_id in range(1, materials + 1):
+                db.session.add(MaterialList(
+                    amigurumi_id=amigurumi.amigurumi_id, material_name=rng.choice(MATERIALS),
+                    quantity=f"{rng.randint(1, 200)}g", list_id=(list_id % 2) + 1, colour_id=rng.randint(1, 5),
+                ))
+
+            for image_index in range(images):
+                content = make_image(rng, image_bytes)
+                db.session.add(Image(
+                    amigurumi_id=amigurumi.amigurumi_id, main_image=image_index == 0, list_id=1,
+                    content_hash=image_store.put(content), content_size=len(content),
+                    content_type="image/jpeg" if PILImage is not None else "image/png",
+                ))
+
+            db.session.commit()
+
+        catalog["amigurumi_ids"] = list(db.session.scalars(db.select(FoundationList.amigurumi_id)))
+        catalog["element_ids"] = list(db.session.scalars(db.select(StitchBookSequence.element_id)))
+        catalog["line_ids"] = list(db.session.scalars(db.select(StitchBook.line_id)))
+        catalog["material_ids"] = list(db.session.scalars(db.select(MaterialList.material_id)))
+        catalog["image_ids"] = list(db.session.scalars(db.select(Image.image_id)))
+
+    return catalog
+
+
+def catalog_sizes(catalog):
+    return {name: len(ids) for name, ids in catalog.items()}
+
+
+def blob_store_bytes(root):
+    total = 0
+    for directory, _, files in os.walk(root):
+        total += sum(os.path.getsize(os.path.join(directory, name)) for name in files)
+    return total
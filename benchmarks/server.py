@@ -0,0 +1,30 @@
+"""
+Servidor HTTP usado pelo modo http do benchmark, em um processo separado do gerador de carga.
+A configuração (banco, armazenamento de imagens, cache) vem das variáveis de ambiente definidas por benchmarks/__main__.py
+"""
+import argparse
+import logging
+
+import benchmarks  # noqa: F401  (pasta backend no sys.path)
+
+from werkzeug.serving import make_server
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, required=True)
+    args = parser.parse_args()
+
+    from app import create_app
+
+    app = create_app()
+    logging.getLogger("werkzeug").setLevel(logging.ERROR)
+
+    server = make_server(args.host, args.port, app, threaded=True)
+    print("ready", flush=True)
+    server.serve_forever()
+
+
+if __name__ == "__main__":
+    main()
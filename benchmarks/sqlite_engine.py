@@ -0,0 +1,144 @@
+"""
+Comparação do SQLite com os PRAGMAs padrão e com os PRAGMAs de config.SQLITE_PRAGMAS, com processos
+escrevendo e lendo ao mesmo tempo no mesmo arquivo (como os workers do gunicorn).
+
+Uso, a partir da raiz do repositório:
+    python benchmarks/sqlite_engine.py --writers 4 --readers 4 --seconds 5
+
+O resultado é impresso em JSON: operações por segundo de escrita e de leitura e quantos erros
+"database is locked" cada configuração teve.
+"""
+import argparse
+import json
+import multiprocessing
+import os
+import sqlite3
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "backend"))
+
+from config import Config
+
+
+SCHEMA = """
+CREATE TABLE foundation_list (
+    amigurumi_id INTEGER PRIMARY KEY AUTOINCREMENT,
+    name VARCHAR(100) NOT NULL,
+    size FLOAT NOT NULL,
+    autor VARCHAR(100) NOT NULL
+);
+CREATE INDEX ix_foundation_list_autor ON foundation_list (autor);
+"""
+
+
+def connect(path, pragmas):
+    #timeout=0 deixa a espera pelo lock apenas a cargo do PRAGMA busy_timeout, como na aplicação
+    connection = sqlite3.connect(path, timeout=0, isolation_level=None)
+    for name, value in pragmas.items():
+        connection.execute(f"PRAGMA {name}={value}")
+    return connection
+
+
+def writer(path, pragmas, deadline, results):
+    connection = connect(path, pragmas)
+    done = locked = 0
+
+    while time.time() < deadline:
+        try:
+            connection.execute("BEGIN IMMEDIATE")
+            connection.execute(
+                "INSERT INTO foundation_list (name, size, autor) VALUES (?, ?, ?)", ("amigurumi", 10.0, f"autor {done % 50}")
+            )
+            connection.execute("COMMIT")
+            done += 1
+        except sqlite3.OperationalError as error:
+            if "locked" not in str(error):
+                raise
+            locked += 1
+            if connection.in_transaction:
+                connection.execute("ROLLBACK")
+
+    results.put(("write", done, locked))
+
+
+def reader(path, pragmas, deadline, results):
+    connection = connect(path, pragmas)
+    done = locked = 0
+
+    while time.time() < deadline:
+        try:
+            connection.execute(
+                "SELECT amigurumi_id, name, size, autor FROM foundation_list WHERE autor = ? ORDER BY amigurumi_id DESC LIMIT 50",
+                (f"autor {done % 50}",),
+            ).fetchall()
+            done += 1
+        except sqlite3.OperationalError as error:
+            if "locked" not in str(error):
+                raise
+            locked += 1
+
+    results.put(("read", done, locked))
+
+
+def run(label, pragmas, writers, readers, seconds, seed_rows):
+    directory = tempfile.mkdtemp(prefix="sqlite-bench-")
+    path = os.path.join(directory, "bench.db")
+
+    connection = connect(path, pragmas)
+    connection.executescript(SCHEMA)
+    connection.execute("BEGIN")
+    connection.executemany(
+        "INSERT INTO foundation_list (name, size, autor) VALUES (?, ?, ?)",
+        (("amigurumi", 10.0, f"autor {i % 50}") for i in range(seed_rows)),
+    )
+    connection.execute("COMMIT")
+    connection.close()
+
+    results = multiprocessing.Queue()
+    deadline = time.time() + seconds
+    processes = [multiprocessing.Process(target=writer, args=(path, pragmas, deadline, results)) for _ in range(writers)]
+    processes += [multiprocessing.Process(target=reader, args=(path, pragmas, deadline, results)) for _ in range(readers)]
+
+    for process in processes:
+        process.start()
+
+    totals = {"write": [0, 0], "read": [0, 0]}
+    for _ in processes:
+        kind, done, locked = results.get()
+        totals[kind][0] += done
+        totals[kind][1] += locked
+
+    for process in processes:
+        process.join()
+
+    return {
+        "config": label,
+        "pragmas": pragmas,
+        "writes_per_second": round(totals["write"][0] / seconds, 1),
+        "reads_per_second": round(totals["read"][0] / seconds, 1),
+        "write_locked_errors": totals["write"][1],
+        "read_locked_errors": totals["read"][1],
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--writers", type=int, default=4)
+    parser.add_argument("--readers", type=int, default=4)
+    parser.add_argument("--seconds", type=float, default=5)
+    parser.add_argument("--seed-rows", type=int, default=20000)
+    args = parser.parse_args()
+
+    configs = [
+        ("default", {}),
+        ("tuned", Config.SQLITE_PRAGMAS),
+    ]
+
+    report = [run(label, pragmas, args.writers, args.readers, args.seconds, args.seed_rows) for label, pragmas in configs]
+    print(json.dumps(report, indent=2))
+
+
+if __name__ == "__main__":
+    main()
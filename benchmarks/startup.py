@@ -0,0 +1,142 @@
+"""
+Benchmark do tempo de inicialização: cada execução é um processo novo, que importa app.py, cria a aplicação e atende
+a primeira requisição de uma rota e da documentação OpenAPI. Mede com e sem SCHEMA_WARMUP. Execute a partir da raiz:
+
+    python -m benchmarks.startup --runs 20 --output startup.json
+"""
+import argparse
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime, timezone
+
+from benchmarks import BACKEND_DIR
+
+PHASES = ["import_ms", "create_app_ms", "ready_ms", "first_request_ms", "first_openapi_ms", "process_ms"]
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(prog="python -m benchmarks.startup", description="Benchmark do tempo de inicialização")
+    parser.add_argument("--runs", type=int, default=10, help="processos iniciados por configuração")
+    parser.add_argument("--output", default=None, help="arquivo JSON dos resultados (padrão: saída padrão)")
+    parser.add_argument("--workdir", default=None, help="pasta do banco e das imagens (padrão: pasta temporária)")
+    parser.add_argument("--probe", action="store_true", help=argparse.SUPPRESS)
+    return parser.parse_args()
+
+
+#---------------------------------------------------------------------------#
+# Processo medido: os tempos são contados a partir do início do interpretador (inclui a importação das dependências)
+def probe():
+    started = time.perf_counter()
+
+    from app import create_app
+    imported = time.perf_counter()
+
+    app = create_app()
+    created = time.perf_counter()
+
+    #o banco está vazio: a listagem responde 404, o que conta é a rota ter sido validada e executada
+    client = app.test_client()
+    status = client.get("/foundation_list?limit=10").status_code
+    first_request = time.perf_counter()
+
+    openapi_status = client.get("/openapi/openapi.json").status_code
+    first_openapi = time.perf_counter()
+
+    print(json.dumps({
+        "import_ms": (imported - started) * 1000,
+        "create_app_ms": (created - imported) * 1000,
+        "ready_ms": (created - started) * 1000,
+        "first_request_ms": (first_request - created) * 1000,
+        "first_openapi_ms": (first_openapi - first_request) * 1000,
+        "errors": int(status >= 500) + int(openapi_status != 200),
+    }))
+
+
+def run_probe(env):
+    started = time.perf_counter()
+    result = subprocess.run(
+        [sys.executable, "-m", "benchmarks.startup", "--probe"],
+        cwd=os.path.dirname(BACKEND_DIR), env=env, capture_output=True, text=True, check=True,
+    )
+    sample = json.loads(result.stdout.strip().splitlines()[-1])
+    sample["process_ms"] = (time.perf_counter() - started) * 1000
+    return sample
+
+
+def summarize(samples):
+    summary = {}
+
+    for phase in PHASES:
+        values = sorted(sample[phase] for sample in samples)
+        summary[phase] = {
+            "min": round(values[0], 2),
+            "median": round(statistics.median(values), 2),
+            "p95": round(values[min(len(values) - 1, int(len(values) * 0.95))], 2),
+        }
+
+    summary["errors"] = sum(sample["errors"] for sample in samples)
+    return summary
+
+
+def main():
+    args = parse_args()
+    if args.probe:
+        probe()
+        return
+
+    workdir = args.workdir or tempfile.mkdtemp(prefix="amigurumi-startup-")
+    os.makedirs(workdir, exist_ok=True)
+
+    env = dict(os.environ)
+    env.update({
+        "APP_ENV": "production",
+        "AUTO_UPGRADE_DATABASE": "false",
+        "DATABASE_URL": f"sqlite:///{os.path.join(workdir, 'startup.db')}",
+        "BLOB_STORE_PATH": os.path.join(workdir, "blob_store"),
+        "THUMBNAIL_CACHE_PATH": os.path.join(workdir, "thumbnail_cache"),
+        "PYTHONPATH": os.pathsep.join(filter(None, [os.path.dirname(BACKEND_DIR), BACKEND_DIR, os.environ.get("PYTHONPATH")])),
+    })
+
+    #a primeira execução cria o banco e aquece o cache de arquivos do sistema operacional; não entra nos resultados
+    run_probe({**env, "AUTO_UPGRADE_DATABASE": "true"})
+
+    results = []
+    for warmup in ("false", "true"):
+        samples = [run_probe({**env, "SCHEMA_WARMUP": warmup}) for _ in range(args.runs)]
+        summary = summarize(samples)
+        results.append({"schema_warmup": warmup == "true", "runs": args.runs, **summary})
+
+        print(
+            f"SCHEMA_WARMUP={warmup:5}  pronto {summary['ready_ms']['median']:8.1f} ms  "
+            f"primeira requisição {summary['first_request_ms']['median']:7.1f} ms  "
+            f"openapi {summary['first_openapi_ms']['median']:7.1f} ms  processo {summary['process_ms']['median']:8.1f} ms",
+            file=sys.stderr,
+        )
+
+    output = {
+        "meta": {
+            "timestamp": datetime.now(timezone.utc).isoformat(),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "cpu_count": os.cpu_count(),
+            "args": vars(args),
+        },
+        "results": results,
+    }
+
+    text = json.dumps(output, indent=2, ensure_ascii=False)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as output_file:
+            output_file.write(text + "\n")
+    else:
+        print(text)
+
+
+if __name__ == "__main__":
+    main()
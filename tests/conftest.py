@@ -0,0 +1,89 @@
+"""
+Testes da API. Execute a partir da raiz do repositório => python -m pytest tests
+
+Cada teste recebe uma aplicação nova, com o banco SQLite, o armazenamento de imagens e o cache das miniaturas
+em uma pasta temporária, e o cache das respostas desativado (um módulo pode alterar a configuração
+redefinindo a fixture settings)
+"""
+import os
+import sys
+
+import pytest
+
+BACKEND_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "backend")
+
+if BACKEND_DIR not in sys.path:
+    sys.path.insert(0, BACKEND_DIR)
+
+
+@pytest.fixture
+def settings():
+    return {"CACHE_MAX_ENTRIES": 0}
+
+
+@pytest.fixture
+def app(tmp_path, settings):
+    from app import create_app
+    from config import TestingConfig
+    from database import db
+
+    class Config(TestingConfig):
+        SQLALCHEMY_DATABASE_URI = f"sqlite:///{tmp_path / 'test.db'}"
+        BLOB_STORE_PATH = str(tmp_path / "blob_store")
+        THUMBNAIL_CACHE_PATH = str(tmp_path / "thumbnail_cache")
+
+    for key, value in settings.items():
+        setattr(Config, key, value)
+
+    app = create_app(Config)
+    yield app
+
+    with app.app_context():
+        db.session.remove()
+        db.engine.dispose()
+
+
+@pytest.fixture
+def client(app):
+    return app.test_client()
+
+
+#---------------------------------------------------------------------------#
+# Cadastro pela própria API dos registros usados nos testes; cada função retorna o id criado
+def amigurumi_body(**values):
+    return {"name": "Urso", "size": 12.5, "autor": "teste", "link": None, "relationship": None, **values}
+
+
+def element_body(amigurumi_id, **values):
+    return {"amigurumi_id": amigurumi_id, "element_order": 1, "element_name": "cabeça", "repetition": 1, **values}
+
+
+def row_body(amigurumi_id, element_id, **values):
+    return {
+        "amigurumi_id": amigurumi_id, "element_id": element_id, "number_row": 1, "colour_id": 1,
+        "stich_sequence": "6sc", "observation": "carreira", **values,
+    }
+
+
+@pytest.fixture
+def create(client):
+    class Create:
+        @staticmethod
+        def amigurumi(**values):
+            response = client.post("/foundation_list", json=amigurumi_body(**values))
+            assert response.status_code == 200, response.get_json()
+            return response.get_json()["amigurumi_id"]
+
+        @staticmethod
+        def element(amigurumi_id, **values):
+            response = client.post("/stitchbook_sequence", json=element_body(amigurumi_id, **values))
+            assert response.status_code == 200, response.get_json()
+            return response.get_json()["element_id"]
+
+        @staticmethod
+        def row(amigurumi_id, element_id, **values):
+            response = client.post("/stitchbook", json=row_body(amigurumi_id, element_id, **values))
+            assert response.status_code == 200, response.get_json()
+            return response.get_json()["line_id"]
+
+    return Create
@@ -0,0 +1,109 @@
+import io
+import json
+import zipfile
+
+import pytest
+
+from conftest import row_body
+
+
+def export(client, *amigurumi_ids):
+    response = client.get("/export", query_string=[("amigurumi_id", amigurumi_id) for amigurumi_id in amigurumi_ids])
+    assert response.status_code == 200
+    return response.get_data()
+
+
+def import_archive(client, data):
+    return client.post("/import", data=data, content_type="application/zip")
+
+
+#cópia do arquivo exportado com o manifest (ou uma entrada) trocado
+def rewrite(data, **entries):
+    output = io.BytesIO()
+
+    with zipfile.ZipFile(io.BytesIO(data)) as source, zipfile.ZipFile(output, "w") as target:
+        for name in source.namelist():
+            if name not in entries:
+                target.writestr(name, source.read(name))
+
+        for name, content in entries.items():
+            if content is not None:
+                target.writestr(name, content)
+
+    return output.getvalue()
+
+
+def manifest_of(data):
+    with zipfile.ZipFile(io.BytesIO(data)) as archive:
+        return json.loads(archive.read("manifest.json"))
+
+
+@pytest.fixture
+def archive(client, create):
+    amigurumi_id = create.amigurumi()
+    element_id = create.element(amigurumi_id)
+    client.post("/stitchbook/bulk", json=[row_body(amigurumi_id, element_id, number_row=n) for n in range(1, 4)])
+    client.post("/material_list", json={"amigurumi_id": amigurumi_id, "material_name": "linha", "quantity": "50g", "list_id": 1, "colour_id": 1})
+
+    return export(client, amigurumi_id)
+
+
+def test_round_trip(client, archive):
+    response = import_archive(client, archive)
+    result = response.get_json()
+
+    assert response.status_code == 200
+    assert result["counts"] == {"foundation_list": 1, "stitchbook_sequence": 1, "stitchbook": 3, "material_list": 1, "image": 0}
+    assert len(client.get("/foundation_list").get_json()) == 2
+
+
+def broken_manifests(manifest):
+    tables = manifest["tables"]
+    fmt = manifest["row_format"]
+    columns = tables["stitchbook"]["columns"]
+
+    return {
+        "sem tabelas": {"version": 1},
+        "sem formato": {"version": 1, "tables": tables},
+        "formato desconhecido": {**manifest, "row_format": "csv"},
+        "tabelas em lista": {**manifest, "tables": list(tables)},
+        "tabela desconhecida": {**manifest, "tables": {**tables, "usuarios": {"columns": ["id"]}}},
+        "colunas ausentes": {**manifest, "tables": {**tables, "stitchbook": {"rows": 3}}},
+        "coluna obrigatória": {**manifest, "tables": {**tables, "stitchbook": {"columns": [c for c in columns if c != "element_id"]}}},
+        "versão": {**manifest, "version": 2},
+        "lista": [manifest],
+        "formato da tabela": {**manifest, "row_format": "ndjson" if fmt == "msgpack" else "msgpack"},
+    }
+
+
+#manifest malformado ou incompleto: 400, e nada é importado
+@pytest.mark.parametrize("case", [
+    "sem tabelas", "sem formato", "formato desconhecido", "tabelas em lista", "tabela desconhecida",
+    "colunas ausentes", "coluna obrigatória", "versão", "lista", "formato da tabela",
+])
+def test_malformed_manifest(client, archive, case):
+    manifest = broken_manifests(manifest_of(archive))[case]
+    response = import_archive(client, rewrite(archive, **{"manifest.json": json.dumps(manifest)}))
+
+    assert response.status_code == 400, response.get_json()
+    assert len(client.get("/foundation_list").get_json()) == 1
+
+
+@pytest.mark.parametrize("entries", [
+    {"manifest.json": b"{nao e json"},
+    {"manifest.json": None},
+    {"tables/stitchbook.msgpack": b"\xc1\xc1\xc1", "tables/stitchbook.ndjson": b"[1, 2\n"},
+    {"tables/stitchbook.msgpack": b"\x93\x01\x02\x03", "tables/stitchbook.ndjson": b"[1, 2, 3]\n"},
+])
+def test_corrupted_entries(client, archive, entries):
+    fmt = manifest_of(archive)["row_format"]
+    entries = {name: content for name, content in entries.items() if not name.startswith("tables/") or name.endswith(fmt)}
+
+    response = import_archive(client, rewrite(archive, **entries))
+
+    assert response.status_code == 400, response.get_json()
+    assert len(client.get("/foundation_list").get_json()) == 1
+
+
+def test_not_a_zip(client):
+    assert import_archive(client, b"isto nao e um zip").status_code == 400
@@ -0,0 +1,134 @@
+import pytest
+
+from conftest import element_body, row_body
+
+
+@pytest.fixture
+def recipe(create):
+    amigurumi_id = create.amigurumi()
+    other_id = create.amigurumi(name="Coelho")
+    element_id = create.element(amigurumi_id)
+    other_element_id = create.element(other_id)
+    line_id = create.row(amigurumi_id, element_id)
+
+    return {
+        "amigurumi_id": amigurumi_id, "other_id": other_id, "element_id": element_id,
+        "other_element_id": other_element_id, "line_id": line_id,
+    }
+
+
+#a listagem também traz as partes sem carreiras, sem line_id
+def stitchbook_rows(client):
+    return {row["line_id"]: row for row in client.get("/stitchbook?limit=1000").get_json() if row.get("line_id")}
+
+
+def test_bulk_insert_returns_sorted_ids(client, recipe):
+    body = [row_body(recipe["amigurumi_id"], recipe["element_id"], number_row=n) for n in range(2, 12)]
+    response = client.post("/stitchbook/bulk", json=body)
+
+    line_ids = response.get_json()["line_ids"]
+    assert response.status_code == 200
+    assert line_ids == sorted(line_ids) and len(line_ids) == 10
+    assert set(line_ids) <= set(stitchbook_rows(client))
+
+
+#nenhuma linha do lote é gravada quando uma delas é inválida
+def test_bulk_insert_with_missing_amigurumi(client, recipe):
+    body = [row_body(recipe["amigurumi_id"], recipe["element_id"]), row_body(999, recipe["element_id"])]
+    response = client.post("/stitchbook/bulk", json=body)
+
+    assert response.status_code == 404
+    assert response.get_json()["amigurumi_id"] == [999]
+    assert list(stitchbook_rows(client)) == [recipe["line_id"]]
+
+
+def test_bulk_insert_with_element_of_another_amigurumi(client, recipe):
+    body = [row_body(recipe["amigurumi_id"], recipe["element_id"]), row_body(recipe["amigurumi_id"], recipe["other_element_id"])]
+    response = client.post("/stitchbook/bulk", json=body)
+
+    assert response.status_code == 404
+    assert response.get_json()["elements"] == [{"element_id": recipe["other_element_id"], "amigurumi_id": recipe["amigurumi_id"]}]
+    assert list(stitchbook_rows(client)) == [recipe["line_id"]]
+
+
+@pytest.mark.parametrize("element_id", [999, "other_element_id"])
+def test_single_insert_with_invalid_element(client, recipe, element_id):
+    element_id = recipe.get(element_id, element_id)
+    response = client.post("/stitchbook", json=row_body(recipe["amigurumi_id"], element_id))
+
+    assert response.status_code == 404
+
+
+def test_bulk_update_with_missing_line(client, recipe):
+    body = [
+        {**row_body(recipe["amigurumi_id"], recipe["element_id"], colour_id=2), "line_id": recipe["line_id"]},
+        {**row_body(recipe["amigurumi_id"], recipe["element_id"], colour_id=2), "line_id": 999},
+    ]
+    response = client.put("/stitchbook/bulk", json=body)
+
+    assert response.status_code == 404
+    assert response.get_json()["line_id"] == [999]
+    assert stitchbook_rows(client)[recipe["line_id"]]["colour_id"] == 1
+
+
+def test_bulk_update_with_missing_amigurumi(client, recipe):
+    body = [{**row_body(999, recipe["element_id"]), "line_id": recipe["line_id"]}]
+    response = client.put("/stitchbook/bulk", json=body)
+
+    assert response.status_code == 404
+    assert response.get_json()["amigurumi_id"] == [999]
+
+
+def test_bulk_update_with_element_of_another_amigurumi(client, recipe):
+    body = [{**row_body(recipe["amigurumi_id"], recipe["other_element_id"]), "line_id": recipe["line_id"]}]
+    response = client.put("/stitchbook/bulk", json=body)
+
+    assert response.status_code == 404
+    assert stitchbook_rows(client)[recipe["line_id"]]["element_id"] == recipe["element_id"]
+
+
+def test_bulk_delete_with_missing_line(client, recipe):
+    response = client.delete("/stitchbook/bulk", json=[{"line_id": recipe["line_id"]}, {"line_id": 999}])
+
+    assert response.status_code == 404
+    assert response.get_json()["line_id"] == [999]
+    assert recipe["line_id"] in stitchbook_rows(client)
+
+
+def test_element_bulk_update_with_missing_amigurumi(client, recipe):
+    body = [{**element_body(999), "element_id": recipe["element_id"]}]
+    response = client.put("/stitchbook_sequence/bulk", json=body)
+
+    assert response.status_code == 404
+    assert response.get_json()["amigurumi_id"] == [999]
+
+
+def test_material_bulk_insert_with_missing_amigurumi(client, recipe):
+    material = {"material_name": "linha", "quantity": "50g", "list_id": 1, "colour_id": 1}
+    response = client.post("/material_list/bulk", json=[{**material, "amigurumi_id": recipe["amigurumi_id"]}, {**material, "amigurumi_id": 999}])
+
+    assert response.status_code == 404
+    assert response.get_json()["amigurumi_id"] == [999]
+    assert client.get("/material_list").get_json() == []
+
+
+#amigurumi excluído entre a validação e o commit: a chave estrangeira responde com 404 e nada é gravado
+@pytest.mark.parametrize("path, body", [
+    ("/material_list/bulk", {"material_name": "linha", "quantity": "50g", "list_id": 1, "colour_id": 1}),
+    ("/stitchbook_sequence/bulk", element_body(999)),
+    ("/stitchbook/bulk", row_body(999, 0)),
+])
+def test_bulk_insert_foreign_key_violation(client, recipe, monkeypatch, path, body):
+    import app as app_module
+
+    monkeypatch.setattr(app_module, "missing_ids", lambda column, ids: [])
+    monkeypatch.setattr(app_module, "element_mismatches", lambda data: [])
+
+    if "element_id" in body:
+        body = {**body, "element_id": recipe["element_id"]}
+
+    response = client.post(path, json=[{**body, "amigurumi_id": 999}])
+
+    assert response.status_code == 404
+    assert response.get_json()["error"] == app_module.FOREIGN_KEY_ERROR
+    assert client.get(path.replace("/bulk", "") + "?amigurumi_id=999").get_json() == []
@@ -0,0 +1,215 @@
+import json
+
+import pytest
+
+from conftest import row_body
+
+
+#as conexões de /changes/stream são encerradas depois da primeira leitura sem páginas seguintes
+@pytest.fixture
+def settings():
+    return {"CACHE_MAX_ENTRIES": 0, "CHANGES_STREAM_SECONDS": 0, "CHANGES_POLL_SECONDS": 0}
+
+
+def cursor(client):
+    response = client.get("/changes")
+    assert response.status_code == 200
+    return response.get_json()["cursor"]
+
+
+def changes_since(client, since, **query):
+    response = client.get("/changes", query_string={"since": since, **query})
+    assert response.status_code == 200, response.get_json()
+    return response.get_json()
+
+
+#(tabela, id, operação) de cada alteração da página
+def operations(page):
+    return {(change["table"], change["id"], change["operation"]) for change in page["changes"]}
+
+
+@pytest.fixture
+def recipe(create):
+    amigurumi_id = create.amigurumi()
+    element_id = create.element(amigurumi_id)
+    lines = [create.row(amigurumi_id, element_id, number_row=n) for n in (1, 2, 3)]
+    return {"amigurumi_id": amigurumi_id, "element_id": element_id, "lines": lines}
+
+
+def test_insert_update_and_delete(client, create):
+    since = cursor(client)
+    amigurumi_id = create.amigurumi()
+    element_id = create.element(amigurumi_id)
+
+    page = changes_since(client, since)
+    assert operations(page) == {("foundation_list", amigurumi_id, "insert"), ("stitchbook_sequence", element_id, "insert")}
+    assert page["has_more"] is False
+    assert [change["data"]["name"] for change in page["changes"] if change["table"] == "foundation_list"] == ["Urso"]
+
+    since = page["cursor"]
+    assert client.put("/foundation_list/amigurumi_id", json={"amigurumi_id": amigurumi_id, "name": "Panda"}).status_code == 200
+    assert client.delete("/stitchbook_sequence/element_id", json={"element_id": element_id}).status_code == 200
+
+    page = changes_since(client, since)
+    assert operations(page) == {("foundation_list", amigurumi_id, "update"), ("stitchbook_sequence", element_id, "delete")}
+    assert page["changes"][0]["data"]["name"] == "Panda"
+    assert "data" not in page["changes"][1]
+
+    #sem alterações novas o cursor não muda
+    assert changes_since(client, page["cursor"]) == {"changes": [], "cursor": page["cursor"], "has_more": False}
+
+
+#uma linha incluída e alterada desde o cursor é entregue uma única vez, como inclusão com os dados atuais
+def test_insert_then_update_is_one_insert(client, create):
+    since = cursor(client)
+    amigurumi_id = create.amigurumi()
+    client.put("/foundation_list/amigurumi_id", json={"amigurumi_id": amigurumi_id, "name": "Panda"})
+
+    page = changes_since(client, since)
+    assert operations(page) == {("foundation_list", amigurumi_id, "insert")}
+    assert page["changes"][0]["data"]["name"] == "Panda"
+
+
+#a exclusão da parte remove as carreiras pelo ON DELETE CASCADE, e cada uma é registrada
+def test_element_delete_cascades(client, recipe):
+    since = cursor(client)
+    assert client.delete("/stitchbook_sequence/element_id", json={"element_id": recipe["element_id"]}).status_code == 200
+
+    assert operations(changes_since(client, since)) == {
+        ("stitchbook_sequence", recipe["element_id"], "delete"),
+        *(("stitchbook", line_id, "delete") for line_id in recipe["lines"]),
+    }
+
+
+#a exclusão do amigurumi remove as partes e as carreiras em todos os níveis, e os derivados perdem a origem (SET NULL)
+def test_amigurumi_delete_cascades(client, create, recipe):
+    amigurumi_id = recipe["amigurumi_id"]
+    derived_id = create.amigurumi(name="Ursinho", relationship=amigurumi_id)
+    material = client.post("/material_list", json={
+        "amigurumi_id": amigurumi_id, "material_name": "linha", "quantity": "50g", "list_id": 1, "colour_id": 1,
+    })
+    assert material.status_code == 200
+
+    since = cursor(client)
+    assert client.delete("/foundation_list/amigurumi_id", json={"amigurumi_id": amigurumi_id}).status_code == 200
+
+    page = changes_since(client, since)
+    assert operations(page) == {
+        ("foundation_list", amigurumi_id, "delete"),
+        ("foundation_list", derived_id, "update"),
+        ("stitchbook_sequence", recipe["element_id"], "delete"),
+        ("material_list", material.get_json()["material_id"], "delete"),
+        *(("stitchbook", line_id, "delete") for line_id in recipe["lines"]),
+    }
+    assert [change["data"]["relationship"] for change in page["changes"]
+            if change["table"] == "foundation_list" and change["id"] == derived_id] == [None]
+
+
+def test_filters(client, create, recipe):
+    other_id = create.amigurumi(name="Coelho")
+    since = cursor(client)
+    client.put("/stitchbook/line_id", json={"line_id": recipe["lines"][0], "observation": "nova"})
+    client.put("/foundation_list/amigurumi_id", json={"amigurumi_id": other_id, "name": "Lebre"})
+
+    assert operations(changes_since(client, since, table="stitchbook")) == {("stitchbook", recipe["lines"][0], "update")}
+    assert operations(changes_since(client, since, amigurumi_id=other_id)) == {("foundation_list", other_id, "update")}
+
+    #os filtros não alteram o cursor retornado
+    assert changes_since(client, since, table="image")["cursor"] == cursor(client)
+
+
+def test_pages(client, create, recipe):
+    since = cursor(client)
+    for line_id in recipe["lines"]:
+        client.put("/stitchbook/line_id", json={"line_id": line_id, "observation": "nova"})
+
+    first = changes_since(client, since, limit=2)
+    assert first["has_more"] is True and len(first["changes"]) == 2
+
+    second = changes_since(client, first["cursor"], limit=2)
+    assert second["has_more"] is False
+    assert operations(first) | operations(second) == {("stitchbook", line_id, "update") for line_id in recipe["lines"]}
+
+
+#a alteração desfeita pelo rollback não deixa registro
+def test_rejected_write_is_not_logged(client, recipe):
+    since = cursor(client)
+    response = client.post("/stitchbook/bulk", json=[row_body(recipe["amigurumi_id"], recipe["element_id"]), row_body(999, recipe["element_id"])])
+
+    assert response.status_code == 404
+    assert changes_since(client, since)["changes"] == []
+
+
+#---------------------------------------------------------------------------#
+# Cursores que não podem mais ser atendidos
+def test_cursor_expired_by_pruning(app, client, create, recipe):
+    since = cursor(client)
+    create.amigurumi(name="Coelho")
+    create.amigurumi(name="Gato")
+
+    #dias negativos: todos os registros, exceto o último, ficam mais antigos que o limite
+    result = app.test_cli_runner().invoke(args=["prune-changes", "--days", "-1"])
+    assert result.exit_code == 0 and "registros de alteração removidos" in result.output
+
+    response = client.get("/changes", query_string={"since": since})
+    assert response.status_code == 410
+
+    #o cursor atual continua válido depois da remoção
+    latest = cursor(client)
+    assert changes_since(client, latest)["changes"] == []
+    assert client.get("/changes/stream", query_string={"since": since}).status_code == 410
+
+
+def test_cursor_of_another_database(client, recipe):
+    assert client.get("/changes", query_string={"since": cursor(client) + 10}).status_code == 410
+
+
+#---------------------------------------------------------------------------#
+# Server-Sent Events
+def stream_events(response):
+    events = []
+    for block in response.get_data(as_text=True).split("\n\n"):
+        fields = dict(line.split(": ", 1) for line in block.splitlines() if line and not line.startswith(":"))
+        if fields.get("event") == "changes":
+            events.append((int(fields["id"]), json.loads(fields["data"])))
+    return events
+
+
+def test_stream_sends_changes(client, recipe):
+    since = cursor(client)
+    assert client.delete("/stitchbook_sequence/element_id", json={"element_id": recipe["element_id"]}).status_code == 200
+
+    response = client.get("/changes/stream", query_string={"since": since, "limit": 2})
+    assert response.status_code == 200
+    assert response.mimetype == "text/event-stream"
+
+    events = stream_events(response)
+    assert len(events) == 2
+    assert [event_id for event_id, _ in events] == [page["cursor"] for _, page in events]
+    assert set().union(*(operations(page) for _, page in events)) == {
+        ("stitchbook_sequence", recipe["element_id"], "delete"),
+        *(("stitchbook", line_id, "delete") for line_id in recipe["lines"]),
+    }
+
+
+#a reconexão do EventSource continua do Last-Event-ID, que prevalece sobre since
+def test_stream_resumes_from_last_event_id(client, create, recipe):
+    since = cursor(client)
+    first_id = create.amigurumi(name="Coelho")
+    resume = cursor(client)
+    second_id = create.amigurumi(name="Gato")
+
+    response = client.get("/changes/stream", query_string={"since": since}, headers={"Last-Event-ID": str(resume)})
+    events = stream_events(response)
+
+    assert len(events) == 1
+    assert operations(events[0][1]) == {("foundation_list", second_id, "insert")}
+    assert first_id not in {change["id"] for change in events[0][1]["changes"]}
+
+
+def test_stream_without_changes_keeps_alive(client, recipe):
+    response = client.get("/changes/stream")
+
+    assert response.status_code == 200
+    assert stream_events(response) == []
+    assert ": keep-alive" in response.get_data(as_text=True)
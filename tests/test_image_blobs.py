@@ -0,0 +1,107 @@
+import base64
+import io
+import os
+import time
+
+import pytest
+from PIL import Image as PILImage
+
+
+def image_base64(colour):
+    output = io.BytesIO()
+    PILImage.new("RGB", (8, 8), colour).save(output, format="PNG")
+    return base64.b64encode(output.getvalue()).decode()
+
+
+def image_body(amigurumi_id, colour="red", **values):
+    return {"amigurumi_id": amigurumi_id, "list_id": 1, "main_image": False, "image_base64": image_base64(colour), **values}
+
+
+@pytest.fixture
+def store(app):
+    from app import image_store
+    return image_store
+
+
+def add_image(client, amigurumi_id, colour="red"):
+    response = client.post("/image", json=image_body(amigurumi_id, colour))
+    assert response.status_code == 200, response.get_json()
+    return response.get_json()["image_id"]
+
+
+def content_hash(app, image_id):
+    from database import db
+    from table import Image
+
+    with app.app_context():
+        return db.session.get(Image, image_id).content_hash
+
+
+#arquivos antigos: a data de modificação é recuada para além do prazo de sweep_image_blobs
+def age(store, digest, seconds=7200):
+    path = store.path(digest)
+    modified = time.time() - seconds
+    os.utime(path, (modified, modified))
+
+
+def sweep(app, grace_seconds=3600):
+    from app import sweep_image_blobs
+
+    with app.app_context():
+        return sweep_image_blobs(grace_seconds)
+
+
+#a exclusão da imagem não remove o arquivo; a limpeza remove apenas os arquivos antigos sem nenhuma linha
+def test_sweep_removes_only_unused_old_blobs(app, client, create, store):
+    amigurumi_id = create.amigurumi()
+    kept_id = add_image(client, amigurumi_id, "red")
+    removed_id = add_image(client, amigurumi_id, "blue")
+    kept, removed = content_hash(app, kept_id), content_hash(app, removed_id)
+
+    assert client.delete("/image/image_id", json={"image_id": removed_id}).status_code == 200
+    assert store.exists(removed)
+
+    age(store, kept)
+    age(store, removed)
+
+    assert sweep(app) == 1
+    assert store.exists(kept)
+    assert not store.exists(removed)
+
+
+def test_sweep_keeps_recent_blobs(app, client, create, store):
+    amigurumi_id = create.amigurumi()
+    image_id = add_image(client, amigurumi_id)
+    digest = content_hash(app, image_id)
+    client.delete("/image/image_id", json={"image_id": image_id})
+
+    assert sweep(app) == 0
+    assert store.exists(digest)
+
+
+#o cadastro de um conteúdo já armazenado renova a data do arquivo, que deixa de ser removido pela limpeza
+def test_reused_blob_is_not_swept(app, client, create, store):
+    amigurumi_id = create.amigurumi()
+    image_id = add_image(client, amigurumi_id)
+    digest = content_hash(app, image_id)
+    client.delete("/image/image_id", json={"image_id": image_id})
+    age(store, digest)
+
+    with open(store.path(digest), "rb") as content:
+        assert store.put(content.read()) == digest
+
+    assert sweep(app) == 0
+    assert store.exists(digest)
+
+
+def test_delete_keeps_blob_touched_after_cutoff(tmp_path):
+    from blob_store import BlobStore
+
+    store = BlobStore(str(tmp_path / "blobs"))
+    digest = store.put(b"\x89PNG\r\n\x1a\nconteudo")
+    age(store, digest)
+
+    assert not store.delete(digest, older_than=time.time() - 7200 - 60)
+    assert store.exists(digest)
+    assert store.delete(digest, older_than=time.time() - 3600)
+    assert not store.exists(digest)
@@ -0,0 +1,106 @@
+import io
+import time
+from datetime import datetime, timedelta, timezone
+
+import pytest
+from PIL import Image as PILImage
+
+
+def jpeg_bytes():
+    output = io.BytesIO()
+    PILImage.new("RGB", (40, 30), "red").save(output, format="JPEG")
+    return output.getvalue()
+
+
+def wait_for(client, job_id):
+    for _ in range(200):
+        job = client.get(f"/image/upload/{job_id}").get_json()
+        if job["status"] not in ("pending", "processing"):
+            return job
+        time.sleep(0.02)
+
+    raise AssertionError(f"envio {job_id} não foi concluído")
+
+
+#envio que ficou sem conclusão (worker reiniciado), recebido minutes minutos atrás
+def add_unfinished_job(app, amigurumi_id, minutes, status="pending"):
+    from database import db
+    from table import ImageUpload
+
+    created_at = datetime.now(timezone.utc).replace(tzinfo=None) - timedelta(minutes=minutes)
+    job_id = f"interrompido{minutes}{status}"
+
+    with app.app_context():
+        db.session.add(ImageUpload(job_id=job_id, amigurumi_id=amigurumi_id, list_id=1, status=status, created_at=created_at))
+        db.session.commit()
+
+    return job_id
+
+
+def test_upload_is_processed(client, create):
+    amigurumi_id = create.amigurumi()
+    response = client.post(f"/image/upload?amigurumi_id={amigurumi_id}&list_id=1&main_image=true",
+                           data=jpeg_bytes(), content_type="image/jpeg")
+
+    assert response.status_code == 202
+    job = wait_for(client, response.get_json()["job_id"])
+
+    assert job["status"] == "done"
+    assert client.get("/image").get_json()[0]["image_id"] == job["image_id"]
+
+
+def test_invalid_upload_fails(client, create):
+    amigurumi_id = create.amigurumi()
+    response = client.post(f"/image/upload?amigurumi_id={amigurumi_id}&list_id=1", data=b"GIF89a corrompido",
+                           content_type="application/octet-stream")
+
+    job = wait_for(client, response.get_json()["job_id"])
+
+    assert job["status"] == "failed" and job["error"]
+
+
+#na consulta, o envio sem conclusão há mais de IMAGE_UPLOAD_TIMEOUT_SECONDS passa a failed; o recente continua pendente
+@pytest.mark.parametrize("status", ["pending", "processing"])
+def test_stale_job_is_reported_as_failed(app, client, create, status):
+    from image_uploads import INTERRUPTED_ERROR
+
+    amigurumi_id = create.amigurumi()
+    stale = add_unfinished_job(app, amigurumi_id, minutes=60, status=status)
+    recent = add_unfinished_job(app, amigurumi_id, minutes=1, status=status)
+
+    job = client.get(f"/image/upload/{stale}").get_json()
+    assert job["status"] == "failed" and job["error"] == INTERRUPTED_ERROR and job["finished_at"]
+
+    assert client.get(f"/image/upload/{recent}").get_json()["status"] == status
+
+
+#na inicialização do gunicorn (antes dos workers) todos os envios sem conclusão são marcados como failed
+def test_startup_fails_every_unfinished_job(app, create):
+    from database import db
+    from image_uploads import fail_unfinished_uploads
+    from table import ImageUpload
+
+    amigurumi_id = create.amigurumi()
+    jobs = [add_unfinished_job(app, amigurumi_id, minutes) for minutes in (0, 5, 60)]
+
+    with app.app_context():
+        assert fail_unfinished_uploads(db.session) == 3
+        assert {db.session.get(ImageUpload, job_id).status for job_id in jobs} == {"failed"}
+
+
+#arquivos temporários de envios interrompidos são removidos pela limpeza do armazenamento de imagens
+def test_sweep_removes_stale_upload_files(app):
+    import os
+
+    from app import image_uploads, sweep_image_blobs
+
+    os.makedirs(image_uploads.upload_dir, exist_ok=True)
+    stale, recent = (os.path.join(image_uploads.upload_dir, name) for name in ("upload-antigo", "upload-recente"))
+    for path in (stale, recent):
+        open(path, "wb").close()
+    os.utime(stale, (time.time() - 7200, time.time() - 7200))
+
+    with app.app_context():
+        assert sweep_image_blobs(3600) == 1
+
+    assert not os.path.exists(stale) and os.path.exists(recent)
@@ -0,0 +1,180 @@
+import pytest
+
+from conftest import element_body, row_body
+
+
+#duas partes do mesmo amigurumi, com quatro carreiras (1 a 4) cada, e uma parte em outro amigurumi
+@pytest.fixture
+def recipe(create):
+    amigurumi_id = create.amigurumi()
+    other_id = create.amigurumi(name="Coelho")
+    elements = [create.element(amigurumi_id, element_order=order) for order in (1, 2, 3)]
+    other_element_id = create.element(other_id, element_order=1)
+
+    lines = {
+        element_id: [create.row(amigurumi_id, element_id, number_row=n, observation=f"{element_id}-{n}") for n in (1, 2, 3, 4)]
+        for element_id in elements[:2]
+    }
+
+    return {"amigurumi_id": amigurumi_id, "other_id": other_id, "elements": elements,
+            "other_element_id": other_element_id, "lines": lines}
+
+
+#line_ids da parte na ordem de number_row
+def row_order(client, element_id):
+    rows = [row for row in client.get("/stitchbook?limit=1000").get_json() if row.get("line_id") and row["element_id"] == element_id]
+    return [row["line_id"] for row in sorted(rows, key=lambda row: row["number_row"])]
+
+
+def row_positions(client, element_id):
+    rows = client.get("/stitchbook?limit=1000").get_json()
+    return sorted(row["number_row"] for row in rows if row.get("line_id") and row["element_id"] == element_id)
+
+
+#element_ids do amigurumi na ordem de element_order
+def element_order(client, amigurumi_id):
+    elements = client.get(f"/stitchbook_sequence?amigurumi_id={amigurumi_id}&limit=1000").get_json()
+    return [element["element_id"] for element in sorted(elements, key=lambda element: element["element_order"])]
+
+
+#-------------------------------- carreiras --------------------------------#
+@pytest.mark.parametrize("position, expected", [(1, 0), (3, 2), (5, 4)])
+def test_insert_row_shifts_following_rows(client, recipe, position, expected):
+    first, second = recipe["elements"][:2]
+    lines = recipe["lines"][first]
+
+    response = client.post("/stitchbook/insert", json=row_body(recipe["amigurumi_id"], first, number_row=position))
+    assert response.status_code == 200
+    body = response.get_json()
+    assert body["shifted"] == 4 - expected
+
+    order = list(lines)
+    order.insert(expected, body["line_id"])
+    assert row_order(client, first) == order
+    assert row_positions(client, first) == [1, 2, 3, 4, 5]
+    assert row_order(client, second) == recipe["lines"][second]
+
+
+@pytest.mark.parametrize("element", ["other_element_id", 999])
+def test_insert_row_with_element_of_another_amigurumi(client, recipe, element):
+    element_id = recipe.get(element, element)
+    response = client.post("/stitchbook/insert", json=row_body(recipe["amigurumi_id"], element_id))
+
+    assert response.status_code == 404
+    assert row_positions(client, recipe["elements"][0]) == [1, 2, 3, 4]
+
+
+@pytest.mark.parametrize("index, position, order", [
+    (3, 1, [3, 0, 1, 2]),
+    (0, 4, [1, 2, 3, 0]),
+    (1, 3, [0, 2, 1, 3]),
+    (2, 3, [0, 1, 2, 3]),
+    (2, 2, [0, 2, 1, 3]),
+])
+def test_move_row(client, recipe, index, position, order):
+    first, second = recipe["elements"][:2]
+    lines = recipe["lines"][first]
+
+    response = client.post(f"/stitchbook/{lines[index]}/move", json={"number_row": position})
+    assert response.status_code == 200
+    assert response.get_json()["shifted"] == abs(order.index(index) - index)
+
+    assert row_order(client, first) == [lines[i] for i in order]
+    assert row_positions(client, first) == [1, 2, 3, 4]
+    assert row_order(client, second) == recipe["lines"][second]
+
+
+#a carreira levada para outra parte passa a ser ordenada junto com as carreiras da parte nova
+def test_move_row_after_changing_element(client, recipe):
+    first, second = recipe["elements"][:2]
+    line_id = recipe["lines"][first][0]
+
+    response = client.put("/stitchbook/line_id", json={"line_id": line_id, "element_id": second, "number_row": 5})
+    assert response.status_code == 200
+
+    response = client.post(f"/stitchbook/{line_id}/move", json={"number_row": 1})
+    assert response.status_code == 200
+    assert response.get_json()["shifted"] == 4
+
+    assert row_order(client, second) == [line_id] + recipe["lines"][second]
+    assert row_positions(client, second) == [1, 2, 3, 4, 5]
+    assert row_order(client, first) == recipe["lines"][first][1:]
+    assert row_positions(client, first) == [2, 3, 4]
+
+
+def test_move_missing_row(client, recipe):
+    assert client.post("/stitchbook/999/move", json={"number_row": 1}).status_code == 404
+    assert client.post(f"/stitchbook/{recipe['lines'][recipe['elements'][0]][0]}/move", json={"number_row": -1}).status_code == 422
+
+
+#---------------------------------- partes ---------------------------------#
+@pytest.mark.parametrize("position, expected", [(1, 0), (2, 1), (4, 3)])
+def test_insert_element_shifts_following_elements(client, recipe, position, expected):
+    response = client.post("/stitchbook_sequence/insert", json=element_body(recipe["amigurumi_id"], element_order=position))
+    assert response.status_code == 200
+    body = response.get_json()
+    assert body["shifted"] == 3 - expected
+
+    order = list(recipe["elements"])
+    order.insert(expected, body["element_id"])
+    assert element_order(client, recipe["amigurumi_id"]) == order
+    assert element_order(client, recipe["other_id"]) == [recipe["other_element_id"]]
+
+
+def test_insert_element_with_missing_amigurumi(client, recipe):
+    assert client.post("/stitchbook_sequence/insert", json=element_body(999)).status_code == 404
+
+
+@pytest.mark.parametrize("index, position, order", [
+    (2, 1, [2, 0, 1]),
+    (0, 3, [1, 2, 0]),
+    (1, 1, [1, 0, 2]),
+])
+def test_move_element(client, recipe, index, position, order):
+    elements = recipe["elements"]
+
+    response = client.post(f"/stitchbook_sequence/{elements[index]}/move", json={"element_order": position})
+    assert response.status_code == 200
+
+    assert element_order(client, recipe["amigurumi_id"]) == [elements[i] for i in order]
+    assert element_order(client, recipe["other_id"]) == [recipe["other_element_id"]]
+
+    #as carreiras acompanham a parte
+    assert row_order(client, elements[0]) == recipe["lines"][elements[0]]
+
+
+def test_move_missing_element(client, recipe):
+    assert client.post("/stitchbook_sequence/999/move", json={"element_order": 1}).status_code == 404
+
+
+#--------------------------- chave estrangeira -----------------------------#
+#parte ou amigurumi excluído entre a validação e o commit: a chave estrangeira responde com 404 e nada é gravado
+@pytest.mark.parametrize("path", ["/stitchbook/insert", "/stitchbook_sequence/insert"])
+def test_insert_foreign_key_violation(client, recipe, monkeypatch, path):
+    import app as app_module
+    from database import db
+    from ordering import open_position
+    from table import FoundationList, StitchBookSequence
+
+    first = recipe["elements"][0]
+
+    def open_position_after_delete(session, model, *args):
+        if model is StitchBookSequence:
+            session.execute(db.delete(FoundationList).where(FoundationList.amigurumi_id == recipe["amigurumi_id"]))
+        else:
+            session.execute(db.delete(StitchBookSequence).where(StitchBookSequence.element_id == first))
+        return open_position(session, model, *args)
+
+    monkeypatch.setattr(app_module, "open_position", open_position_after_delete)
+
+    if path == "/stitchbook/insert":
+        body = row_body(recipe["amigurumi_id"], first, number_row=2)
+    else:
+        body = element_body(recipe["amigurumi_id"], element_order=2)
+
+    response = client.post(path, json=body)
+
+    assert response.status_code == 404
+    assert response.get_json()["error"] == app_module.FOREIGN_KEY_ERROR
+    assert element_order(client, recipe["amigurumi_id"]) == recipe["elements"]
+    assert row_order(client, first) == recipe["lines"][first]
@@ -0,0 +1,72 @@
+import pytest
+
+from conftest import row_body
+from pagination import decode_cursor, encode_cursor
+
+
+def test_cursor_round_trip():
+    cursor = encode_cursor([3, "cabeça", None])
+
+    assert "=" not in cursor
+    assert decode_cursor(cursor, 3) == [3, "cabeça", None]
+
+
+@pytest.mark.parametrize("cursor", ["invalido", encode_cursor([1, 2]), encode_cursor({"id": 1})])
+def test_invalid_cursor(cursor):
+    with pytest.raises(ValueError):
+        decode_cursor(cursor, 3)
+
+
+def line_ids(response):
+    return [row["line_id"] for row in response.get_json()]
+
+
+@pytest.fixture
+def rows(client, create):
+    amigurumi_id = create.amigurumi()
+    element_id = create.element(amigurumi_id)
+
+    response = client.post("/stitchbook/bulk", json=[row_body(amigurumi_id, element_id, number_row=n) for n in range(1, 251)])
+    assert response.status_code == 200
+
+    return response.get_json()["line_ids"]
+
+
+#as páginas seguidas pelo X-Next-Cursor trazem todas as linhas, uma única vez e na ordem da listagem completa
+def test_pages_follow_next_cursor(client, rows):
+    expected = line_ids(client.get("/stitchbook?limit=1000"))
+    seen = []
+    path = "/stitchbook?limit=60"
+
+    while path:
+        response = client.get(path)
+        assert response.status_code == 200
+        assert len(response.get_json()) <= 60
+
+        seen += line_ids(response)
+        cursor = response.headers.get("X-Next-Cursor")
+        path = f"/stitchbook?limit=60&after={cursor}" if cursor else None
+
+    assert seen == expected
+    assert sorted(seen) == sorted(rows)
+
+
+#sem limit a página tem PAGE_DEFAULT_LIMIT linhas, e o envio em NDJSON continua trazendo todas
+def test_default_page_size(app, client, rows):
+    response = client.get("/stitchbook")
+
+    assert len(response.get_json()) == app.config["PAGE_DEFAULT_LIMIT"]
+    assert response.headers.get("X-Next-Cursor")
+    assert len(client.get("/stitchbook?stream=1").get_data().splitlines()) == len(rows)
+
+
+def test_last_page_has_no_cursor(client, rows):
+    response = client.get("/stitchbook?limit=1000")
+
+    assert len(response.get_json()) == len(rows)
+    assert "X-Next-Cursor" not in response.headers
+
+
+def test_invalid_cursor_is_rejected(client, rows):
+    assert client.get("/stitchbook?after=invalido").status_code == 400
+    assert client.get("/stitchbook?limit=0").status_code == 422
@@ -0,0 +1,103 @@
+import pytest
+from sqlalchemy import update
+
+
+def tree_of(client, amigurumi_id, **params):
+    response = client.get(f"/foundation_list/{amigurumi_id}/tree", query_string=params)
+    assert response.status_code == 200, response.get_json()
+    return response.get_json()
+
+
+def ids(nodes):
+    return [node["amigurumi_id"] for node in nodes]
+
+
+#família: raiz -> base -> (urso -> ursinho, coelho)
+@pytest.fixture
+def family(create):
+    root = create.amigurumi(name="Raiz")
+    base = create.amigurumi(name="Base", relationship=root)
+    bear = create.amigurumi(name="Urso", relationship=base)
+    cub = create.amigurumi(name="Ursinho", relationship=bear)
+    rabbit = create.amigurumi(name="Coelho", relationship=base)
+    create.amigurumi(name="Avulso")
+
+    return {"root": root, "base": base, "bear": bear, "cub": cub, "rabbit": rabbit}
+
+
+def set_relationship(app, amigurumi_id, relationship):
+    from database import db
+    from table import FoundationList
+
+    with app.app_context():
+        db.session.execute(
+            update(FoundationList.__table__).where(FoundationList.amigurumi_id == amigurumi_id).values(relationship=relationship)
+        )
+        db.session.commit()
+
+
+def test_ancestors_and_nested_children(client, family):
+    tree = tree_of(client, family["base"])
+
+    assert ids(tree["ancestors"]) == [family["root"]]
+    assert tree["ancestors"][0]["depth"] == -1
+    assert tree["tree"]["amigurumi_id"] == family["base"]
+    assert ids(tree["tree"]["children"]) == [family["bear"], family["rabbit"]]
+    assert ids(tree["tree"]["children"][0]["children"]) == [family["cub"]]
+    assert tree["cycle"] is False
+
+
+def test_depth_limits_both_directions(client, family):
+    tree = tree_of(client, family["bear"], depth=1)
+
+    assert ids(tree["ancestors"]) == [family["base"]]
+    assert ids(tree["tree"]["children"]) == [family["cub"]]
+
+    tree = tree_of(client, family["root"], depth=1)
+    assert ids(tree["tree"]["children"]) == [family["base"]]
+    assert tree["tree"]["children"][0]["children"] == []
+
+
+#um ciclo na coluna relationship (raiz -> ursinho) é marcado, e cada amigurumi aparece uma única vez
+def test_cycle_is_detected(app, client, family):
+    set_relationship(app, family["root"], family["cub"])
+
+    for amigurumi_id in family.values():
+        tree = tree_of(client, amigurumi_id)
+        seen = []
+        pending = tree["ancestors"] + [tree["tree"]]
+
+        #o pai de um descendente pode estar entre os ancestrais, quando o ciclo passa pelo próprio amigurumi
+        while pending:
+            node = pending.pop()
+            seen.append(node["amigurumi_id"])
+            pending.extend(node.get("children", []))
+
+        assert tree["cycle"] is True
+        assert sorted(seen) == sorted(family.values())
+
+
+def test_self_reference_is_a_cycle(app, client, create):
+    amigurumi_id = create.amigurumi()
+    set_relationship(app, amigurumi_id, amigurumi_id)
+
+    tree = tree_of(client, amigurumi_id)
+
+    assert tree["cycle"] is True
+    assert tree["ancestors"] == [] and tree["tree"]["children"] == []
+
+
+def test_contents_and_totals(client, create, family):
+    element_id = create.element(family["bear"])
+    create.row(family["bear"], element_id, stich_sequence="6sc")
+    create.row(family["cub"], create.element(family["cub"]), stich_sequence="12sc")
+
+    tree = tree_of(client, family["bear"], contents="true")
+
+    assert tree["tree"]["contents"]["row_count"] == 1
+    assert tree["totals"]["row_count"] == 2
+    assert tree["totals"]["total_stitch_count"] == 18
+
+
+def test_unknown_amigurumi(client):
+    assert client.get("/foundation_list/999/tree").status_code == 404
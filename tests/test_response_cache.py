@@ -0,0 +1,96 @@
+import gzip
+
+import pytest
+
+from conftest import row_body
+
+
+#cache das respostas ativo neste módulo (desativado nos demais)
+@pytest.fixture
+def settings():
+    return {"CACHE_MAX_ENTRIES": 1024}
+
+
+@pytest.fixture
+def backend(app):
+    from app import response_cache
+    return response_cache.backend
+
+
+def test_second_read_is_served_from_cache(client, create, backend):
+    create.amigurumi()
+    first = client.get("/foundation_list")
+
+    assert first.status_code == 200 and first.headers.get("ETag")
+    assert len(backend.entries) == 1
+
+    second = client.get("/foundation_list")
+
+    assert second.headers["ETag"] == first.headers["ETag"]
+    assert second.get_data() == first.get_data()
+    assert len(backend.entries) == 1
+
+
+def test_if_none_match_returns_not_modified(client, create):
+    create.amigurumi()
+    response = client.get("/foundation_list")
+
+    not_modified = client.get("/foundation_list", headers={"If-None-Match": response.headers["ETag"]})
+
+    assert not_modified.status_code == 304
+    assert not_modified.get_data() == b""
+    assert not_modified.headers["ETag"] == response.headers["ETag"]
+    assert client.get("/foundation_list", headers={"If-None-Match": '"outra"'}).status_code == 200
+
+
+def test_if_modified_since_returns_not_modified(client, create):
+    create.amigurumi()
+    response = client.get("/foundation_list")
+
+    assert client.get("/foundation_list", headers={"If-Modified-Since": response.headers["Last-Modified"]}).status_code == 304
+
+
+#cada escrita (pelo ORM ou em lote) muda a versão da tabela: a listagem em cache deixa de ser usada
+@pytest.mark.parametrize("write", ["single", "bulk", "delete"])
+def test_write_invalidates_cached_listing(client, create, write):
+    amigurumi_id = create.amigurumi()
+    element_id = create.element(amigurumi_id)
+    line_id = create.row(amigurumi_id, element_id)
+
+    cached = client.get("/stitchbook")
+    etag = cached.headers["ETag"]
+
+    if write == "single":
+        client.put("/stitchbook/line_id", json={**row_body(amigurumi_id, element_id, colour_id=7), "line_id": line_id})
+    elif write == "bulk":
+        client.put("/stitchbook/bulk", json=[{**row_body(amigurumi_id, element_id, colour_id=7), "line_id": line_id}])
+    else:
+        client.delete("/stitchbook/bulk", json=[{"line_id": line_id}])
+
+    assert client.get("/stitchbook", headers={"If-None-Match": etag}).status_code == 200
+
+    response = client.get("/stitchbook")
+    rows = [row for row in response.get_json() if row.get("line_id")]
+
+    assert response.headers["ETag"] != etag
+    assert [row["colour_id"] for row in rows] == ([] if write == "delete" else [7])
+
+
+#a variante comprimida tem a sua própria ETag e também fica em cache, comprimida uma única vez
+def test_compressed_variant_is_cached(client, create, backend):
+    amigurumi_id = create.amigurumi()
+    element_id = create.element(amigurumi_id)
+    client.post("/stitchbook/bulk", json=[row_body(amigurumi_id, element_id, number_row=n) for n in range(1, 40)])
+
+    plain = client.get("/stitchbook")
+    compressed = client.get("/stitchbook", headers={"Accept-Encoding": "gzip"})
+
+    assert compressed.headers["Content-Encoding"] == "gzip"
+    assert compressed.headers["ETag"] == plain.headers["ETag"][:-1] + '-gzip"'
+    assert gzip.decompress(compressed.get_data()) == plain.get_data()
+    assert sum(key.endswith(":gzip") for key in backend.entries) == 1
+
+    again = client.get("/stitchbook", headers={"Accept-Encoding": "gzip", "If-None-Match": compressed.headers["ETag"]})
+
+    assert again.status_code == 304
+    assert sum(key.endswith(":gzip") for key in backend.entries) == 1
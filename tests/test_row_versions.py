@@ -0,0 +1,164 @@
+import pytest
+
+from conftest import amigurumi_body, element_body
+
+
+def update_element(client, element_id, amigurumi_id, if_match=None, **values):
+    headers = {"If-Match": if_match} if if_match else {}
+    body = {"element_id": element_id, **element_body(amigurumi_id, **values)}
+    return client.put("/stitchbook_sequence/element_id", json=body, headers=headers)
+
+
+def element_row(client, element_id):
+    return next(row for row in client.get("/stitchbook_sequence?limit=1000").get_json() if row["element_id"] == element_id)
+
+
+def test_update_returns_new_version(client, create):
+    amigurumi_id = create.amigurumi()
+    element_id = create.element(amigurumi_id)
+
+    response = update_element(client, element_id, amigurumi_id, if_match='"1"', repetition=2)
+
+    assert response.status_code == 200
+    assert response.get_json()["version"] == 2
+    assert response.headers["ETag"] == '"2"'
+    assert element_row(client, element_id)["version"] == 2
+
+
+#a segunda alteração com a versão já lida é recusada e a linha fica como estava
+def test_stale_if_match_is_rejected(client, create):
+    amigurumi_id = create.amigurumi()
+    element_id = create.element(amigurumi_id)
+
+    assert update_element(client, element_id, amigurumi_id, if_match='"1"', repetition=2).status_code == 200
+
+    response = update_element(client, element_id, amigurumi_id, if_match='"1"', repetition=5)
+
+    assert response.status_code == 412
+    assert "versão atual 2" in response.get_json()["error"]
+    assert element_row(client, element_id)["repetition"] == 2
+
+
+def test_update_without_version_check(client, create):
+    amigurumi_id = create.amigurumi()
+    element_id = create.element(amigurumi_id)
+
+    assert update_element(client, element_id, amigurumi_id, if_match="*", repetition=2).status_code == 200
+    assert update_element(client, element_id, amigurumi_id, repetition=3).get_json()["version"] == 3
+
+
+def test_missing_row_with_if_match(client, create):
+    amigurumi_id = create.amigurumi()
+
+    assert update_element(client, 999, amigurumi_id, if_match='"1"').status_code == 404
+
+
+#a exclusão do amigurumi de origem anula relationship nos derivados (ON DELETE SET NULL) e também muda a versão deles
+def test_set_null_bumps_version(client, create):
+    origin_id = create.amigurumi()
+    derived_id = create.amigurumi(name="Urso derivado", relationship=origin_id)
+
+    assert client.delete("/foundation_list/amigurumi_id", json={"amigurumi_id": origin_id}).status_code == 200
+
+    derived = next(row for row in client.get("/foundation_list").get_json() if row["amigurumi_id"] == derived_id)
+    assert derived["relationship"] is None
+    assert derived["version"] == 2
+
+    response = client.put(
+        "/foundation_list/amigurumi_id", json={"amigurumi_id": derived_id, **amigurumi_body()}, headers={"If-Match": '"1"'}
+    )
+    assert response.status_code == 412
+
+
+#---------------------------------------------------------------------------#
+# Alterações parciais: apenas a chave é obrigatória, e as colunas não enviadas ficam como estavam
+def test_one_field_put_keeps_other_columns(client, create):
+    amigurumi_id = create.amigurumi()
+    element_id = create.element(amigurumi_id, element_name="cabeça", element_order=3)
+    before = element_row(client, element_id)
+
+    response = client.put("/stitchbook_sequence/element_id", json={"element_id": element_id, "repetition": 2})
+
+    assert response.status_code == 200, response.get_json()
+    after = element_row(client, element_id)
+    assert after == {**before, "repetition": 2, "version": 2}
+
+
+@pytest.mark.parametrize("path, key, create_row, values", [
+    ("/foundation_list/amigurumi_id", "amigurumi_id", lambda create, a, e: a, {"autor": "outra autora"}),
+    ("/stitchbook/line_id", "line_id", lambda create, a, e: create.row(a, e), {"observation": "arremate"}),
+    ("/stitchbook/line_id", "line_id", lambda create, a, e: create.row(a, e), {"stich_sequence": "6inc"}),
+])
+def test_partial_put_on_every_table(client, create, path, key, create_row, values):
+    amigurumi_id = create.amigurumi()
+    element_id = create.element(amigurumi_id)
+    row_id = create_row(create, amigurumi_id, element_id)
+    listing = path.split("/")[1]
+
+    def current():
+        rows = client.get(f"/{listing}?limit=1000").get_json()
+        return next(row for row in rows if row.get(key) == row_id)
+
+    before = current()
+    response = client.put(path, json={key: row_id, **values})
+
+    assert response.status_code == 200, response.get_json()
+    after = current()
+    changed = {name for name in after if after[name] != before[name]}
+    assert changed <= set(values) | {"version", "stitch_count", "increase_count"}
+    assert all(after[name] == value for name, value in values.items())
+
+
+def test_partial_put_of_material(client, create):
+    amigurumi_id = create.amigurumi()
+    response = client.post("/material_list", json={
+        "amigurumi_id": amigurumi_id, "material_name": "linha", "quantity": "50g", "list_id": 1, "colour_id": 4,
+    })
+    material_id = response.get_json()["material_id"]
+
+    assert client.put("/material_list/material_id", json={"material_id": material_id, "quantity": "80g"}).status_code == 200
+
+    material = client.get("/material_list").get_json()[0]
+    assert (material["quantity"], material["material_name"], material["colour_id"]) == ("80g", "linha", 4)
+
+
+#a parte enviada sem o amigurumi é conferida com o amigurumi atual da linha
+def test_partial_row_move_checks_element_owner(client, create):
+    amigurumi_id = create.amigurumi()
+    other_id = create.amigurumi(name="Coelho")
+    element_id = create.element(amigurumi_id)
+    second_element_id = create.element(amigurumi_id, element_name="braço")
+    other_element_id = create.element(other_id)
+    line_id = create.row(amigurumi_id, element_id)
+
+    assert client.put("/stitchbook/line_id", json={"line_id": line_id, "element_id": other_element_id}).status_code == 404
+    assert client.put("/stitchbook/line_id", json={"line_id": line_id, "amigurumi_id": other_id}).status_code == 404
+    assert client.put("/stitchbook/line_id", json={"line_id": line_id, "element_id": second_element_id}).status_code == 200
+    assert client.put("/stitchbook/line_id", json={"line_id": 999, "element_id": element_id}).status_code == 404
+
+
+#colunas obrigatórias podem ser omitidas, mas não enviadas como null
+def test_null_for_required_column_is_rejected(client, create):
+    amigurumi_id = create.amigurumi()
+    element_id = create.element(amigurumi_id)
+
+    response = client.put("/stitchbook_sequence/element_id", json={"element_id": element_id, "element_name": None})
+
+    assert response.status_code == 422
+    assert element_row(client, element_id)["element_name"] == "cabeça"
+
+
+#a imagem marcada como principal sem amigurumi_id no corpo troca a principal do seu próprio amigurumi
+def test_partial_main_image_swap(client, create):
+    from test_image_blobs import image_body
+
+    amigurumi_id = create.amigurumi()
+    first = client.post("/image", json=image_body(amigurumi_id, "red", main_image=True)).get_json()["image_id"]
+    second = client.post("/image", json=image_body(amigurumi_id, "blue")).get_json()["image_id"]
+
+    assert client.put("/image/image_id", json={"image_id": second, "main_image": True}).status_code == 200
+
+    images = {image["image_id"]: image for image in client.get("/image").get_json()}
+    assert images[second]["main_image"] and not images[first]["main_image"]
+    assert images[second]["content_hash"] != images[first]["content_hash"]
+    assert client.put("/image/image_id", json={"image_id": 999, "main_image": True}).status_code == 404
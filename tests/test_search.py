@@ -0,0 +1,88 @@
+import pytest
+
+from conftest import row_body
+
+
+def search(client, text, **params):
+    response = client.get("/search", query_string={"q": text, **params})
+    assert response.status_code == 200, response.get_json()
+    return response.get_json()
+
+
+def found(results):
+    return {(result["kind"], result["source_id"]) for result in results}
+
+
+@pytest.fixture
+def catalog(client, create):
+    bear = create.amigurumi(name="Urso Panda", autor="Maria")
+    rabbit = create.amigurumi(name="Coelho", autor="Ana")
+    head = create.element(bear, element_name="cabeça")
+    ear = create.element(rabbit, element_name="orelha do coelho")
+    line_id = create.row(bear, head, observation="fechar a cabeça com ponto baixo")
+
+    return {"bear": bear, "rabbit": rabbit, "head": head, "ear": ear, "line_id": line_id}
+
+
+#sem acentos, por prefixo e com todas as palavras
+def test_accents_prefixes_and_all_terms(client, catalog):
+    assert found(search(client, "cabeca")) == {("stitchbook_sequence", catalog["head"]), ("stitchbook", catalog["line_id"])}
+    assert found(search(client, "pand")) == {("foundation_list", catalog["bear"])}
+    assert found(search(client, "cabeça baixo")) == {("stitchbook", catalog["line_id"])}
+
+
+#a palavra no título fica à frente da palavra apenas no detalhe
+def test_title_matches_rank_first(client, catalog):
+    results = search(client, "coelho")
+
+    assert [(result["kind"], result["source_id"]) for result in results][:2] == [
+        ("foundation_list", catalog["rabbit"]), ("stitchbook_sequence", catalog["ear"]),
+    ]
+    assert results[0]["title"] == "<b>Coelho</b>"
+
+
+def test_operators_are_plain_text(client, catalog):
+    assert search(client, 'urso OR "coelho" NEAR(') == []
+    assert client.get("/search", query_string={"q": "  ?! "}).status_code == 400
+
+
+#os gatilhos mantêm o índice nas alterações, nas exclusões em lote e nas exclusões em cascata
+def test_index_follows_writes(client, catalog):
+    bear, head = catalog["bear"], catalog["head"]
+
+    client.put("/stitchbook/bulk", json=[{**row_body(bear, head, observation="bordar os olhos"), "line_id": catalog["line_id"]}])
+    assert found(search(client, "olhos")) == {("stitchbook", catalog["line_id"])}
+    assert found(search(client, "baixo")) == set()
+
+    client.delete("/foundation_list/amigurumi_id", json={"amigurumi_id": bear})
+    assert search(client, "olhos") == [] and search(client, "cabeca") == []
+    assert found(search(client, "coelho")) == {("foundation_list", catalog["rabbit"]), ("stitchbook_sequence", catalog["ear"])}
+
+
+def test_pages_follow_next_cursor(client, create):
+    amigurumi_id = create.amigurumi(name="Polvo")
+    for order in range(1, 8):
+        create.element(amigurumi_id, element_order=order, element_name=f"tentáculo {order}")
+
+    seen, after = [], None
+    while True:
+        response = client.get("/search", query_string={"q": "tentaculo", "limit": 3, **({"after": after} if after else {})})
+        seen += found(response.get_json())
+        after = response.headers.get("X-Next-Cursor")
+        if not after:
+            break
+
+    assert len(seen) == len(set(seen)) == 7
+
+
+#a busca por LIKE dos demais bancos encontra as mesmas linhas que o índice FTS5
+@pytest.mark.parametrize("text", ["coelho", "cabeça", "urso maria", "orelha coelho"])
+def test_fallback_search_finds_the_same_rows(app, client, catalog, text):
+    from database import db
+    from search import fallback_search, search_terms
+
+    with app.app_context():
+        query, _ = fallback_search(db.session, search_terms(text))
+        fallback = {(row.kind, row.source_id) for row in query}
+
+    assert fallback == found(search(client, text))
@@ -0,0 +1,48 @@
+import pytest
+
+from stitch_notation import stitch_counts
+
+
+def counts(stitches, increases, decreases):
+    return {"stitch_count": stitches, "increase_count": increases, "decrease_count": decreases}
+
+
+UNKNOWN = counts(None, None, None)
+
+
+@pytest.mark.parametrize("sequence, expected", [
+    ("6sc", counts(6, 0, 0)),
+    ("2sc,inc", counts(4, 1, 0)),
+    ("(sc, inc)*6", counts(18, 6, 0)),
+    ("[2sc, dec] x 4", counts(12, 0, 4)),
+    ("6 sc in mr", counts(6, 0, 0)),
+    ("ch 1", counts(1, 0, 0)),
+    ("sl st 3", counts(0, 0, 0)),
+    ("6 aum", counts(12, 6, 0)),
+    ("anel magico 6 pb", counts(6, 0, 0)),
+    ("(2 pb, aum) 3 vezes", counts(12, 3, 0)),
+])
+def test_counts_stitches_increases_and_decreases(sequence, expected):
+    assert stitch_counts(sequence) == expected
+
+
+#o total declarado só é usado quando a carreira não tem pontos reconhecidos
+def test_declared_total():
+    assert stitch_counts("(18)") == counts(18, 0, 0)
+    assert stitch_counts("(sc, inc)*6 = 18") == counts(18, 6, 0)
+    assert stitch_counts("6sc (10)") == counts(6, 0, 0)
+
+
+@pytest.mark.parametrize("sequence", ["texto livre", "(sc, inc", "6 xyz", "= abc", "", None])
+def test_unknown_notation_has_null_counts(sequence):
+    assert stitch_counts(sequence) == UNKNOWN
+
+
+def test_row_counts_are_stored_on_write(client, create):
+    amigurumi_id = create.amigurumi()
+    element_id = create.element(amigurumi_id)
+    line_id = create.row(amigurumi_id, element_id, stich_sequence="(sc, inc)*6")
+
+    row = next(row for row in client.get(f"/stitchbook?amigurumi_id={amigurumi_id}").get_json() if row["line_id"] == line_id)
+
+    assert (row["stitch_count"], row["increase_count"], row["decrease_count"]) == (18, 6, 0)
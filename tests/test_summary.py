@@ -0,0 +1,128 @@
+import base64
+import io
+
+import pytest
+from PIL import Image as PILImage
+
+from conftest import element_body, row_body
+
+
+def png_base64(colour):
+    output = io.BytesIO()
+    PILImage.new("RGB", (2, 2), colour).save(output, format="PNG")
+    return base64.b64encode(output.getvalue()).decode()
+
+
+def ok(response):
+    assert response.status_code == 200, response.get_json()
+    return response
+
+
+def read_summaries(session):
+    from table import AmigurumiSummary
+
+    columns = AmigurumiSummary.__table__.columns
+    return {row.amigurumi_id: dict(row._mapping) for row in session.execute(AmigurumiSummary.__table__.select().order_by(columns.amigurumi_id))}
+
+
+#o resumo mantido pelas diferenças de cada escrita deve ser igual ao recálculo completo das mesmas tabelas
+def assert_matches_refresh(app):
+    from database import db
+    from summary import refresh_amigurumi_summaries
+
+    with app.app_context():
+        incremental = read_summaries(db.session)
+        refresh_amigurumi_summaries(db.session.connection())
+        refreshed = read_summaries(db.session)
+        db.session.rollback()
+
+    assert incremental == refreshed
+    return incremental
+
+
+@pytest.fixture
+def catalog(client, create):
+    bear = create.amigurumi()
+    rabbit = create.amigurumi(name="Coelho")
+    head = create.element(bear, repetition=1)
+    arm = create.element(bear, element_name="braço", repetition=2)
+    ear = create.element(rabbit, element_name="orelha", repetition=2)
+
+    response = client.post("/stitchbook/bulk", json=[
+        row_body(bear, head, number_row=1, stich_sequence="6sc"),
+        row_body(bear, head, number_row=2, stich_sequence="6inc"),
+        row_body(bear, arm, number_row=1, stich_sequence="6sc"),
+        row_body(rabbit, ear, number_row=1, stich_sequence="(sc, inc) 3 vezes"),
+    ])
+    lines = response.get_json()["line_ids"]
+
+    return {"bear": bear, "rabbit": rabbit, "head": head, "arm": arm, "ear": ear, "lines": lines}
+
+
+def test_inserts(app, client, catalog):
+    bear, rabbit = catalog["bear"], catalog["rabbit"]
+    ok(client.post("/material_list/bulk", json=[
+        {"amigurumi_id": bear, "material_name": "linha", "quantity": "50g", "list_id": 1, "colour_id": 1},
+        {"amigurumi_id": rabbit, "material_name": "enchimento", "quantity": "20g", "list_id": 1, "colour_id": None},
+    ]))
+    ok(client.post("/image", json={"amigurumi_id": bear, "list_id": 1, "main_image": True, "image_base64": png_base64("red")}))
+
+    summaries = assert_matches_refresh(app)
+
+    #urso: cabeça 6 + 12 pontos, braço 6 pontos repetido 2 vezes
+    assert summaries[bear]["element_count"] == 2
+    assert summaries[bear]["row_count"] == 3
+    assert summaries[bear]["total_stitch_count"] == 6 + 12 + 6 * 2
+    assert summaries[bear]["has_main_image"] and summaries[bear]["image_count"] == 1
+    assert summaries[rabbit]["material_count"] == 1
+
+
+@pytest.mark.parametrize("change", ["row_sequence", "repetition", "move_row", "move_element_rows", "main_image"])
+def test_updates(app, client, catalog, change):
+    bear, rabbit, lines = catalog["bear"], catalog["rabbit"], catalog["lines"]
+
+    if change == "row_sequence":
+        ok(client.put("/stitchbook/line_id", json={**row_body(bear, catalog["head"], stich_sequence="12sc"), "line_id": lines[0]}))
+    elif change == "repetition":
+        ok(client.put("/stitchbook_sequence/element_id", json={**element_body(bear, repetition=4), "element_id": catalog["arm"]}))
+    elif change == "move_row":
+        ok(client.put("/stitchbook/bulk", json=[{**row_body(rabbit, catalog["ear"]), "line_id": lines[2]}]))
+    elif change == "move_element_rows":
+        ok(client.put("/stitchbook/bulk", json=[
+            {**row_body(bear, catalog["arm"], stich_sequence="6sc"), "line_id": line_id} for line_id in lines[:2]
+        ]))
+    else:
+        for colour in ("red", "blue"):
+            ok(client.post("/image", json={"amigurumi_id": bear, "list_id": 1, "main_image": True, "image_base64": png_base64(colour)}))
+
+    summaries = assert_matches_refresh(app)
+
+    if change == "move_row":
+        assert summaries[bear]["row_count"] == 2 and summaries[rabbit]["row_count"] == 2
+    if change == "main_image":
+        assert summaries[bear]["image_count"] == 2 and summaries[bear]["main_image_id"] == max(
+            image["image_id"] for image in client.get("/image").get_json()
+        )
+
+
+@pytest.mark.parametrize("removal", ["row", "rows_bulk", "element_cascade", "amigurumi"])
+def test_deletes(app, client, catalog, removal):
+    bear, lines = catalog["bear"], catalog["lines"]
+
+    if removal == "row":
+        ok(client.delete("/stitchbook/line_id", json={"line_id": lines[0]}))
+    elif removal == "rows_bulk":
+        ok(client.delete("/stitchbook/bulk", json=[{"line_id": line_id} for line_id in lines[:3]]))
+    elif removal == "element_cascade":
+        ok(client.delete("/stitchbook_sequence/element_id", json={"element_id": catalog["head"]}))
+    else:
+        ok(client.delete("/foundation_list/amigurumi_id", json={"amigurumi_id": bear}))
+
+    summaries = assert_matches_refresh(app)
+
+    if removal == "element_cascade":
+        assert summaries[bear]["element_count"] == 1
+        assert summaries[bear]["row_count"] == 1
+        assert summaries[bear]["total_stitch_count"] == 12
+    if removal == "amigurumi":
+        assert bear not in summaries and catalog["rabbit"] in summaries
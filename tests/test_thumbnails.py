@@ -0,0 +1,41 @@
+import io
+
+import pytest
+from PIL import Image as PILImage
+
+from thumbnails import RESCAN_FRACTION, ThumbnailCache, render_thumbnail
+
+
+def test_render_thumbnail_keeps_aspect_ratio():
+    output = io.BytesIO()
+    PILImage.new("RGB", (800, 600), "red").save(output, format="JPEG")
+
+    thumbnail = PILImage.open(io.BytesIO(render_thumbnail(output.getvalue(), 200, "webp")))
+
+    assert thumbnail.format == "WEBP"
+    assert thumbnail.size == (200, 150)
+
+
+#dois processos (workers) gravando na mesma pasta: o limite vale para a pasta inteira
+@pytest.mark.parametrize("workers", [1, 4])
+def test_budget_is_shared_by_every_worker(tmp_path, workers):
+    max_bytes = 100_000
+    caches = [ThumbnailCache(str(tmp_path), max_bytes) for _ in range(workers)]
+
+    for index in range(200):
+        caches[index % workers].put(f"{index:064x}", 200, "webp", b"x" * 1000)
+
+        disk_usage = caches[0].disk_usage()
+        assert disk_usage <= max_bytes * (1 + RESCAN_FRACTION * workers)
+
+
+def test_get_refreshes_entry_and_invalidate_removes_it(tmp_path):
+    cache = ThumbnailCache(str(tmp_path), 100_000)
+    path = cache.put("a" * 64, 200, "webp", b"miniatura")
+
+    assert cache.get("a" * 64, 200, "webp") == path
+    assert cache.get("a" * 64, 100, "webp") is None
+
+    cache.invalidate("a" * 64)
+
+    assert cache.get("a" * 64, 200, "webp") is None